@@ -7,7 +7,7 @@ from .models import AnalyticsReport
 # Register your models here.
 @admin.register(AnalyticsReport)
 class AnalyticsReportAdmin(admin.ModelAdmin):
-    list_display = ['job', 'total_applicants', 'avg_match_score', 'generated_at']
-    list_filter = ['generated_at', 'job__department']
+    list_display = ['job', 'total_applicants', 'processed', 'avg_match_score', 'is_stale', 'updated_at']
+    list_filter = ['is_stale', 'generated_at', 'job__department']
     search_fields = ['job__post__title']
-    readonly_fields = ['generated_at']
\ No newline at end of file
+    readonly_fields = ['generated_at', 'updated_at']
\ No newline at end of file
@@ -0,0 +1,174 @@
+from collections import Counter
+
+from django.db.models import FloatField, OuterRef, Q, Subquery
+from django.db.models.fields.json import KT
+from django.db.models.functions import Cast
+
+from Companyapp.models import Application, JobAdvertised, MatchResult
+from text_normalization import EDUCATION_LEVEL_LABELS
+from .models import AnalyticsReport
+
+TOP_SKILLS = 10
+
+# (key, lower bound, upper bound) — keys are what the job analytics chart reads
+SCORE_BUCKETS = [
+    ('r80_100', 80, None),
+    ('r60_79', 60, 80),
+    ('r40_59', 40, 60),
+    ('r0_39', None, 40),
+]
+
+
+# ==========================================
+# Aggregation
+# ==========================================
+def score_bucket(score):
+    for key, low, high in SCORE_BUCKETS:
+        if (low is None or score >= low) and (high is None or score < high):
+            return key
+
+
+def build_report_data(job):
+    """
+    Aggregates for one job, read in a single query over its applications:
+    the extraction fields are joined in and the stored MatchResult score and
+    experience are annotated, so nothing is re-matched here.
+    """
+    match = MatchResult.objects.filter(job=job, applicant=OuterRef('applicant'))
+    rows = (
+        Application.objects.filter(post=job.post)
+        .annotate(
+            score=Subquery(match.values('total_score')[:1]),
+            years=Subquery(
+                match.annotate(years=Cast(KT('breakdown__candidate_years'), FloatField())).values('years')[:1]
+            ),
+        )
+        .values_list(
+            'applicant__resumeextraction__processed',
+            'applicant__resumeextraction__skills',
+            'applicant__resumeextraction__education_level',
+            'score',
+            'years',
+        )
+    )
+
+    total = processed = 0
+    scores, years = [], []
+    skills = Counter()
+    education = Counter()
+    distribution = dict.fromkeys((key for key, _, _ in SCORE_BUCKETS), 0)
+
+    for is_processed, skill_list, level, score, candidate_years in rows:
+        total += 1
+        if not is_processed:
+            continue
+        processed += 1
+        skills.update(skill.lower() for skill in (skill_list or []))
+        if level:
+            # Highest level per applicant, classified at extraction time
+            education[EDUCATION_LEVEL_LABELS[level]] += 1
+        if score is not None:
+            # Results not scored yet are left out of the averages until their row lands
+            scores.append(score)
+            distribution[score_bucket(score)] += 1
+        if candidate_years is not None:
+            years.append(candidate_years)
+
+    return {
+        'total_applicants': total,
+        'processed': processed,
+        'pending': total - processed,
+        'avg_match_score': round(sum(scores) / len(scores), 1) if scores else 0.0,
+        'avg_experience_years': round(sum(years) / len(years), 1) if years else 0.0,
+        'top_skills_found': [{'skill': skill, 'count': count} for skill, count in skills.most_common(TOP_SKILLS)],
+        'education_breakdown': dict(education),
+        'score_distribution': distribution,
+    }
+
+
+def refresh_report(job):
+    """
+    Recomputes the job's current report in place (creating it if needed).
+    The stale flag is cleared before aggregating, so a change that lands
+    meanwhile marks the row stale again and queues another refresh.
+    """
+    report = AnalyticsReport.objects.filter(job=job).first()
+    if report is None:
+        report = AnalyticsReport(job=job)
+    else:
+        AnalyticsReport.objects.filter(pk=report.pk).update(is_stale=False)
+        report.is_stale = False
+
+    data = build_report_data(job)
+    for field, value in data.items():
+        setattr(report, field, value)
+
+    if report.pk is None:
+        report.save()
+    else:
+        # is_stale is left out so a concurrent mark_jobs_stale() is not overwritten
+        report.save(update_fields=[*data, 'updated_at'])
+    return report
+
+
+# ==========================================
+# Incremental updates
+# ==========================================
+def mark_jobs_stale(job_ids):
+    """
+    Flags the reports of the given jobs for a refresh. Returns the ids of
+    jobs that were not already flagged: only those need a refresh queued,
+    so a burst of changes to one job collapses into a single recomputation.
+    """
+    job_ids = set(job_ids)
+    if not job_ids:
+        return set()
+
+    flagged = set(
+        AnalyticsReport.objects.filter(job_id__in=job_ids, is_stale=True).values_list('job_id', flat=True)
+    )
+    AnalyticsReport.objects.filter(job_id__in=job_ids, is_stale=False).update(is_stale=True)
+
+    known = set(AnalyticsReport.objects.filter(job_id__in=job_ids).values_list('job_id', flat=True))
+    missing = job_ids - known
+    AnalyticsReport.objects.bulk_create([AnalyticsReport(job_id=job_id, is_stale=True) for job_id in missing])
+    return job_ids - flagged
+
+
+def applied_job_ids(applicant_ids, job_ids=None):
+    """Ids of the jobs the given applicants applied for (optionally narrowed to job_ids)."""
+    jobs = JobAdvertised.objects.filter(post__application__applicant_id__in=applicant_ids)
+    if job_ids is not None:
+        jobs = jobs.filter(id__in=job_ids)
+    return set(jobs.values_list('id', flat=True).distinct())
+
+
+# ==========================================
+# Reading and compaction
+# ==========================================
+def current_report(job):
+    """The job's newest report, built on the spot if it has none yet."""
+    return AnalyticsReport.objects.filter(job=job).first() or refresh_report(job)
+
+
+def compact_reports():
+    """
+    Periodic clean-up (Celery beat):
+    - keeps only the newest report row per job
+    - refreshes reports still flagged stale (e.g. a refresh task was lost)
+    - creates reports for jobs that have none
+    Returns (rows deleted, reports refreshed).
+    """
+    newest = AnalyticsReport.objects.filter(job=OuterRef('job')).order_by('-generated_at', '-id').values('id')[:1]
+    deleted, _ = AnalyticsReport.objects.exclude(id=Subquery(newest)).delete()
+
+    jobs = (
+        JobAdvertised.objects.filter(Q(analytics__is_stale=True) | Q(analytics__isnull=True))
+        .select_related('post')
+        .distinct()
+    )
+    refreshed = 0
+    for job in jobs:
+        refresh_report(job)
+        refreshed += 1
+    return deleted, refreshed
@@ -0,0 +1,43 @@
+# Generated by Django 5.2.8 on 2026-10-18 04:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Analyzerapp', '0001_initial'),
+        ('Companyapp', '0004_candidateembedding'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='analyticsreport',
+            name='is_stale',
+            field=models.BooleanField(db_index=True, default=False),
+        ),
+        migrations.AddField(
+            model_name='analyticsreport',
+            name='pending',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='analyticsreport',
+            name='processed',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='analyticsreport',
+            name='score_distribution',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+        migrations.AddField(
+            model_name='analyticsreport',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddIndex(
+            model_name='analyticsreport',
+            index=models.Index(fields=['job', '-generated_at'], name='analytics_job_latest_idx'),
+        ),
+    ]
@@ -7,18 +7,28 @@ from Extractionapp.models import ResumeExtraction
 
 class AnalyticsReport(models.Model):
     """
-    Store analytics data for job postings
+    Store analytics data for job postings.
+    The newest row of a job is kept up to date by Analyzerapp/analytics.py
+    ('is_stale' marks rows with a refresh pending); older rows are compacted away.
     """
     job = models.ForeignKey(JobAdvertised, on_delete=models.CASCADE, related_name='analytics')
     total_applicants = models.IntegerField(default=0)
+    processed = models.IntegerField(default=0)
+    pending = models.IntegerField(default=0)
     avg_match_score = models.FloatField(default=0.0)
     top_skills_found = models.JSONField(default=list, blank=True)
     avg_experience_years = models.FloatField(default=0.0)
     education_breakdown = models.JSONField(default=dict, blank=True)
+    score_distribution = models.JSONField(default=dict, blank=True)
+    is_stale = models.BooleanField(default=False, db_index=True)
     generated_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
     
     class Meta:
         ordering = ['-generated_at']
+        indexes = [
+            models.Index(fields=['job', '-generated_at'], name='analytics_job_latest_idx'),
+        ]
     
     def __str__(self):
         return f"Analytics for {self.job.post.title} - {self.generated_at}"
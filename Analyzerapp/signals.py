@@ -0,0 +1,32 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from Companyapp.models import Application, JobAdvertised
+from Companyapp.scoring import match_results_saved
+from Companyapp.signals import enqueue_after_commit
+from Extractionapp.models import ResumeExtraction
+from .analytics import applied_job_ids, mark_jobs_stale
+from .tasks import refresh_job_analytics
+
+
+def queue_report_refresh(job_ids):
+    """Marks the reports stale and queues one refresh per report that was still fresh."""
+    for job_id in mark_jobs_stale(job_ids):
+        enqueue_after_commit(refresh_job_analytics, job_id)
+
+
+@receiver(match_results_saved)
+def refresh_reports_on_scores(sender, rows, **kwargs):
+    # The applicant feed also stores scores for jobs nobody applied to; only applications count
+    applicant_ids = {row.applicant_id for row in rows}
+    queue_report_refresh(applied_job_ids(applicant_ids, job_ids={row.job_id for row in rows}))
+
+
+@receiver(post_save, sender=ResumeExtraction)
+def refresh_reports_on_extraction(sender, instance, **kwargs):
+    queue_report_refresh(applied_job_ids([instance.applicant_id]))
+
+
+@receiver(post_save, sender=Application)
+@receiver(post_delete, sender=Application)
+def refresh_reports_on_application(sender, instance, **kwargs):
+    queue_report_refresh(JobAdvertised.objects.filter(post_id=instance.post_id).values_list('id', flat=True))
@@ -0,0 +1,35 @@
+from celery import shared_task
+from Companyapp.models import JobAdvertised
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+@shared_task
+def refresh_job_analytics(job_id):
+    """
+    Recomputes a job's AnalyticsReport.
+    Queued when its applications, extractions or match results change.
+    """
+    from .analytics import refresh_report
+
+    try:
+        job = JobAdvertised.objects.select_related('post').get(id=job_id)
+    except JobAdvertised.DoesNotExist:
+        return f"Job {job_id} not found"
+
+    report = refresh_report(job)
+    return f"Report updated ({report.processed}/{report.total_applicants} processed)."
+
+
+@shared_task
+def compact_analytics_reports():
+    """
+    Drops superseded report rows and catches up on stale or missing reports.
+    """
+    from .analytics import compact_reports
+
+    deleted, refreshed = compact_reports()
+    if deleted or refreshed:
+        logger.info(f"📈 Analytics compaction: {deleted} old row(s) removed, {refreshed} report(s) refreshed.")
+    return f"Removed {deleted}, refreshed {refreshed}."
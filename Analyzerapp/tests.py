@@ -1,3 +1,92 @@
+from unittest import mock
+
 from django.test import TestCase
 
-# Create your tests here.
+from Companyapp.models import Application
+from Companyapp.scoring import refresh_job_matches
+from Companyapp.tests import FakeModelMixin, JobFixtureMixin
+from .analytics import build_report_data, compact_reports, mark_jobs_stale, refresh_report
+from .models import AnalyticsReport
+
+
+class AnalyticsReportTests(FakeModelMixin, JobFixtureMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.job = self.create_job(skills="python, django")
+        self.alice = self.create_applicant(1, ['Python', 'Django'])
+        self.bob = self.create_applicant(2, ['Java'])
+        self.carol = self.create_applicant(3, ['Python'], processed=False)
+        refresh_job_matches(self.job)
+
+    def test_report_aggregates_stored_results(self):
+        data = build_report_data(self.job)
+        self.assertEqual((data['total_applicants'], data['processed'], data['pending']), (3, 2, 1))
+        self.assertEqual(data['top_skills_found'][0], {'skill': 'python', 'count': 1})
+        self.assertEqual(data['education_breakdown'], {'Bachelor': 2})
+        self.assertEqual(sum(data['score_distribution'].values()), 2)
+
+        scores = [r.total_score for r in self.job.match_results.filter(applicant__in=[self.alice, self.bob])]
+        self.assertEqual(data['avg_match_score'], round(sum(scores) / 2, 1))
+
+    def test_changes_mark_the_report_stale_once(self):
+        report = refresh_report(self.job)
+        self.assertFalse(report.is_stale)
+
+        with mock.patch('Analyzerapp.signals.enqueue_after_commit') as enqueue:
+            self.create_applicant(4, ['SQL'])
+            self.create_applicant(5, ['Go'])
+        # Two applications and two extractions, but one refresh for the burst
+        self.assertEqual(enqueue.call_count, 1)
+        self.assertTrue(AnalyticsReport.objects.get(job=self.job).is_stale)
+
+        report = refresh_report(self.job)
+        self.assertFalse(report.is_stale)
+        self.assertEqual(report.total_applicants, 5)
+
+    def test_new_scores_refresh_applied_jobs_only(self):
+        other_job = self.create_job(skills="java", title="Java Engineer")
+        refresh_report(self.job)
+        refresh_report(other_job)
+        with mock.patch('Analyzerapp.signals.enqueue_after_commit') as enqueue:
+            self.job.required_skills = "python"
+            self.job.save()
+            refresh_job_matches(self.job)
+        self.assertEqual([c.args[1] for c in enqueue.call_args_list], [self.job.id])
+        self.assertEqual(mark_jobs_stale([other_job.id]), {other_job.id})
+
+    def test_compaction_keeps_the_newest_row_and_catches_up(self):
+        refresh_report(self.job)
+        AnalyticsReport.objects.create(job=self.job)
+        AnalyticsReport.objects.create(job=self.job, is_stale=True)
+        deleted, refreshed = compact_reports()
+        self.assertEqual((deleted, refreshed), (2, 1))
+        report = AnalyticsReport.objects.get(job=self.job)
+        self.assertEqual((report.is_stale, report.total_applicants), (False, 3))
+
+    def test_dashboard_reads_reports_without_rematching(self):
+        refresh_report(self.job)
+        with mock.patch('Companyapp.matcher.calculate_match_percentage') as match:
+            response = self.client.get('/review/dashboard/')
+        match.assert_not_called()
+        item = response.context['dashboard_data'][0]
+        self.assertEqual((item['total_applicants'], item['processed']), (3, 2))
+
+        with self.assertNumQueries(4):
+            self.client.get('/review/dashboard/')
+        for n in range(10, 20):
+            self.create_applicant(n, ['Python'])
+        for title in ("Data Engineer", "Web Developer"):
+            refresh_report(self.create_job(title=title))
+        refresh_report(self.job)
+        with self.assertNumQueries(4):
+            response = self.client.get('/review/dashboard/')
+        counts = {item['job'].id: item['total_applicants'] for item in response.context['dashboard_data']}
+        self.assertEqual(counts[self.job.id], 13)
+
+    def test_job_page_builds_a_missing_report(self):
+        Application.objects.filter(applicant=self.bob).delete()
+        AnalyticsReport.objects.all().delete()
+        response = self.client.get(f'/review/job/{self.job.id}/')
+        self.assertEqual(response.context['stats']['total_applicants'], 2)
+        self.assertEqual([a['name'] for a in response.context['applicants']], ["Applicant1 Test"])
+        self.assertEqual(AnalyticsReport.objects.filter(job=self.job).count(), 1)
@@ -2,60 +2,47 @@ from django.shortcuts import render
 
 # Create your views here.
 from django.shortcuts import render, get_object_or_404
-from django.db.models import Avg, Count
+from django.db.models import Count, Prefetch, Q
 from Companyapp.models import JobAdvertised, Application
-from Extractionapp.models import ResumeExtraction
-from Companyapp.matcher import calculate_match_percentage
-from collections import Counter
+from Companyapp.scoring import ranked_applications
+from .analytics import current_report, refresh_report
+from .models import AnalyticsReport
 
 def dashboard(request):
     """
-    Main analytics dashboard showing overview of all jobs
+    Main analytics dashboard showing overview of all jobs.
+    Reads the pre-aggregated AnalyticsReport rows (kept current by Celery),
+    so the cost does not grow with the number of applicants.
     """
-    jobs = JobAdvertised.objects.all()
+    processed = Q(post__application__applicant__resumeextraction__processed=True)
+    jobs = (
+        JobAdvertised.objects.select_related('post', 'department')
+        .annotate(
+            # Live counts; the report supplies the (asynchronously refreshed) averages
+            applicant_count=Count('post__application', distinct=True),
+            processed_count=Count('post__application', filter=processed, distinct=True),
+        )
+        .prefetch_related(Prefetch('analytics', queryset=AnalyticsReport.objects.all(), to_attr='reports'))
+    )
     
     dashboard_data = []
     for job in jobs:
-        applications = Application.objects.filter(post=job.post)
-        
-        total_apps = applications.count()
-        processed = 0
-        total_score = 0
-        all_skills = []
-        
-        for app in applications:
-            try:
-                extraction = ResumeExtraction.objects.get(applicant=app.applicant)
-                if extraction.processed:
-                    processed += 1
-                    
-                    resume_data = {
-                        'skills': extraction.skills or [],
-                        'work_experience': extraction.work_experience or [],
-                        'education': extraction.education or [],
-                    }
-                    
-                    result = calculate_match_percentage(job, resume_data)
-                    total_score += result['total_score']
-                    all_skills.extend(extraction.skills or [])
-            except ResumeExtraction.DoesNotExist:
-                continue
-        
-        avg_score = (total_score / processed) if processed > 0 else 0
-        top_skills = [skill for skill, count in Counter(all_skills).most_common(5)]
+        # Only a job created since the last compaction can lack a report
+        report = job.reports[0] if job.reports else refresh_report(job)
         
         dashboard_data.append({
             'job': job,
-            'total_applicants': total_apps,
-            'processed': processed,
-            'avg_match_score': round(avg_score, 1),
-            'top_skills': top_skills,
-            'is_open': job.is_open()
+            'total_applicants': job.applicant_count,
+            'processed': job.processed_count,
+            'avg_match_score': report.avg_match_score,
+            'top_skills': [item['skill'] for item in report.top_skills_found[:5]],
+            'is_open': job.is_open(),
+            'is_stale': report.is_stale,
         })
     
     context = {
         'dashboard_data': dashboard_data,
-        'total_jobs': jobs.count(),
+        'total_jobs': len(dashboard_data),
         'total_applications': Application.objects.count(),
     }
     
@@ -66,96 +53,38 @@ def job_analytics(request, job_id):
     """
     Detailed analytics for a specific job
     """
-    job = get_object_or_404(JobAdvertised, id=job_id)
-    applications = Application.objects.filter(post=job.post).select_related('applicant')
+    job = get_object_or_404(JobAdvertised.objects.select_related('post', 'department'), id=job_id)
+    report = current_report(job)
     
-    # Collect detailed statistics
     stats = {
-        'total_applicants': applications.count(),
-        'processed': 0,
-        'pending': 0,
-        'scores': [],
-        'skills_breakdown': Counter(),
-        'experience_years': [],
-        'education_levels': Counter(),
+        'total_applicants': report.total_applicants,
+        'processed': report.processed,
+        'pending': report.pending,
     }
     
-    applicants_data = []
-    
-    for app in applications:
-        try:
-            extraction = ResumeExtraction.objects.get(applicant=app.applicant)
-            
-            if extraction.processed:
-                stats['processed'] += 1
-                
-                resume_data = {
-                    'skills': extraction.skills or [],
-                    'work_experience': extraction.work_experience or [],
-                    'education': extraction.education or [],
-                }
-                
-                result = calculate_match_percentage(job, resume_data)
-                stats['scores'].append(result['total_score'])
-                
-                # Skills breakdown
-                for skill in (extraction.skills or []):
-                    stats['skills_breakdown'][skill.lower()] += 1
-                
-                # Experience breakdown
-                stats['experience_years'].append(result['candidate_years'])
-                
-                # Education breakdown
-                for edu in (extraction.education or []):
-                    if 'phd' in edu.lower():
-                        stats['education_levels']['PhD'] += 1
-                    elif 'master' in edu.lower():
-                        stats['education_levels']['Master'] += 1
-                    elif 'bachelor' in edu.lower():
-                        stats['education_levels']['Bachelor'] += 1
-                    elif 'diploma' in edu.lower():
-                        stats['education_levels']['Diploma'] += 1
-                
-                applicants_data.append({
-                    'name': f"{app.applicant.first_name} {app.applicant.last_name}",
-                    'email': app.applicant.email,
-                    'score': result['total_score'],
-                    'applied_date': app.applied_at,
-                })
-            else:
-                stats['pending'] += 1
-                
-        except ResumeExtraction.DoesNotExist:
-            stats['pending'] += 1
-    
-    # Calculate averages
-    avg_score = sum(stats['scores']) / len(stats['scores']) if stats['scores'] else 0
-    avg_experience = sum(stats['experience_years']) / len(stats['experience_years']) if stats['experience_years'] else 0
-    
-    # Top skills
-    top_skills = [
-        {'skill': skill, 'count': count}
-        for skill, count in stats['skills_breakdown'].most_common(10)
+    # Top 10 by stored score, straight from the ranking query
+    applicants_data = [
+        {
+            'name': f"{app.applicant.first_name} {app.applicant.last_name}",
+            'email': app.applicant.email,
+            'score': app.match_score,
+            'applied_date': app.applied_at,
+        }
+        for app in ranked_applications(job).filter(
+            applicant__resumeextraction__processed=True, match_score__isnull=False
+        )[:10]
     ]
     
-    # Score distribution
-    score_ranges = {
-        '80-100': len([s for s in stats['scores'] if s >= 80]),
-        '60-79': len([s for s in stats['scores'] if 60 <= s < 80]),
-        '40-59': len([s for s in stats['scores'] if 40 <= s < 60]),
-        '0-39': len([s for s in stats['scores'] if s < 40]),
-    }
-    
     context = {
         'job': job,
+        'report': report,
         'stats': stats,
-        'avg_score': round(avg_score, 1),
-        'avg_experience': round(avg_experience, 1),
-        'top_skills': top_skills,
-        'score_ranges': score_ranges,
-        'education_breakdown': dict(stats['education_levels']),
-        'applicants': sorted(applicants_data, key=lambda x: x['score'], reverse=True)[:10],
+        'avg_score': report.avg_match_score,
+        'avg_experience': report.avg_experience_years,
+        'top_skills': report.top_skills_found,
+        'score_ranges': report.score_distribution,
+        'education_breakdown': report.education_breakdown,
+        'applicants': applicants_data,
     }
     
     return render(request, 'job_analytics.html', context)
-
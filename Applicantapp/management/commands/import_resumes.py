@@ -0,0 +1,269 @@
+import hashlib
+import json
+import os
+import re
+import time
+import zipfile
+from contextlib import ExitStack
+
+from celery import group
+from django.core.files import File
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from Analyzerapp.signals import queue_report_refresh
+from Applicantapp.models import Applicant
+from Applicantapp.tasks import process_resume_task
+from Companyapp.models import Application, JobAdvertised
+
+NAME_SEPARATORS = re.compile(r'[\s_\-.]+')
+
+
+# ==========================================
+# Sources (each yields records in a stable order, so a run can resume)
+# ==========================================
+def record_from_filename(relative_path, open_file):
+    """
+    A bare PDF: the name comes from the file name ("Jane_Doe.pdf") and the
+    email is a stable placeholder under the reserved .invalid domain, so
+    re-running the import recognises the same file.
+    """
+    stem = os.path.splitext(os.path.basename(relative_path))[0]
+    parts = [p for p in NAME_SEPARATORS.split(stem) if p] or ['Imported']
+    digest = hashlib.sha1(relative_path.encode()).hexdigest()[:12]
+    return {
+        'first_name': parts[0].title()[:255],
+        'last_name': " ".join(parts[1:]).title()[:255],
+        'email': f"{'.'.join(parts).lower()[:40]}.{digest}@imported.invalid",
+        'filename': os.path.basename(relative_path),
+        'open': open_file,
+    }
+
+
+def iter_directory(path):
+    for root, dirs, files in os.walk(path):
+        dirs.sort()
+        for name in sorted(files):
+            if name.lower().endswith('.pdf'):
+                full_path = os.path.join(root, name)
+                relative = os.path.relpath(full_path, path)
+                yield record_from_filename(relative, lambda p=full_path: open(p, 'rb'))
+
+
+def iter_zip(archive):
+    for info in archive.infolist():
+        if not info.is_dir() and info.filename.lower().endswith('.pdf'):
+            yield record_from_filename(info.filename, lambda i=info: archive.open(i))
+
+
+def iter_jsonl(path):
+    """
+    One applicant per line: {"resume": "cv.pdf", "email": ..., "first_name": ...,
+    "last_name": ..., "phone": ..., "location": ...}. Resume paths are relative
+    to the JSONL file. A malformed line yields an error record (counted as
+    failed), so it never stops the import.
+    """
+    base = os.path.dirname(os.path.abspath(path))
+    with open(path, encoding='utf-8') as f:
+        for number, line in enumerate(f, start=1):
+            if not line.strip():
+                continue
+            try:
+                row = json.loads(line)
+                resume = os.path.join(base, row['resume'])
+                email = row['email']
+            except (ValueError, KeyError, TypeError) as e:
+                yield {'error': f"line {number} of {os.path.basename(path)}: {e!r}"}
+                continue
+            yield {
+                'first_name': row.get('first_name', ''),
+                'last_name': row.get('last_name', ''),
+                'email': email,
+                'phone': row.get('phone'),
+                'location': row.get('location'),
+                'filename': os.path.basename(resume),
+                'open': lambda p=resume: open(p, 'rb'),
+            }
+
+
+def iter_source(path, stack):
+    """Records of the source; a zip archive stays open (on the ExitStack) until the import ends."""
+    if os.path.isdir(path):
+        return iter_directory(path)
+    if zipfile.is_zipfile(path):
+        return iter_zip(stack.enter_context(zipfile.ZipFile(path)))
+    if path.endswith('.jsonl'):
+        return iter_jsonl(path)
+    raise CommandError(f"{path} is not a directory, a zip archive or a .jsonl file")
+
+
+# ==========================================
+# Checkpoints
+# ==========================================
+def load_checkpoint(path):
+    if not os.path.exists(path):
+        return None
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def save_checkpoint(path, state):
+    """Written to a temp file and renamed, so an interrupted write never corrupts it."""
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(state, f)
+    os.replace(tmp_path, path)
+
+
+class Command(BaseCommand):
+    help = (
+        "Bulk-imports resumes from a directory of PDFs, a zip archive or a JSONL manifest. "
+        "Creates applicants in chunks, queues their processing and checkpoints progress "
+        "so an interrupted import resumes where it stopped."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('source', help="Directory, .zip archive or .jsonl manifest")
+        parser.add_argument('--job', type=int, help="JobAdvertised id every imported applicant applies to")
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument('--checkpoint', help="Checkpoint file (default: <source>.checkpoint.json)")
+        parser.add_argument('--restart', action='store_true', help="Ignore an existing checkpoint")
+        parser.add_argument('--no-process', action='store_true', help="Create rows without queueing the pipeline")
+
+    def handle(self, *args, **options):
+        source = os.path.abspath(options['source'])
+        if not os.path.exists(source):
+            raise CommandError(f"{source} does not exist")
+
+        post_id = None
+        if options['job']:
+            try:
+                post_id = JobAdvertised.objects.values_list('post_id', flat=True).get(id=options['job'])
+            except JobAdvertised.DoesNotExist:
+                raise CommandError(f"Job {options['job']} not found")
+
+        checkpoint_path = options['checkpoint'] or f"{source.rstrip(os.sep)}.checkpoint.json"
+        state = None if options['restart'] else load_checkpoint(checkpoint_path)
+        if state and state['source'] != source:
+            raise CommandError(f"{checkpoint_path} belongs to another import ({state['source']})")
+        if state is None:
+            state = {'source': source, 'position': 0, 'imported': 0, 'skipped': 0, 'failed': 0, 'pending': []}
+        elif state['position']:
+            self.stdout.write(f"⏩ Resuming after record {state['position']}")
+
+        self.enqueue = not options['no_process']
+        self.checkpoint_path = checkpoint_path
+        started = time.monotonic()
+        imported_at_start = state['imported']
+
+        # Applicants committed by an interrupted run but never queued
+        if self.enqueue and state.get('pending'):
+            self.stdout.write(f"🔁 Re-queuing {len(state['pending'])} applicant(s) from the interrupted run")
+            self.queue_processing(state)
+
+        with ExitStack() as stack:
+            chunk = []
+            for position, record in enumerate(iter_source(source, stack), start=1):
+                if position <= state['position']:
+                    continue
+                chunk.append(record)
+                if len(chunk) >= options['batch_size']:
+                    self.finish_chunk(chunk, post_id, state, position)
+                    self.report(state, started, imported_at_start)
+                    chunk = []
+
+            if chunk:
+                self.finish_chunk(chunk, post_id, state, state['position'] + len(chunk))
+                self.report(state, started, imported_at_start)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ Import complete: {state['imported']} imported, {state['skipped']} already present, "
+            f"{state['failed']} failed."
+        ))
+
+    def finish_chunk(self, records, post_id, state, position):
+        """
+        Imports a chunk and checkpoints it. The new applicants are recorded
+        as pending before their processing is queued, so a crash or broker
+        failure in between is retried by the next run.
+        """
+        created_ids = self.import_chunk(records, post_id, state)
+        state['position'] = position
+        if self.enqueue:
+            state['pending'] = created_ids
+        save_checkpoint(self.checkpoint_path, state)
+        self.queue_processing(state)
+
+    def queue_processing(self, state):
+        if state.get('pending'):
+            group(process_resume_task.s(applicant_id) for applicant_id in state['pending']).apply_async()
+            state['pending'] = []
+            save_checkpoint(self.checkpoint_path, state)
+
+    def import_chunk(self, records, post_id, state):
+        """
+        Stores the chunk's files and bulk-creates its rows in one transaction.
+        If anything fails before the rows commit, the stored files are removed
+        again, so a re-run does not leave a second copy behind. Returns the new
+        applicant ids.
+        """
+        for record in records:
+            if 'error' in record:
+                self.stderr.write(f"⚠️ Skipping {record['error']}")
+                state['failed'] += 1
+        records = [record for record in records if 'error' not in record]
+
+        emails = [record['email'] for record in records]
+        existing = dict(Applicant.objects.filter(email__in=emails).values_list('email', 'applicant_id'))
+
+        applicants = []
+        try:
+            for record in records:
+                if record['email'] in existing:
+                    state['skipped'] += 1
+                    continue
+                existing[record['email']] = None  # Duplicate rows within the source
+                try:
+                    with record['open']() as f:
+                        stored_name = default_storage.save(f"resumes/{record['filename']}", File(f))
+                except (OSError, zipfile.BadZipFile) as e:
+                    self.stderr.write(f"⚠️ Skipping {record['filename']}: {e}")
+                    state['failed'] += 1
+                    continue
+                applicants.append(Applicant(
+                    first_name=record['first_name'], last_name=record['last_name'], email=record['email'],
+                    phone=record.get('phone'), location=record.get('location'), resume=stored_name,
+                ))
+
+            with transaction.atomic():
+                Applicant.objects.bulk_create(applicants)
+                # Re-read the ids: bulk_create does not set primary keys on MySQL
+                created_ids = list(
+                    Applicant.objects.filter(email__in=[a.email for a in applicants])
+                    .order_by('applicant_id').values_list('applicant_id', flat=True)
+                )
+                if post_id:
+                    applicant_ids = created_ids + [i for i in existing.values() if i]
+                    Application.objects.bulk_create(
+                        [Application(applicant_id=applicant_id, post_id=post_id) for applicant_id in applicant_ids],
+                        ignore_conflicts=True,
+                    )
+                    # bulk_create sends no post_save, so flag the job's analytics here
+                    queue_report_refresh(JobAdvertised.objects.filter(post_id=post_id).values_list('id', flat=True))
+        except BaseException:
+            # Nothing of this chunk was committed: drop its files too
+            for applicant in applicants:
+                default_storage.delete(applicant.resume.name)
+            raise
+
+        state['imported'] += len(created_ids)
+        return created_ids
+
+    def report(self, state, started, imported_at_start):
+        elapsed = time.monotonic() - started
+        rate = (state['imported'] - imported_at_start) / elapsed if elapsed else 0.0
+        self.stdout.write(
+            f"📦 {state['position']} read, {state['imported']} imported, {state['skipped']} skipped, "
+            f"{state['failed']} failed ({rate:.1f} resumes/s)"
+        )
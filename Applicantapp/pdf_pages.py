@@ -0,0 +1,75 @@
+import fitz  # PyMuPDF
+import numpy as np
+import xxhash
+from django.conf import settings
+
+# Read size when hashing uploaded files
+_HASH_CHUNK = 1024 * 1024
+
+# Characters produced when a PDF font has no usable unicode mapping
+_GARBAGE_CHARS = {'�', '\x00'}
+
+
+def text_layer_is_usable(text, page_rect):
+    """
+    Decides whether a page's native text layer can replace OCR.
+    Rejects pages that are (almost) empty, too sparse for their size
+    (e.g. a scanned page with only a header), or full of unmapped glyphs.
+    """
+    chars = len(text.strip())
+    if chars < settings.OCR_TEXT_LAYER_MIN_CHARS:
+        return False
+
+    # Characters per 10,000 pt² (an A4 page is ~50 units)
+    area_units = max(page_rect.width * page_rect.height / 10000, 1)
+    if chars / area_units < settings.OCR_TEXT_LAYER_MIN_DENSITY:
+        return False
+
+    garbage = sum(1 for ch in text if ch in _GARBAGE_CHARS)
+    return garbage / chars <= settings.OCR_TEXT_LAYER_MAX_GARBAGE_RATIO
+
+
+def read_text_layer(page):
+    """
+    Returns the page's embedded text if it is good enough, else None (caller falls back to OCR).
+    Born-digital PDFs (Word / Google Docs exports) take this path in milliseconds.
+    """
+    if not settings.OCR_TEXT_LAYER_FIRST:
+        return None
+    text = page.get_text("text", sort=True)
+    if text_layer_is_usable(text, page.rect):
+        return text.strip()
+    return None
+
+
+def render_page_for_ocr(page, zoom=2.0):
+    """
+    Rasterizes a page in memory for OCR and returns (pixmap, array).
+    The array is a zero-copy view of the pixmap's sample buffer, so the
+    pixmap must stay alive while the array is in use. Grayscale is what
+    EasyOCR's recognizer reads anyway, and it is a third of the size of RGB.
+    """
+    pix = page.get_pixmap(matrix=fitz.Matrix(zoom, zoom), colorspace=fitz.csGRAY, alpha=False)
+    samples = np.frombuffer(pix.samples_mv, dtype=np.uint8)
+    array = samples.reshape(pix.height, pix.stride)[:, :pix.width]
+    return pix, array
+
+
+def assemble_pages(entries):
+    """Joins page entries back in page order. Returns (full_text, page_sources)."""
+    entries = sorted(entries, key=lambda e: e["page"])
+    full_text = "".join(e["text"] + "\n\n" for e in entries if e["source"] != "error")
+    page_sources = [
+        {"page": e["page"], "source": e["source"], "chars": len(e["text"])}
+        for e in entries
+    ]
+    return full_text, page_sources
+
+
+def file_content_hash(path):
+    """xxh3-128 hex digest of a file, streamed in 1 MB chunks."""
+    hasher = xxhash.xxh3_128()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(_HASH_CHUNK), b''):
+            hasher.update(chunk)
+    return hasher.hexdigest()
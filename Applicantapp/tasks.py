@@ -1,20 +1,112 @@
-from celery import shared_task
+from celery import chord, group, shared_task
+from celery.exceptions import Ignore
 from django.conf import settings
 import os
+import shutil
 import fitz  # PyMuPDF
 from Applicantapp.models import Applicant
-from Extractionapp.models import ResumeExtraction
-import easyocr
+from Extractionapp.models import ExtractionCache, ResumeExtraction
+from Companyapp.tasks import index_candidate_embedding, score_applicant_matches
+from .pdf_pages import assemble_pages, file_content_hash, read_text_layer, render_page_for_ocr
+from Resumeanalyzer.model_registry import get_ocr_reader
 
-# Initialize reader once at module level (when worker starts)
-# This prevents reloading the model for every task
-print("🚀 [Celery] Initializing EasyOCR Reader...")
-READER = easyocr.Reader(['en'], gpu=False)
+# Preview folders checked against the database per query
+ORPHAN_CHECK_CHUNK = 500
 
-@shared_task
-def process_resume_task(applicant_id):
+def ocr_page(doc, page_num):
+    """
+    Rasterizes one page in memory and OCRs it.
+    Returns a page entry: {"page", "source", "text"}.
+    """
+    page = doc.load_page(page_num)
+    # Scale 2x for better OCR accuracy; no JPEG round-trip
+    pix, image = render_page_for_ocr(page, zoom=2.0)
+
+    print(f"   📄 Reading Text on Page {page_num+1}...")
+    result = get_ocr_reader().readtext(image, detail=0)
+    return {"page": page_num + 1, "source": "ocr", "text": "\n".join(result)}
+
+
+def reuse_cached_extraction(extraction, content_hash):
+    """
+    Copies a shared ExtractionCache entry (same file, same pipeline version)
+    onto this applicant's extraction. Returns True on a cache hit.
+    """
+    cached = ExtractionCache.objects.filter(
+        content_hash=content_hash,
+        pipeline_version=settings.RESUME_PIPELINE_VERSION
+    ).first()
+    if cached is None:
+        return False
+
+    for field in ExtractionCache.RESULT_FIELDS:
+        setattr(extraction, field, getattr(cached, field))
+    extraction.content_hash = content_hash
+    extraction.pipeline_version = settings.RESUME_PIPELINE_VERSION
+    extraction.processed = True
+    extraction.save()
+    return True
+
+
+def store_cached_extraction(extraction):
+    """Publishes a finished extraction so identical files skip the pipeline."""
+    ExtractionCache.objects.update_or_create(
+        content_hash=extraction.content_hash,
+        pipeline_version=extraction.pipeline_version,
+        defaults={field: getattr(extraction, field) for field in ExtractionCache.RESULT_FIELDS}
+    )
+
+
+def store_resume_text(applicant_id, entries, content_hash=''):
+    """
+    End of the OCR stage: saves the assembled text and hands the resume to
+    the NLP stage. Shared by the inline path and the per-page fan-out callback.
+    """
+    extraction, created = ResumeExtraction.objects.get_or_create(
+        applicant_id=applicant_id,
+        defaults={'processed': False}
+    )
+    full_text, page_sources = assemble_pages(entries)
+
+    # Save extracted text even if NLP fails
+    extraction.extracted_text = full_text
+    extraction.page_sources = page_sources
+    extraction.processed = False
+    extraction.save()
+
+    if not full_text.strip():
+        return "Warning: No text extracted from resume"
+
+    print(f"   📝 Extracted {len(full_text)} characters, queuing NLP analysis...")
+    extract_resume_insights.delay(applicant_id, content_hash)
+    return "Text extracted"
+
+
+def queue_matching_stage(applicant_id):
+    """Matching stage: match scores for every job applied for + the candidate search vector."""
+    score_applicant_matches.delay(applicant_id)
+    index_candidate_embedding.delay(applicant_id)
+
+
+def mark_failed(applicant_id):
+    """Best-effort: flag the extraction as not processed after a crash."""
+    try:
+        extraction = ResumeExtraction.objects.get(applicant_id=applicant_id)
+        extraction.processed = False
+        extraction.save()
+    except:
+        pass
+
+
+@shared_task(bind=True)
+def process_resume_task(self, applicant_id):
     """
-    Process resume: Extract text via OCR and analyze with NLP.
+    OCR stage of the resume pipeline (ocr queue):
+    text extraction → extract_resume_insights (nlp queue) → score_applicant_matches (matching queue).
+
+    Pages with a usable text layer are read directly. When several pages
+    need OCR they are fanned out as page-level subtasks (a chord) and
+    reassembled in page order; otherwise they are OCR'd inline.
     Returns status message.
     """
     try:
@@ -28,90 +120,73 @@ def process_resume_task(applicant_id):
             defaults={'processed': False}
         )
         
-        # === STEP 1: PDF to Images ===
+        # === STEP 1: Locate PDF ===
         pdf_path = applicant.resume.path
         if not os.path.exists(pdf_path):
             raise FileNotFoundError(f"Resume file not found: {pdf_path}")
-            
-        output_folder = os.path.join(
-            settings.MEDIA_ROOT, 
-            "resume_images", 
-            str(applicant.applicant_id)
-        )
-        os.makedirs(output_folder, exist_ok=True)
 
-        doc = fitz.open(pdf_path)
-        image_paths = []
-        full_text = ""
+        # === STEP 2: Skip files we have already analysed ===
+        content_hash = file_content_hash(pdf_path)
+        if (extraction.processed
+                and extraction.content_hash == content_hash
+                and extraction.pipeline_version == settings.RESUME_PIPELINE_VERSION):
+            print("   ⏭️ Resume unchanged since last run, skipping.")
+            # Still score it: this run may be for a new application to another job
+            queue_matching_stage(applicant.applicant_id)
+            return "Skipped: resume unchanged"
 
-        # === STEP 2: OCR Each Page ===
-        for page_num in range(len(doc)):
-            try:
-                page = doc.load_page(page_num)
-                
-                # Scale 2x for better OCR accuracy
-                mat = fitz.Matrix(2.0, 2.0)
-                pix = page.get_pixmap(matrix=mat)
-                
-                img_name = f"page_{page_num+1}.jpg"
-                img_path = os.path.join(output_folder, img_name)
-                pix.save(img_path)
-                
-                image_paths.append(
-                    f"resume_images/{applicant.applicant_id}/{img_name}"
-                )
-
-                # Run OCR on this page
-                print(f"   📄 Reading Text on Page {page_num+1}...")
-                result = READER.readtext(img_path, detail=0)
-                page_text = "\n".join(result)
-                full_text += page_text + "\n\n"
-                
-            except Exception as page_error:
-                print(f"⚠️ [Celery] Error on page {page_num+1}: {page_error}")
-                # Continue processing other pages
-                continue
-
-        doc.close()
-
-        # Save extracted text even if NLP fails
-        extraction.extracted_text = full_text
-        applicant.converted_images = image_paths
-        applicant.save()
-
-        if not full_text.strip():
-            extraction.processed = False
-            extraction.save()
-            return "Warning: No text extracted from resume"
-
-        # === STEP 3: NLP Analysis ===
-        try:
-            # Lazy import to avoid loading model at Django startup
-            from extract_insights import extract_insights
-            
-            print("   🧠 Running NLP Analysis...")
-            insights = extract_insights(full_text)
-
-            # Update extraction record
-            extraction.skills = insights.get("skills", [])
-            extraction.work_experience = insights.get("work_experience", [])
-            extraction.projects = insights.get("projects", [])
-            extraction.education = insights.get("education", [])
-            extraction.processed = True
-            extraction.save()
-
-            print(f"✅ [Celery] Success! Extracted {len(full_text)} characters.")
-            print(f"   📊 Skills: {len(insights.get('skills', []))}, "
-                  f"Experience: {len(insights.get('work_experience', []))}, "
-                  f"Education: {len(insights.get('education', []))}")
-            
-            return "Success"
-            
-        except Exception as nlp_error:
-            print(f"⚠️ [Celery] NLP Error: {nlp_error}")
-            extraction.processed = False
-            extraction.save()
-            return f"Partial: OCR succeeded, NLP failed: {nlp_error}"
+        # Preview images are optional and rendered separately at low priority
+        if settings.RESUME_PREVIEW_IMAGES:
+            render_resume_previews.apply_async(
+                args=[applicant.applicant_id], priority=settings.RESUME_PREVIEW_PRIORITY
+            )
+
+        # Same file uploaded by another applicant: reuse their extraction
+        if reuse_cached_extraction(extraction, content_hash):
+            print("   ♻️ Identical resume already analysed, reusing shared extraction.")
+            queue_matching_stage(applicant.applicant_id)
+            return "Success (cached)"
+
+        entries = []
+        ocr_pages = []
+
+        # === STEP 3: Text Layer First ===
+        with fitz.open(pdf_path) as doc:
+            for page_num in range(len(doc)):
+                try:
+                    # Born-digital pages already carry their text
+                    page_text = read_text_layer(doc.load_page(page_num))
+                except Exception as page_error:
+                    print(f"⚠️ [Celery] Error on page {page_num+1}: {page_error}")
+                    page_text = None
+
+                if page_text is None:
+                    ocr_pages.append(page_num)
+                else:
+                    print(f"   📄 Page {page_num+1}: using embedded text layer")
+                    entries.append({"page": page_num + 1, "source": "text", "text": page_text})
+
+            # === STEP 4a: Parallel OCR, one subtask per page ===
+            if settings.OCR_PAGE_FANOUT and len(ocr_pages) >= settings.OCR_PAGE_FANOUT_MIN_PAGES:
+                print(f"   🔀 Fanning out OCR for {len(ocr_pages)} page(s)...")
+                header = group(ocr_page_task.s(applicant_id, page_num) for page_num in ocr_pages)
+                # The callback reassembles pages in order and carries on with NLP
+                return self.replace(chord(header, assemble_resume_task.s(applicant_id, entries, content_hash)))
+
+            # === STEP 4b: Inline OCR ===
+            for page_num in ocr_pages:
+                try:
+                    entries.append(ocr_page(doc, page_num))
+                except Exception as page_error:
+                    print(f"⚠️ [Celery] Error on page {page_num+1}: {page_error}")
+                    # Continue processing other pages
+                    entries.append({"page": page_num + 1, "source": "error", "text": ""})
+
+        return store_resume_text(applicant_id, entries, content_hash)
+
+    except Ignore:
+        # Raised by self.replace() once the OCR fan-out is queued
+        raise
 
     except Applicant.DoesNotExist:
         error_msg = f"Applicant {applicant_id} not found"
@@ -121,10 +196,137 @@ def process_resume_task(applicant_id):
     except Exception as e:
         print(f"💥 [Celery] Critical Error: {e}")
         # Try to save error state
-        try:
-            extraction = ResumeExtraction.objects.get(applicant_id=applicant_id)
-            extraction.processed = False
-            extraction.save()
-        except:
-            pass
-        return f"Failed: {e}"
\ No newline at end of file
+        mark_failed(applicant_id)
+        return f"Failed: {e}"
+
+
+@shared_task
+def ocr_page_task(applicant_id, page_num):
+    """
+    OCRs a single resume page. Never raises: a failed page comes back as an
+    'error' entry so one bad page cannot sink the whole chord.
+    """
+    try:
+        applicant = Applicant.objects.get(applicant_id=applicant_id)
+        with fitz.open(applicant.resume.path) as doc:
+            return ocr_page(doc, page_num)
+    except Exception as page_error:
+        print(f"⚠️ [Celery] Error on page {page_num+1}: {page_error}")
+        return {"page": page_num + 1, "source": "error", "text": ""}
+
+
+@shared_task
+def assemble_resume_task(ocr_entries, applicant_id, text_entries, content_hash=''):
+    """Chord callback: merges OCR'd and text-layer pages in page order, then queues NLP."""
+    try:
+        return store_resume_text(applicant_id, list(text_entries) + list(ocr_entries), content_hash)
+    except Exception as e:
+        print(f"💥 [Celery] Critical Error: {e}")
+        mark_failed(applicant_id)
+        return f"Failed: {e}"
+
+
+@shared_task
+def extract_resume_insights(applicant_id, content_hash=''):
+    """
+    NLP stage: runs Flan-T5 over the extracted text, saves the insights and
+    queues match scoring (matching stage).
+    """
+    try:
+        extraction = ResumeExtraction.objects.get(applicant_id=applicant_id)
+    except ResumeExtraction.DoesNotExist:
+        return f"No extraction for applicant {applicant_id}"
+
+    try:
+        # Lazy import to avoid loading model at Django startup
+        from extract_insights import extract_insights, get_micro_batcher
+        
+        print(f"   🧠 Running NLP Analysis for Applicant ID: {applicant_id}...")
+        batcher = None
+        if settings.NLP_MICROBATCH:
+            batcher = get_micro_batcher(settings.NLP_MICROBATCH_MAX_ITEMS, settings.NLP_MICROBATCH_MAX_WAIT_MS)
+        insights = extract_insights(extraction.extracted_text, batched=settings.NLP_BATCHED_PROMPTS, batcher=batcher)
+
+        # Update extraction record
+        extraction.skills = insights.get("skills", [])
+        extraction.work_experience = insights.get("work_experience", [])
+        extraction.projects = insights.get("projects", [])
+        extraction.education = insights.get("education", [])
+        extraction.processed = True
+        extraction.content_hash = content_hash
+        extraction.pipeline_version = settings.RESUME_PIPELINE_VERSION
+        extraction.save()
+
+        if content_hash:
+            store_cached_extraction(extraction)
+
+        print(f"✅ [Celery] Success! Analysed {len(extraction.extracted_text)} characters.")
+        print(f"   📊 Skills: {len(insights.get('skills', []))}, "
+              f"Experience: {len(insights.get('work_experience', []))}, "
+              f"Education: {len(insights.get('education', []))}")
+        
+        # Precompute match scores and the candidate search vector
+        queue_matching_stage(applicant_id)
+        
+        return "Success"
+        
+    except Exception as nlp_error:
+        print(f"⚠️ [Celery] NLP Error: {nlp_error}")
+        extraction.processed = False
+        extraction.save()
+        return f"Partial: OCR succeeded, NLP failed: {nlp_error}"
+
+
+@shared_task
+def render_resume_previews(applicant_id):
+    """
+    Writes page preview JPEGs to MEDIA_ROOT/resume_images/<id>/ and records
+    them on Applicant.converted_images. Not needed for extraction, so it runs
+    apart from (and at a lower priority than) the OCR pipeline.
+    """
+    try:
+        applicant = Applicant.objects.get(applicant_id=applicant_id)
+    except Applicant.DoesNotExist:
+        return f"Applicant {applicant_id} not found"
+
+    pdf_path = applicant.resume.path
+    if not os.path.exists(pdf_path):
+        return f"Resume file not found: {pdf_path}"
+
+    output_folder = os.path.join(settings.MEDIA_ROOT, "resume_images", str(applicant_id))
+    os.makedirs(output_folder, exist_ok=True)
+
+    zoom = settings.RESUME_PREVIEW_ZOOM
+    image_paths = []
+    with fitz.open(pdf_path) as doc:
+        for page_num in range(len(doc)):
+            pix = doc.load_page(page_num).get_pixmap(matrix=fitz.Matrix(zoom, zoom))
+            img_name = f"page_{page_num+1}.jpg"
+            pix.save(os.path.join(output_folder, img_name))
+            image_paths.append(f"resume_images/{applicant_id}/{img_name}")
+
+    Applicant.objects.filter(applicant_id=applicant_id).update(converted_images=image_paths)
+    return f"Rendered {len(image_paths)} preview(s)"
+
+
+@shared_task
+def cleanup_orphaned_files():
+    """
+    Periodic clean-up (Celery beat) of what deleted rows leave behind:
+    - resume_images/<id>/ preview folders of applicants that no longer exist
+    - ExtractionCache entries from a superseded pipeline version (never read again)
+    """
+    images_root = os.path.join(settings.MEDIA_ROOT, "resume_images")
+    names = sorted(n for n in os.listdir(images_root) if n.isdigit()) if os.path.isdir(images_root) else []
+
+    removed = 0
+    for start in range(0, len(names), ORPHAN_CHECK_CHUNK):
+        ids = [int(name) for name in names[start:start + ORPHAN_CHECK_CHUNK]]
+        existing = set(Applicant.objects.filter(applicant_id__in=ids).values_list('applicant_id', flat=True))
+        for applicant_id in ids:
+            if applicant_id not in existing:
+                shutil.rmtree(os.path.join(images_root, str(applicant_id)), ignore_errors=True)
+                removed += 1
+
+    pruned, _ = ExtractionCache.objects.exclude(pipeline_version=settings.RESUME_PIPELINE_VERSION).delete()
+    return f"Removed {removed} preview folder(s), pruned {pruned} cache entries"
@@ -1,3 +1,579 @@
-from django.test import TestCase
+import json
+import os
+import tempfile
+import threading
+import zipfile
+from io import StringIO
+from types import SimpleNamespace
+from unittest import mock
 
-# Create your tests here.
+import fitz
+from celery import chord
+from celery.backends.cache import CacheBackend
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from django.contrib.auth.models import User
+from django.db import IntegrityError
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from .models import Applicant
+from .pdf_pages import (
+    assemble_pages, file_content_hash, read_text_layer, render_page_for_ocr, text_layer_is_usable
+)
+from .tasks import (
+    cleanup_orphaned_files, extract_resume_insights, ocr_page_task, process_resume_task, store_resume_text,
+)
+import extract_insights as insights_module
+from Analyzerapp.models import AnalyticsReport
+from Companyapp.models import Application, JobAdvertised, MatchResult
+from Companyapp.tests import FakeModelMixin, JobFixtureMixin
+from Extractionapp.models import ExtractionCache, ResumeExtraction
+from Resumeanalyzer import model_registry
+
+RESUME_TEXT = (
+    "Jane Doe - Software Engineer\n"
+    "Experience: Backend Developer at Acme (2019-2023), Python, Django, PostgreSQL\n"
+    "Education: BSc Computer Science, University of Nairobi\n"
+)
+
+
+def make_pdf(*page_texts):
+    """Builds an in-memory PDF with one page per text (empty string = no text layer)."""
+    doc = fitz.open()
+    for text in page_texts:
+        page = doc.new_page()
+        if text:
+            page.insert_textbox(fitz.Rect(50, 50, 550, 800), text, fontsize=11)
+    return fitz.open("pdf", doc.tobytes())
+
+
+class TextLayerTests(SimpleTestCase):
+    def test_born_digital_page_uses_text_layer(self):
+        doc = make_pdf(RESUME_TEXT * 3)
+        text = read_text_layer(doc.load_page(0))
+        self.assertIsNotNone(text)
+        self.assertIn("Software Engineer", text)
+
+    def test_page_without_text_falls_back_to_ocr(self):
+        doc = make_pdf("")
+        self.assertIsNone(read_text_layer(doc.load_page(0)))
+
+    def test_sparse_page_falls_back_to_ocr(self):
+        # A scanned page often only carries a short header in its text layer
+        page = make_pdf("Curriculum Vitae - Page 1 of 2 - Jane Doe - Nairobi").load_page(0)
+        with self.settings(OCR_TEXT_LAYER_MIN_DENSITY=5.0):
+            self.assertIsNone(read_text_layer(page))
+
+    def test_unmapped_glyphs_are_rejected(self):
+        rect = fitz.Rect(0, 0, 595, 842)
+        self.assertFalse(text_layer_is_usable("�" * 100 + "a" * 100, rect))
+        self.assertTrue(text_layer_is_usable("a" * 200, rect))
+
+    @override_settings(OCR_TEXT_LAYER_FIRST=False)
+    def test_mode_can_be_disabled(self):
+        doc = make_pdf(RESUME_TEXT * 3)
+        self.assertIsNone(read_text_layer(doc.load_page(0)))
+
+
+class InMemoryRasterTests(SimpleTestCase):
+    def test_array_is_a_view_of_the_pixmap(self):
+        page = make_pdf(RESUME_TEXT).load_page(0)
+        pix, image = render_page_for_ocr(page, zoom=2.0)
+        self.assertEqual(image.shape, (pix.height, pix.width))
+        self.assertEqual(image.dtype.name, 'uint8')
+        # Shares memory with the pixmap instead of copying it
+        self.assertEqual(image.tobytes(), pix.samples)
+        self.assertFalse(image.flags.owndata)
+        # Text pixels are darker than the white background
+        self.assertLess(image.min(), 128)
+
+
+class AssemblePagesTests(SimpleTestCase):
+    def test_pages_are_reassembled_in_order(self):
+        # Fan-out results arrive OCR pages first, text-layer pages after
+        entries = [
+            {"page": 3, "source": "ocr", "text": "third"},
+            {"page": 1, "source": "ocr", "text": "first"},
+            {"page": 2, "source": "text", "text": "second"},
+        ]
+        full_text, sources = assemble_pages(entries)
+        self.assertEqual(full_text, "first\n\nsecond\n\nthird\n\n")
+        self.assertEqual([s["source"] for s in sources], ["ocr", "text", "ocr"])
+
+    def test_failed_pages_are_recorded_but_skipped(self):
+        entries = [
+            {"page": 1, "source": "text", "text": "first"},
+            {"page": 2, "source": "error", "text": ""},
+        ]
+        full_text, sources = assemble_pages(entries)
+        self.assertEqual(full_text, "first\n\n")
+        self.assertEqual(sources[1], {"page": 2, "source": "error", "chars": 0})
+
+
+@override_settings(RESUME_PREVIEW_IMAGES=False, RESUME_PIPELINE_VERSION='test')
+class ContentHashDedupTests(TestCase):
+    def setUp(self):
+        self._media = tempfile.TemporaryDirectory()
+        self.enterContext(override_settings(MEDIA_ROOT=self._media.name))
+        self.addCleanup(self._media.cleanup)
+        self.pdf_bytes = make_pdf(RESUME_TEXT * 3).tobytes()
+
+    def create_applicant(self, n):
+        applicant = Applicant(first_name=f"Applicant{n}", last_name="Test", email=f"applicant{n}@example.com")
+        applicant.resume.save(f"applicant{n}.pdf", ContentFile(self.pdf_bytes), save=True)
+        return applicant
+
+    def test_hash_is_stable_and_content_based(self):
+        applicant = self.create_applicant(1)
+        other = self.create_applicant(2)
+        self.assertEqual(file_content_hash(applicant.resume.path), file_content_hash(other.resume.path))
+        self.assertEqual(len(file_content_hash(applicant.resume.path)), 32)
+
+        with open(other.resume.path, 'ab') as f:
+            f.write(b'%% edited')
+        self.assertNotEqual(file_content_hash(applicant.resume.path), file_content_hash(other.resume.path))
+
+    @mock.patch('Applicantapp.tasks.index_candidate_embedding')
+    @mock.patch('Applicantapp.tasks.score_applicant_matches')
+    def test_identical_upload_reuses_shared_extraction(self, score, index):
+        applicant = self.create_applicant(1)
+        digest = file_content_hash(applicant.resume.path)
+        ExtractionCache.objects.create(
+            content_hash=digest, pipeline_version='test',
+            extracted_text="cached text", skills=['Python'], education=['BSc'],
+        )
+
+        self.assertEqual(process_resume_task(applicant.applicant_id), "Success (cached)")
+        extraction = ResumeExtraction.objects.get(applicant=applicant)
+        self.assertTrue(extraction.processed)
+        self.assertEqual(extraction.skills, ['Python'])
+        self.assertEqual(extraction.content_hash, digest)
+        score.delay.assert_called_once_with(applicant.applicant_id)
+
+    @mock.patch('Applicantapp.tasks.index_candidate_embedding')
+    @mock.patch('Applicantapp.tasks.score_applicant_matches')
+    def test_unchanged_resume_is_skipped(self, score, index):
+        applicant = self.create_applicant(1)
+        ResumeExtraction.objects.create(
+            applicant=applicant, processed=True, pipeline_version='test',
+            content_hash=file_content_hash(applicant.resume.path),
+        )
+        with mock.patch('Applicantapp.tasks.extract_resume_insights') as nlp_stage:
+            self.assertEqual(process_resume_task(applicant.applicant_id), "Skipped: resume unchanged")
+        nlp_stage.delay.assert_not_called()
+
+        # A new pipeline version re-processes (here: served from the shared cache)
+        with self.settings(RESUME_PIPELINE_VERSION='test-2'):
+            ExtractionCache.objects.create(
+                content_hash=file_content_hash(applicant.resume.path), pipeline_version='test-2',
+            )
+            self.assertEqual(process_resume_task(applicant.applicant_id), "Success (cached)")
+
+    @mock.patch('Applicantapp.tasks.index_candidate_embedding')
+    @mock.patch('Applicantapp.tasks.score_applicant_matches')
+    def test_second_application_with_the_same_file_is_scored(self, score, index):
+        applicant = self.create_applicant(1)
+        ExtractionCache.objects.create(
+            content_hash=file_content_hash(applicant.resume.path), pipeline_version='test', skills=['Python'],
+        )
+        # apply_for_job runs the pipeline on every application
+        self.assertEqual(process_resume_task(applicant.applicant_id), "Success (cached)")
+        self.assertEqual(process_resume_task(applicant.applicant_id), "Skipped: resume unchanged")
+        self.assertEqual(score.delay.call_args_list, [mock.call(applicant.applicant_id)] * 2)
+        self.assertEqual(index.delay.call_count, 2)
+
+
+class FakeOCRReader:
+    """EasyOCR stand-in: returns "OCR call N" for the Nth page read; calls listed in fail_on raise."""
+    def __init__(self, fail_on=()):
+        self.calls = 0
+        self.fail_on = set(fail_on)
+
+    def readtext(self, image, detail=0):
+        self.calls += 1
+        if self.calls in self.fail_on:
+            raise RuntimeError("unreadable page")
+        return [f"OCR call {self.calls}"]
+
+
+@override_settings(RESUME_PREVIEW_IMAGES=False, RESUME_PIPELINE_VERSION='test',
+                   OCR_PAGE_FANOUT=True, OCR_PAGE_FANOUT_MIN_PAGES=2)
+class OCRFanOutTests(TestCase):
+    def setUp(self):
+        self._media = tempfile.TemporaryDirectory()
+        self.enterContext(override_settings(MEDIA_ROOT=self._media.name))
+        self.addCleanup(self._media.cleanup)
+        self.nlp_stage = self.enterContext(mock.patch('Applicantapp.tasks.extract_resume_insights'))
+        self.chord = self.enterContext(mock.patch('Applicantapp.tasks.chord', wraps=chord))
+        # Freezing a chord subscribes its group result to the result backend: keep that in memory
+        from Resumeanalyzer.celery import app
+        backend = CacheBackend(app=app, url='memory://')
+        self.enterContext(mock.patch.object(app._local, 'backend', backend, create=True))
+
+    def process(self, reader, *page_texts):
+        applicant = Applicant(first_name="Jane", last_name="Doe", email="jane@example.com")
+        applicant.resume.save("jane.pdf", ContentFile(make_pdf(*page_texts).tobytes()), save=True)
+        with mock.patch.dict(model_registry._models, {'ocr': reader}):
+            # apply() runs eagerly, chord included
+            status = process_resume_task.apply(args=[applicant.applicant_id]).get()
+        return status, ResumeExtraction.objects.get(applicant=applicant)
+
+    def test_scanned_pages_fan_out_and_reassemble_in_order(self):
+        status, extraction = self.process(FakeOCRReader(), RESUME_TEXT * 3, "", "")
+        self.assertEqual(status, "Text extracted")
+        self.chord.assert_called_once()
+        self.assertEqual([e["source"] for e in extraction.page_sources], ["text", "ocr", "ocr"])
+        self.assertLess(extraction.extracted_text.index("OCR call 1"), extraction.extracted_text.index("OCR call 2"))
+        self.nlp_stage.delay.assert_called_once()
+
+    def test_a_single_scanned_page_is_read_inline(self):
+        status, extraction = self.process(FakeOCRReader(), RESUME_TEXT * 3, "")
+        self.assertEqual(status, "Text extracted")
+        self.chord.assert_not_called()
+        self.assertEqual([e["source"] for e in extraction.page_sources], ["text", "ocr"])
+        self.assertIn("OCR call 1", extraction.extracted_text)
+
+    def test_a_failing_page_does_not_block_the_chord(self):
+        self.assertEqual(
+            ocr_page_task(0, 0), {"page": 1, "source": "error", "text": ""}  # Unknown applicant: marker, no raise
+        )
+        status, extraction = self.process(FakeOCRReader(fail_on={2}), "", "", "")
+        self.assertEqual(status, "Text extracted")
+        self.assertEqual([e["source"] for e in extraction.page_sources], ["ocr", "error", "ocr"])
+        self.assertIn("OCR call 3", extraction.extracted_text)
+        self.nlp_stage.delay.assert_called_once()
+
+
+class FakeTextPipeline:
+    """
+    Stand-in for the Flan-T5 pipeline: each answer echoes the first comma
+    separated item of the resume text. Records the size of every batch.
+    """
+    def __init__(self):
+        self.batches = []
+        self.generation_config = SimpleNamespace(max_new_tokens=None)
+        self.tokenizer = SimpleNamespace(decode=lambda ids, skip_special_tokens=True: ids[1])
+
+    def __call__(self, prompts, batch_size=1, max_length=20, return_tensors=False):
+        self.batches.append(len(prompts))
+        return [
+            {"generated_token_ids": [0, prompt.split("\n", 1)[1].split(",")[0]]}
+            for prompt in prompts
+        ]
+
+
+class FakeGreedyPipeline:
+    """
+    Seq2seq stand-in with Hugging Face length semantics: generated ids start
+    with the decoder start token and stop at EOS, max_length (start token
+    included) or 1 + generation_config.max_new_tokens when that is set.
+    A batch is generated up to the largest limit, as a padded batch would be.
+    """
+    START, EOS = "<pad>", "</s>"
+
+    def __init__(self, max_new_tokens=None):
+        self.generation_config = SimpleNamespace(max_new_tokens=max_new_tokens)
+        self.tokenizer = SimpleNamespace(decode=self.decode)
+
+    def decode(self, ids, skip_special_tokens=True):
+        return " ".join(t for t in ids if not (skip_special_tokens and t in (self.START, self.EOS)))
+
+    def generate(self, prompt, max_length):
+        # Greedy answer: the prompt body word by word, then EOS
+        answer = [self.START] + prompt.split("\n", 1)[1].replace(",", " ").split() + [self.EOS]
+        if self.generation_config.max_new_tokens is not None:
+            max_length = self.generation_config.max_new_tokens + 1
+        return answer[:max_length]
+
+    def __call__(self, prompts, batch_size=1, max_length=20, return_tensors=False):
+        if isinstance(prompts, str):
+            return [{"generated_text": self.decode(self.generate(prompts, max_length))}]
+        return [{"generated_token_ids": self.generate(prompt, max_length)} for prompt in prompts]
+
+
+class MicroBatchingTests(SimpleTestCase):
+    def setUp(self):
+        self.nlp = FakeTextPipeline()
+        patcher = mock.patch.dict(model_registry._models, {'nlp': self.nlp})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_concurrent_resumes_share_one_batch(self):
+        batcher = insights_module.MicroBatcher(max_items=6, max_wait_ms=2000)
+        results = {}
+
+        def run(name):
+            results[name] = batcher.ask(f"{name} resume")
+
+        threads = [threading.Thread(target=run, args=(name,)) for name in ("alice", "bob")]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join(timeout=5)
+
+        # Two resumes x three questions flushed together once the batch was full
+        self.assertEqual(self.nlp.batches, [6])
+        self.assertEqual(results["alice"]["skills"], "alice resume")
+        self.assertEqual(results["bob"]["experience"], "bob resume")
+
+    def test_errors_reach_every_waiting_task(self):
+        batcher = insights_module.MicroBatcher(nlp_factory=mock.Mock(side_effect=RuntimeError("OOM")), max_wait_ms=1)
+        with self.assertRaises(RuntimeError):
+            batcher.ask("resume")
+
+    def test_batched_answers_match_sequential_ones(self):
+        text = insights_module.prepare_text("Python, Django, SQL, Docker\nBackend Developer at Acme 2019 - 2023")
+        # Mixed limits: two answers are cut short, one ends at EOS
+        questions = [("skills", "Skills:", 3), ("education", "Education:", 6), ("experience", "Experience:", 40)]
+        for max_new_tokens, lengths in ((None, [2, 5, 11]), (4, [4, 4, 4])):
+            nlp = FakeGreedyPipeline(max_new_tokens=max_new_tokens)
+            with mock.patch.object(insights_module, 'QUESTIONS', questions):
+                sequential = insights_module.ask_sequential(nlp, text)
+                batched = insights_module.ask_batched(nlp, text)
+            self.assertEqual(batched, sequential)
+            self.assertEqual([len(answer.split()) for answer in batched.values()], lengths)
+
+
+class ModelRegistryTests(SimpleTestCase):
+    def test_importing_tasks_loads_no_models(self):
+        # Applicantapp.tasks is imported by the web process through views.py
+        self.assertFalse(any(model_registry.is_loaded(name) for name in model_registry.LOADERS))
+
+    @override_settings(WORKER_QUEUE_MODELS={'ocr': ['ocr'], 'matching': ['semantic'], 'nlp': ['nlp', 'semantic']})
+    def test_models_follow_consumed_queues(self):
+        self.assertEqual(model_registry.models_for_queues(['maintenance']), [])
+        self.assertEqual(model_registry.models_for_queues(['matching', 'nlp']), ['semantic', 'nlp'])
+
+    def test_models_load_once_on_first_use(self):
+        loader = mock.Mock(return_value=object())
+        with mock.patch.dict(model_registry.LOADERS, {'ocr': ("OCR", loader)}), \
+                mock.patch.dict(model_registry._models, clear=True):
+            self.assertIs(model_registry.get_ocr_reader(), model_registry.get_ocr_reader())
+        loader.assert_called_once_with()
+
+    def test_preloaded_models_are_frozen_for_fork(self):
+        import gc
+        import torch
+
+        model = torch.nn.Linear(4, 2)
+        loader = mock.Mock(return_value=model)
+        self.addCleanup(gc.unfreeze)
+        with mock.patch.dict(model_registry.LOADERS, {'nlp': ("NLP", loader)}), \
+                mock.patch.dict(model_registry._models, clear=True):
+            model_registry.preload_for_fork(['nlp'])
+            self.assertIs(model_registry.get_nlp_pipeline(), model)
+
+        self.assertFalse(model.training)
+        self.assertFalse(any(p.requires_grad for p in model.parameters()))
+        self.assertGreater(gc.get_freeze_count(), 0)
+
+
+class PipelineRoutingTests(TestCase):
+    def route(self, task):
+        from Resumeanalyzer.celery import app
+        return app.amqp.router.route({}, task.name)['queue'].name
+
+    def test_stages_run_on_their_own_queues(self):
+        from Companyapp.tasks import delete_expired_jobs, score_applicant_matches
+        self.assertEqual(self.route(process_resume_task), 'ocr')
+        self.assertEqual(self.route(extract_resume_insights), 'nlp')
+        self.assertEqual(self.route(score_applicant_matches), 'matching')
+        self.assertEqual(self.route(delete_expired_jobs), 'maintenance')
+        self.assertEqual(self.route(cleanup_orphaned_files), 'maintenance')
+
+    @mock.patch('Applicantapp.tasks.extract_resume_insights')
+    def test_ocr_stage_hands_text_to_nlp_stage(self, nlp_stage):
+        applicant = Applicant.objects.create(first_name="Jane", last_name="Doe", email="jane@example.com")
+        status = store_resume_text(applicant.applicant_id, [{"page": 1, "source": "text", "text": RESUME_TEXT}], 'abc')
+        self.assertEqual(status, "Text extracted")
+        self.assertEqual(ResumeExtraction.objects.get(applicant=applicant).extracted_text, RESUME_TEXT + "\n\n")
+        nlp_stage.delay.assert_called_once_with(applicant.applicant_id, 'abc')
+
+    @mock.patch('Applicantapp.tasks.index_candidate_embedding')
+    @mock.patch('Applicantapp.tasks.score_applicant_matches')
+    def test_nlp_stage_saves_insights_and_queues_matching(self, matching_stage, index_stage):
+        applicant = Applicant.objects.create(first_name="Jane", last_name="Doe", email="jane@example.com")
+        ResumeExtraction.objects.create(applicant=applicant, extracted_text=RESUME_TEXT)
+        with mock.patch.dict(model_registry._models, {'nlp': FakeTextPipeline()}):
+            self.assertEqual(extract_resume_insights(applicant.applicant_id, 'abc'), "Success")
+
+        extraction = ResumeExtraction.objects.get(applicant=applicant)
+        self.assertTrue(extraction.processed)
+        self.assertTrue(ExtractionCache.objects.filter(content_hash='abc').exists())
+        matching_stage.delay.assert_called_once_with(applicant.applicant_id)
+        index_stage.delay.assert_called_once_with(applicant.applicant_id)
+
+
+class JobFeedTests(FakeModelMixin, JobFixtureMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.jobs = [
+            self.create_job(skills, title=title)
+            for skills, title in (("java, spring", "Java Engineer"), ("python, django", "Web Developer"),
+                                  ("python, sql", "Data Engineer"))
+        ]
+        self.user = User.objects.create_user("jane", password="pw")
+        # Applied to the last post only: that job is hidden from the feed
+        self.applicant = self.create_applicant(1, ['Python', 'Django', 'SQL'])
+        self.jobs.pop()
+        self.jobs += [self.create_job("python", title="Python Developer"), self.create_job("cobol", title="Mainframe Operator")]
+        self.applicant.user = self.user
+        self.applicant.save()
+        self.client.force_login(self.user)
+
+    def test_feed_is_ranked_stored_and_paginated(self):
+        with self.settings(JOB_FEED_PAGE_SIZE=2):
+            first = self.client.get('/career/feed/')
+            second = self.client.get('/career/feed/', {'page': 2})
+
+        ranked = list(first.context['jobs']) + list(second.context['jobs'])
+        scores = [job.match_score for job in ranked]
+        self.assertEqual(len(ranked), 4)
+        self.assertEqual(scores, sorted(scores, reverse=True))
+        self.assertEqual(set(ranked), set(self.jobs))
+        self.assertEqual(MatchResult.objects.filter(applicant=self.applicant).count(), 4)
+
+    def test_only_changed_jobs_are_rescored(self):
+        self.client.get('/career/feed/')
+        stored = dict(MatchResult.objects.values_list('job_id', 'computed_at'))
+
+        job = self.jobs[0]
+        JobAdvertised.objects.filter(id=job.id).update(required_skills="python")
+        self.client.get('/career/feed/')
+        fresh = dict(MatchResult.objects.values_list('job_id', 'computed_at'))
+        self.assertNotEqual(fresh[job.id], stored[job.id])
+        self.assertEqual({k: v for k, v in fresh.items() if k != job.id},
+                         {k: v for k, v in stored.items() if k != job.id})
+
+
+@mock.patch('Applicantapp.management.commands.import_resumes.group')
+class ImportResumesCommandTests(JobFixtureMixin, TestCase):
+    def setUp(self):
+        self._media = tempfile.TemporaryDirectory()
+        self.enterContext(override_settings(MEDIA_ROOT=self._media.name))
+        self.addCleanup(self._media.cleanup)
+        self.source = os.path.join(self._media.name, 'drive')
+        os.makedirs(self.source)
+        self.pdf_bytes = make_pdf(RESUME_TEXT).tobytes()
+        for name in ["Jane_Doe.pdf", "John_Smith.pdf", "Ann_Lee.pdf", "notes.txt"]:
+            with open(os.path.join(self.source, name), 'wb') as f:
+                f.write(self.pdf_bytes)
+        self.job = self.create_job()
+
+    def run_import(self, *args):
+        out = StringIO()
+        call_command('import_resumes', self.source, '--job', str(self.job.id), *args, stdout=out, stderr=StringIO())
+        return out.getvalue()
+
+    def test_directory_import_creates_rows_in_chunks(self, group):
+        output = self.run_import('--batch-size', '2')
+        applicants = Applicant.objects.order_by('first_name')
+        self.assertEqual([a.first_name for a in applicants], ["Ann", "Jane", "John"])
+        self.assertEqual(applicants.get(first_name="Jane").last_name, "Doe")
+        self.assertTrue(all(a.email.endswith('@imported.invalid') for a in applicants))
+        self.assertEqual(Application.objects.filter(post=self.job.post).count(), 3)
+        # One processing group per chunk of two
+        self.assertEqual(group.call_count, 2)
+        self.assertIn("3 imported", output)
+
+    def test_interrupted_import_resumes_from_checkpoint(self, group):
+        real_save = default_storage.save
+        calls = []
+
+        def flaky_save(name, content):
+            calls.append(name)
+            if len(calls) == 3:
+                raise KeyboardInterrupt
+            return real_save(name, content)
+
+        with mock.patch.object(default_storage, 'save', side_effect=flaky_save):
+            with self.assertRaises(KeyboardInterrupt):
+                self.run_import('--batch-size', '2')
+        self.assertEqual(Applicant.objects.count(), 2)
+
+        output = self.run_import('--batch-size', '2')
+        self.assertIn("Resuming after record 2", output)
+        self.assertEqual(Applicant.objects.count(), 3)
+
+        # A finished import is a no-op, a restarted one only finds duplicates
+        self.run_import()
+        self.assertEqual(Applicant.objects.count(), 3)
+        self.assertIn("3 already present", self.run_import('--restart'))
+
+    def test_applicants_not_queued_before_a_crash_are_queued_on_resume(self, group):
+        group.return_value.apply_async.side_effect = [ConnectionError("broker down"), None]
+        with self.assertRaises(ConnectionError):
+            self.run_import()
+        # Committed, but their processing never reached the broker
+        self.assertEqual(Applicant.objects.count(), 3)
+
+        output = self.run_import()
+        self.assertIn("Re-queuing 3 applicant(s)", output)
+        queued = [s.args[0] for s in group.call_args_list[-1].args[0]]
+        self.assertEqual(sorted(queued), sorted(Applicant.objects.values_list('applicant_id', flat=True)))
+        self.assertEqual(group.return_value.apply_async.call_count, 2)
+
+    def test_failed_chunk_leaves_no_files_behind(self, group):
+        with mock.patch.object(Applicant.objects, 'bulk_create', side_effect=IntegrityError("duplicate email")):
+            with self.assertRaises(IntegrityError):
+                self.run_import()
+        self.assertEqual(os.listdir(os.path.join(self._media.name, 'resumes')), [])
+
+        self.run_import()
+        self.assertEqual(len(os.listdir(os.path.join(self._media.name, 'resumes'))), 3)
+
+    def test_imported_applications_mark_the_job_report_stale(self, group):
+        self.run_import('--no-process')
+        self.assertTrue(AnalyticsReport.objects.get(job=self.job).is_stale)
+
+    def test_jsonl_manifest_and_zip_archive(self, group):
+        manifest = os.path.join(self.source, 'drive.jsonl')
+        with open(manifest, 'w') as f:
+            f.write(json.dumps({"resume": "Jane_Doe.pdf", "email": "jane@example.com",
+                                "first_name": "Jane", "last_name": "Doe", "phone": "0700"}) + "\n")
+            f.write('{"resume": "John_Smith.pdf", "email": \n')
+            f.write(json.dumps({"resume": "Ann_Lee.pdf", "first_name": "Ann"}) + "\n")
+        output = StringIO()
+        call_command('import_resumes', manifest, '--no-process', stdout=output, stderr=StringIO())
+        self.assertEqual(Applicant.objects.get(email="jane@example.com").phone, "0700")
+        # Malformed lines are counted as failed and the checkpoint moves past them
+        self.assertIn("1 imported, 0 already present, 2 failed", output.getvalue())
+        with open(f"{manifest}.checkpoint.json") as f:
+            self.assertEqual(json.load(f)['position'], 3)
+        group.assert_not_called()
+
+        archive = os.path.join(self._media.name, 'drive.zip')
+        with zipfile.ZipFile(archive, 'w') as zf:
+            zf.writestr('cvs/Mary_Major.pdf', self.pdf_bytes)
+        call_command('import_resumes', archive, stdout=StringIO())
+        mary = Applicant.objects.get(first_name="Mary")
+        self.assertEqual(mary.resume.read(), self.pdf_bytes)
+
+
+class OrphanCleanupTests(TestCase):
+    def setUp(self):
+        self._media = tempfile.TemporaryDirectory()
+        self.enterContext(override_settings(MEDIA_ROOT=self._media.name))
+        self.addCleanup(self._media.cleanup)
+
+    def preview_folder(self, applicant_id):
+        folder = os.path.join(self._media.name, 'resume_images', str(applicant_id))
+        os.makedirs(folder)
+        with open(os.path.join(folder, 'page_1.jpg'), 'wb') as f:
+            f.write(b'jpg')
+        return folder
+
+    @override_settings(RESUME_PIPELINE_VERSION='2')
+    def test_removes_previews_of_deleted_applicants_and_stale_cache(self):
+        kept = Applicant.objects.create(first_name="Jane", last_name="Doe", email="jane@example.com")
+        gone = Applicant.objects.create(first_name="John", last_name="Doe", email="john@example.com")
+        kept_folder, gone_folder = self.preview_folder(kept.applicant_id), self.preview_folder(gone.applicant_id)
+        gone.delete()
+        ExtractionCache.objects.create(content_hash='old', pipeline_version='1')
+        ExtractionCache.objects.create(content_hash='new', pipeline_version='2')
+
+        self.assertEqual(cleanup_orphaned_files(), "Removed 1 preview folder(s), pruned 1 cache entries")
+        self.assertTrue(os.path.isdir(kept_folder))
+        self.assertFalse(os.path.exists(gone_folder))
+        self.assertEqual(list(ExtractionCache.objects.values_list('content_hash', flat=True)), ['new'])
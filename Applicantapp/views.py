@@ -1,14 +1,16 @@
 
+from django.conf import settings
 from django.contrib import messages
 from django.contrib.auth import login, logout
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth.forms import AuthenticationForm
+from django.core.paginator import Paginator
 from django.shortcuts import get_object_or_404, redirect, render
 from .forms import ApplicantApplyForm, ApplicantProfileForm, UserRegisterForm
 from .models import Applicant
 from .tasks import process_resume_task
-from Companyapp.matcher import calculate_match_percentage
 from Companyapp.models import Application, JobAdvertised
+from Companyapp.scoring import get_resume_data, sync_applicant_matches
 from Extractionapp.models import ResumeExtraction
 
 
@@ -104,8 +106,14 @@ def profile_edit(request):
     return render(request, 'profile_edit.html', {'form': form})
 
 def job_feed(request):
+    """
+    Open jobs; for a logged-in applicant, best match first.
+    All jobs are scored against the resume in one vectorized pass
+    (stored per applicant in MatchResult, recomputed only when a job or
+    the resume changes), then the ranked list is paginated.
+    """
     # 1. Start with all jobs
-    jobs = JobAdvertised.objects.all()
+    jobs = JobAdvertised.objects.select_related('post', 'department').prefetch_related('selected_courses')
     
     # If user is logged in, filter out applied jobs and run matching
     if request.user.is_authenticated:
@@ -113,18 +121,19 @@ def job_feed(request):
             profile = request.user.applicant_profile
             
        
-            applied_job_ids = Application.objects.filter(applicant=profile).values_list('post_id', flat=True)
+            applied_post_ids = Application.objects.filter(applicant=profile).values_list('post_id', flat=True)
             
        
-            jobs = jobs.exclude(id__in=applied_job_ids)
+            jobs = jobs.exclude(post_id__in=applied_post_ids)
      
-            if profile.extracted_data:
-                ranked_jobs = []
+            resume_data = get_resume_data(profile)
+            
+            if any(resume_data.get(k) for k in ('skills', 'work_experience', 'education')):
+                jobs = list(jobs)
+                match_results = sync_applicant_matches(profile.applicant_id, resume_data, jobs)
                 
                 for job in jobs:
-                    # Run the Matcher
-                    score_data = calculate_match_percentage(job, profile.extracted_data)
-                    score = score_data['total_score']
+                    score = match_results[job.id].total_score
                     
                     # Boost score if locations match
                     if profile.location and job.description and profile.location.lower() in job.description.lower():
@@ -132,16 +141,15 @@ def job_feed(request):
                     
                     # Attach score to job object temporarily
                     job.match_score = int(round(score))
-                    ranked_jobs.append(job)
                 
                 # Sort: Highest score first
-                ranked_jobs.sort(key=lambda x: x.match_score, reverse=True)
-                jobs = ranked_jobs
+                jobs.sort(key=lambda x: x.match_score, reverse=True)
                 
         except Applicant.DoesNotExist:
             pass # User is admin or company, show default list
 
-    return render(request, 'job_feed.html', {'jobs': jobs})
+    page_obj = Paginator(jobs, settings.JOB_FEED_PAGE_SIZE).get_page(request.GET.get('page'))
+    return render(request, 'job_feed.html', {'jobs': page_obj.object_list, 'page_obj': page_obj})
 
 
 
@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import JobAdvertised, Post, Application, Department, AcademicCourse,Company
+from .models import JobAdvertised, Post, Application, Department, AcademicCourse,Company, MatchResult, CandidateEmbedding, EmailDispatch, EmailRecipient
 
 # Register AcademicCourse with custom admin
 @admin.register(AcademicCourse)
@@ -24,8 +24,8 @@ class PostAdmin(admin.ModelAdmin):
 # Register JobAdvertised with improved display
 @admin.register(JobAdvertised)
 class JobAdvertisedAdmin(admin.ModelAdmin):
-    list_display = ['post', 'department', 'is_open', 'deadline', 'get_courses_count', 'created_at']
-    list_filter = ['department', 'created_at', 'required_education']
+    list_display = ['post', 'company', 'department', 'is_open', 'deadline', 'get_courses_count', 'created_at']
+    list_filter = ['company', 'department', 'created_at', 'required_education']
     search_fields = ['post__title', 'department__name', 'description']
     filter_horizontal = ['selected_courses']  # Better UI for many-to-many
     readonly_fields = ['created_at']
@@ -34,6 +34,33 @@ class JobAdvertisedAdmin(admin.ModelAdmin):
         return obj.selected_courses.count()
     get_courses_count.short_description = 'Accepted Courses'
 
+@admin.register(MatchResult)
+class MatchResultAdmin(admin.ModelAdmin):
+    list_display = ['applicant', 'job', 'total_score', 'computed_at']
+    list_filter = ['job']
+    search_fields = ['applicant__first_name', 'applicant__last_name', 'job__post__title']
+    readonly_fields = ['breakdown', 'version', 'computed_at']
+
+@admin.register(CandidateEmbedding)
+class CandidateEmbeddingAdmin(admin.ModelAdmin):
+    list_display = ['applicant', 'updated_at']
+    search_fields = ['applicant__first_name', 'applicant__last_name', 'applicant__email']
+    exclude = ['vector']
+    readonly_fields = ['version', 'updated_at']
+
+class EmailRecipientInline(admin.TabularInline):
+    model = EmailRecipient
+    extra = 0
+    fields = ['email', 'status', 'attempts', 'error']
+    readonly_fields = fields
+
+@admin.register(EmailDispatch)
+class EmailDispatchAdmin(admin.ModelAdmin):
+    list_display = ['subject', 'company', 'job', 'status', 'created_at', 'finished_at']
+    list_filter = ['status', 'company']
+    readonly_fields = ['status', 'created_at', 'finished_at']
+    inlines = [EmailRecipientInline]
+
 # Register remaining models
 admin.site.register(Application)
 admin.site.register(Department)
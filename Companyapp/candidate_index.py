@@ -0,0 +1,211 @@
+import hashlib
+import json
+import threading
+
+import numpy as np
+from django.conf import settings
+from django.db.models import Max
+
+from .matcher import clean_title_for_matching, encode_texts
+from .models import CandidateEmbedding
+
+_index = None
+
+
+# ==========================================
+# Profile vectors
+# ==========================================
+def profile_terms(skills, titles):
+    """Normalised skill and job-title strings a profile vector is built from."""
+    terms = [s.strip().lower() for s in skills if s and s.strip()]
+    terms += [t.lower() for t in (clean_title_for_matching(t) for t in titles) if t]
+    return list(dict.fromkeys(terms))
+
+
+def profile_vector(terms):
+    """
+    Mean of the term embeddings, re-normalised (None for an empty profile).
+    Terms are embedded one by one so they are shared through the embedding cache.
+    """
+    if not terms:
+        return None
+    vec = encode_texts(terms).mean(axis=0)
+    norm = np.linalg.norm(vec)
+    return (vec / norm).astype(np.float32) if norm else None
+
+
+def job_terms(job):
+    return profile_terms(job.required_skills.split(","), [job.post.title])
+
+
+def embedding_version(terms):
+    payload = json.dumps([settings.SEMANTIC_MODEL, terms])
+    return hashlib.sha1(payload.encode()).hexdigest()
+
+
+def index_applicant(applicant, resume_data):
+    """
+    Creates/updates the applicant's CandidateEmbedding from their resume data.
+    Returns False when nothing changed (or there is nothing to embed).
+    """
+    terms = profile_terms(resume_data.get('skills') or [], resume_data.get('work_experience') or [])
+    version = embedding_version(terms)
+
+    current = CandidateEmbedding.objects.filter(applicant=applicant).values_list('version', flat=True).first()
+    if current == version:
+        return False
+
+    vector = profile_vector(terms)
+    if vector is None:
+        CandidateEmbedding.objects.filter(applicant=applicant).delete()
+        return False
+
+    CandidateEmbedding.objects.update_or_create(
+        applicant=applicant,
+        defaults={'vector': vector.tobytes(), 'version': version},
+    )
+    return True
+
+
+# ==========================================
+# In-memory index
+# ==========================================
+class CandidateIndex:
+    """
+    All CandidateEmbedding vectors as one float32 matrix, so a query is a
+    single BLAS matvec + partial sort.
+
+    - refresh() pulls only rows updated since the last sync; a drop in the
+      row count (deleted applicants) triggers a full reload.
+    - Past settings.CANDIDATE_INDEX_IVF_THRESHOLD vectors, the matrix is
+      partitioned with k-means and a query only scans the nprobe nearest
+      partitions (approximate, IVF-style).
+    """
+
+    def __init__(self, ivf_threshold=50000, nprobe=8):
+        self.ivf_threshold = ivf_threshold
+        self.nprobe = nprobe
+        self._lock = threading.Lock()
+        self._row_of = {}                # applicant_id -> row
+        self._ids = np.zeros(0, dtype=np.int64)
+        self._matrix = None
+        self._synced_at = None
+        self._centroids = None
+        self._assign = None              # row -> partition (IVF mode only)
+
+    def __len__(self):
+        return len(self._ids)
+
+    def _load_rows(self, queryset):
+        ids, vectors = [], []
+        for applicant_id, blob in queryset.values_list('applicant_id', 'vector').iterator(chunk_size=2000):
+            ids.append(applicant_id)
+            vectors.append(np.frombuffer(blob, dtype=np.float32))
+        return ids, vectors
+
+    def refresh(self):
+        """Brings the matrix up to date with the CandidateEmbedding table."""
+        with self._lock:
+            latest = CandidateEmbedding.objects.aggregate(latest=Max('updated_at'))['latest']
+            total = CandidateEmbedding.objects.count()
+
+            if self._matrix is None or total < len(self._ids):
+                self._rebuild(*self._load_rows(CandidateEmbedding.objects.all()))
+            elif latest and latest >= self._synced_at:
+                # >=: rows saved in the same tick as the last sync are re-read (upserts are idempotent)
+                changed = CandidateEmbedding.objects.filter(updated_at__gte=self._synced_at)
+                self._upsert(*self._load_rows(changed))
+
+            if len(self._ids) != total:
+                # Rows were deleted and others added since the last sync
+                self._rebuild(*self._load_rows(CandidateEmbedding.objects.all()))
+            self._synced_at = latest
+        return self
+
+    def _rebuild(self, ids, vectors):
+        self._ids = np.asarray(ids, dtype=np.int64)
+        self._row_of = {applicant_id: row for row, applicant_id in enumerate(ids)}
+        self._matrix = np.vstack(vectors) if vectors else None
+        self._build_partitions()
+
+    def _upsert(self, ids, vectors):
+        new_ids, new_vectors = [], []
+        for applicant_id, vec in zip(ids, vectors):
+            row = self._row_of.get(applicant_id)
+            if row is None:
+                new_ids.append(applicant_id)
+                new_vectors.append(vec)
+            else:
+                self._matrix[row] = vec
+        if new_ids:
+            start = len(self._ids)
+            self._ids = np.concatenate([self._ids, np.asarray(new_ids, dtype=np.int64)])
+            self._matrix = np.vstack([self._matrix, *new_vectors])
+            self._row_of.update({applicant_id: start + i for i, applicant_id in enumerate(new_ids)})
+
+        if self._centroids is not None:
+            # Changed rows join their nearest existing partition; centroids are only retrained on a rebuild
+            rows = np.asarray([self._row_of[applicant_id] for applicant_id in ids], dtype=np.int64)
+            self._assign = np.resize(self._assign, len(self._ids))
+            self._assign[rows] = np.argmax(self._matrix[rows] @ self._centroids.T, axis=1)
+        elif len(self._ids) > self.ivf_threshold:
+            self._build_partitions()
+
+    def _build_partitions(self, iterations=8):
+        n = len(self._ids)
+        if self._matrix is None or n <= self.ivf_threshold:
+            self._centroids = self._assign = None
+            return
+
+        k = int(np.sqrt(n))
+        rng = np.random.default_rng(0)
+        centroids = self._matrix[rng.choice(n, k, replace=False)].copy()
+        for _ in range(iterations):
+            assign = np.argmax(self._matrix @ centroids.T, axis=1)
+            for c in range(k):
+                members = self._matrix[assign == c]
+                if len(members):
+                    mean = members.mean(axis=0)
+                    centroids[c] = mean / (np.linalg.norm(mean) or 1.0)
+        self._centroids = centroids
+        self._assign = np.argmax(self._matrix @ centroids.T, axis=1)
+
+    def search(self, query, k=50):
+        """Top-k (applicant_id, cosine similarity) pairs, best first."""
+        with self._lock:
+            return self._search(query, k)
+
+    def _search(self, query, k):
+        if query is None or self._matrix is None or k <= 0:
+            return []
+
+        if self._centroids is None:
+            rows = None
+            scores = self._matrix @ query
+        else:
+            probe = np.argsort(self._centroids @ query)[::-1][:self.nprobe]
+            rows = np.flatnonzero(np.isin(self._assign, probe))
+            scores = self._matrix[rows] @ query
+
+        k = min(k, len(scores))
+        if k == 0:
+            return []
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        ids = self._ids[top] if rows is None else self._ids[rows[top]]
+        return [(int(applicant_id), float(scores[i])) for applicant_id, i in zip(ids, top)]
+
+
+def get_candidate_index():
+    global _index
+    if _index is None:
+        _index = CandidateIndex(
+            ivf_threshold=settings.CANDIDATE_INDEX_IVF_THRESHOLD,
+            nprobe=settings.CANDIDATE_INDEX_NPROBE,
+        )
+    return _index.refresh()
+
+
+def search_candidates(job, k=50):
+    """Top-k applicants (from everyone with an embedding) whose profile is closest to the job."""
+    return get_candidate_index().search(profile_vector(job_terms(job)), k)
@@ -0,0 +1,119 @@
+"""
+SMTP credential provider.
+
+One MultiFernet cipher per process: ENCRYPTION_KEY encrypts, ENCRYPTION_KEY
+and every key in ENCRYPTION_OLD_KEYS decrypt, so keys can be rotated without
+downtime. Decrypted passwords are kept in memory for
+SMTP_CREDENTIAL_CACHE_SECONDS, keyed by company and ciphertext, so bulk-mail
+chunks do not decrypt the same password again and again.
+"""
+import threading
+import time
+
+from cryptography.fernet import Fernet, InvalidToken, MultiFernet
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+
+_cipher = None
+_primary = None
+_passwords = {}  # company_id -> (ciphertext, password, expires_at)
+_lock = threading.Lock()
+
+
+# ==========================================
+# Cipher
+# ==========================================
+def get_cipher():
+    global _cipher, _primary
+    if _cipher is None:
+        _primary = Fernet(settings.ENCRYPTION_KEY)
+        _cipher = MultiFernet([_primary] + [Fernet(key) for key in settings.ENCRYPTION_OLD_KEYS])
+    return _cipher
+
+
+def reset_cipher():
+    """Drops the cipher and every cached password (after the keys change)."""
+    global _cipher, _primary
+    with _lock:
+        _cipher = _primary = None
+        _passwords.clear()
+
+
+@receiver(setting_changed)
+def reset_cipher_on_key_change(setting, **kwargs):
+    if setting in ('ENCRYPTION_KEY', 'ENCRYPTION_OLD_KEYS'):
+        reset_cipher()
+
+
+def encrypt_secret(raw):
+    return get_cipher().encrypt(raw.encode()).decode()
+
+
+def decrypt_secret(token):
+    return get_cipher().decrypt(token.encode()).decode()
+
+
+# ==========================================
+# Cached SMTP passwords
+# ==========================================
+def get_smtp_password(company):
+    """The company's decrypted SMTP password (None when it has none)."""
+    token = company.smtp_password_encrypted
+    if not token:
+        return None
+
+    now = time.monotonic()
+    cached = _passwords.get(company.pk)
+    # A row whose ciphertext changed since (saved elsewhere) is a miss
+    if cached and cached[0] == token and cached[2] > now:
+        return cached[1]
+
+    password = decrypt_secret(token)
+    if company.pk is not None:
+        with _lock:
+            _passwords[company.pk] = (token, password, now + settings.SMTP_CREDENTIAL_CACHE_SECONDS)
+    return password
+
+
+def forget_smtp_password(company_id):
+    with _lock:
+        _passwords.pop(company_id, None)
+
+
+# ==========================================
+# Key rotation
+# ==========================================
+def rotate_smtp_passwords(batch_size=500):
+    """
+    Re-encrypts every stored SMTP password that is not under ENCRYPTION_KEY
+    yet, in batches. Returns the number of passwords re-encrypted.
+    """
+    # Lazy import: models.py imports this module
+    from .models import Company
+
+    cipher = get_cipher()
+    companies = (
+        Company.objects.exclude(smtp_password_encrypted__isnull=True)
+        .exclude(smtp_password_encrypted='')
+        .only('id', 'smtp_password_encrypted')
+        .order_by('id')
+    )
+
+    rotated = 0
+    batch = []
+    for company in companies.iterator(chunk_size=batch_size):
+        token = company.smtp_password_encrypted.encode()
+        try:
+            _primary.decrypt(token)
+            continue  # Already under the current key
+        except InvalidToken:
+            pass
+        company.smtp_password_encrypted = cipher.rotate(token).decode()
+        batch.append(company)
+        if len(batch) >= batch_size:
+            Company.objects.bulk_update(batch, ['smtp_password_encrypted'])
+            rotated += len(batch)
+            batch = []
+    Company.objects.bulk_update(batch, ['smtp_password_encrypted'])
+    return rotated + len(batch)
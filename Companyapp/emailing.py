@@ -0,0 +1,114 @@
+import smtplib
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMultiAlternatives
+from django.core.mail.backends.smtp import EmailBackend
+from django.db import transaction
+from django.utils import timezone
+
+from .models import Company, EmailDispatch, EmailRecipient
+
+
+# ==========================================
+# Queueing
+# ==========================================
+def create_dispatch(company, job, subject, message, applicants):
+    """Records a bulk send and one pending recipient per applicant (delivered by send_email_dispatch)."""
+    with transaction.atomic():
+        dispatch = EmailDispatch.objects.create(company=company, job=job, subject=subject, message=message)
+        EmailRecipient.objects.bulk_create([
+            EmailRecipient(dispatch=dispatch, applicant=applicant, email=applicant.email, first_name=applicant.first_name)
+            for applicant in applicants
+        ])
+    return dispatch
+
+
+def reserve_send_slots(company_id, count):
+    """
+    Books time for `count` emails within the company's smtp_rate_per_minute
+    and returns how many seconds from now they may start. The booking lives
+    on the Company row, so every dispatch and worker shares one budget.
+    """
+    with transaction.atomic():
+        company = Company.objects.select_for_update().only('smtp_rate_per_minute', 'email_slots_until').get(pk=company_id)
+        now = timezone.now()
+        start = max(now, company.email_slots_until or now)
+        rate = max(company.smtp_rate_per_minute, 1)
+        Company.objects.filter(pk=company_id).update(email_slots_until=start + timedelta(seconds=count * 60 / rate))
+    return (start - now).total_seconds()
+
+
+# ==========================================
+# Sending
+# ==========================================
+def smtp_connection(company):
+    """One SMTP connection for the company's server, reused for a whole chunk."""
+    return EmailBackend(
+        host=company.smtp_host,
+        port=company.smtp_port,
+        username=company.smtp_username,
+        password=company.get_smtp_password(),
+        use_tls=company.use_tls,
+        timeout=settings.EMAIL_SMTP_TIMEOUT,
+        fail_silently=False,
+    )
+
+
+def build_message(dispatch, recipient, connection):
+    return EmailMultiAlternatives(
+        subject=dispatch.subject,
+        body=f"Dear {recipient.first_name},\n\n{dispatch.message}\n\nBest regards,\n{dispatch.company.company_name}",
+        from_email=dispatch.company.smtp_username,
+        to=[recipient.email],
+        connection=connection,
+    )
+
+
+def is_permanent_failure(error):
+    """A 5xx reply (e.g. unknown mailbox) will fail again; 4xx replies and dropped connections may not."""
+    if isinstance(error, smtplib.SMTPRecipientsRefused):
+        return all(code >= 500 for code, _ in error.recipients.values())
+    if isinstance(error, smtplib.SMTPResponseException):
+        return error.smtp_code >= 500
+    return False
+
+
+def send_chunk(dispatch, recipients):
+    """
+    Sends each recipient's message over one reused connection. A failing
+    address never stops the others. Returns (sent, permanent, transient):
+    sent is a list of recipients, the others map recipient -> error text.
+    """
+    sent, permanent, transient = [], {}, {}
+    connection = smtp_connection(dispatch.company)
+    try:
+        with connection:
+            for recipient in recipients:
+                if connection.connection is None:
+                    # Reconnect after a dropped connection (a failed reconnect ends the chunk)
+                    connection.open()
+                try:
+                    connection.send_messages([build_message(dispatch, recipient, connection)])
+                    sent.append(recipient)
+                except (smtplib.SMTPException, OSError) as e:
+                    if is_permanent_failure(e):
+                        permanent[recipient] = str(e)
+                    else:
+                        transient[recipient] = str(e)
+                        if isinstance(e, (smtplib.SMTPServerDisconnected, OSError)):
+                            connection.close()
+    except (smtplib.SMTPException, OSError) as e:
+        # Could not (re)connect: everyone not handled yet is retried
+        for recipient in recipients:
+            if recipient not in sent and recipient not in permanent:
+                transient.setdefault(recipient, str(e))
+    return sent, permanent, transient
+
+
+def finish_dispatch_if_done(dispatch_id):
+    """Marks the dispatch done once no recipient is pending."""
+    if not EmailRecipient.objects.filter(dispatch_id=dispatch_id, status=EmailRecipient.STATUS_PENDING).exists():
+        EmailDispatch.objects.filter(pk=dispatch_id).exclude(status=EmailDispatch.STATUS_DONE).update(
+            status=EmailDispatch.STATUS_DONE, finished_at=timezone.now()
+        )
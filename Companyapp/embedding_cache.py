@@ -0,0 +1,141 @@
+import logging
+import os
+import re
+import sqlite3
+import threading
+from collections import OrderedDict
+
+import numpy as np
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+# SQLite caps the number of bound parameters per statement
+_SQL_CHUNK = 500
+
+_cache = None
+
+
+def normalize_text(text):
+    """
+    Cache key for a text: lowercased with whitespace collapsed.
+    all-MiniLM-L6-v2 uses an uncased tokenizer, so this does not change the embedding.
+    """
+    return re.sub(r'\s+', ' ', str(text)).strip().lower()
+
+
+class EmbeddingCache:
+    """
+    Two-tier embedding store keyed by (model name, normalized text).
+
+    - Tier 1: in-process LRU dict (fast, per process)
+    - Tier 2: SQLite file on disk (shared by the web process and every Celery worker)
+    """
+
+    def __init__(self, path, model_name, memory_items=20000):
+        self.path = str(path)
+        self.model_name = model_name
+        self.memory_items = memory_items
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    # ------------------------------------------
+    # Disk tier
+    # ------------------------------------------
+    def _connection(self):
+        # One connection per thread, re-opened after a fork (Celery prefork children)
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS embeddings ("
+                " model TEXT NOT NULL, text TEXT NOT NULL, vector BLOB NOT NULL,"
+                " PRIMARY KEY (model, text)) WITHOUT ROWID"
+            )
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def _read_disk(self, keys):
+        found = {}
+        try:
+            conn = self._connection()
+            for i in range(0, len(keys), _SQL_CHUNK):
+                chunk = keys[i:i + _SQL_CHUNK]
+                placeholders = ",".join("?" * len(chunk))
+                rows = conn.execute(
+                    f"SELECT text, vector FROM embeddings WHERE model = ? AND text IN ({placeholders})",
+                    [self.model_name, *chunk],
+                )
+                for text, blob in rows:
+                    found[text] = np.frombuffer(blob, dtype=np.float32)
+        except sqlite3.Error as e:
+            logger.warning(f"Embedding cache read failed, falling back to the model: {e}")
+        return found
+
+    def _write_disk(self, mapping):
+        try:
+            conn = self._connection()
+            with conn:
+                conn.executemany(
+                    "INSERT OR IGNORE INTO embeddings (model, text, vector) VALUES (?, ?, ?)",
+                    [(self.model_name, key, np.asarray(vec, dtype=np.float32).tobytes())
+                     for key, vec in mapping.items()],
+                )
+        except sqlite3.Error as e:
+            logger.warning(f"Embedding cache write failed: {e}")
+
+    # ------------------------------------------
+    # Memory tier
+    # ------------------------------------------
+    def _remember(self, key, vec):
+        self._memory[key] = vec
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_items:
+            self._memory.popitem(last=False)
+
+    # ------------------------------------------
+    # Public API
+    # ------------------------------------------
+    def get_many(self, keys):
+        """Returns {key: vector} for every key found in memory or on disk."""
+        found = {}
+        with self._lock:
+            for key in keys:
+                vec = self._memory.get(key)
+                if vec is not None:
+                    self._memory.move_to_end(key)
+                    found[key] = vec
+
+        missing = [k for k in dict.fromkeys(keys) if k not in found]
+        if missing:
+            from_disk = self._read_disk(missing)
+            with self._lock:
+                for key, vec in from_disk.items():
+                    self._remember(key, vec)
+            found.update(from_disk)
+        return found
+
+    def put_many(self, mapping):
+        """Stores freshly computed vectors in both tiers."""
+        if not mapping:
+            return
+        mapping = {k: np.asarray(v, dtype=np.float32) for k, v in mapping.items()}
+        with self._lock:
+            for key, vec in mapping.items():
+                self._remember(key, vec)
+        self._write_disk(mapping)
+
+
+def get_embedding_cache():
+    global _cache
+    if _cache is None:
+        _cache = EmbeddingCache(
+            settings.EMBEDDING_CACHE_PATH,
+            settings.SEMANTIC_MODEL,
+            memory_items=settings.EMBEDDING_CACHE_MEMORY_ITEMS,
+        )
+    return _cache
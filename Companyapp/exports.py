@@ -0,0 +1,148 @@
+import csv
+from itertools import islice
+
+from django.conf import settings
+
+from .scoring import get_resume_data, ranked_applications, sync_match_results
+
+# (column, type) in export order; the type is the Parquet column type
+EXPORT_COLUMNS = [
+    ('rank', 'int'),
+    ('applicant_id', 'int'),
+    ('first_name', 'string'),
+    ('last_name', 'string'),
+    ('email', 'string'),
+    ('phone', 'string'),
+    ('status', 'string'),
+    ('total_score', 'float'),
+    ('skills_score', 'float'),
+    ('experience_score', 'float'),
+    ('education_score', 'float'),
+    ('course_match_score', 'float'),
+    ('candidate_years', 'float'),
+    ('required_years', 'float'),
+    ('matched_skills', 'list'),
+    ('missing_skills', 'list'),
+    ('applied_at', 'timestamp'),
+]
+EXPORT_FIELDS = [name for name, _ in EXPORT_COLUMNS]
+LIST_SEPARATOR = "; "
+
+
+# ==========================================
+# Rows
+# ==========================================
+def export_rows(job):
+    """
+    The job's applicants in ranking order, one dict per applicant.
+    Applications are read through a server-side cursor in chunks of
+    EXPORT_CHUNK_SIZE, and each chunk's stored results are re-validated
+    against their version hash (missing or stale ones are rescored) before
+    it is written. The export therefore agrees with the ranked page, and
+    memory stays flat however many applied.
+    """
+    job_courses = job.get_selected_courses_list()
+    applications = ranked_applications(job).iterator(chunk_size=settings.EXPORT_CHUNK_SIZE)
+
+    rank = 0
+    while True:
+        chunk = list(islice(applications, settings.EXPORT_CHUNK_SIZE))
+        if not chunk:
+            break
+        results = sync_match_results(
+            job, {app.applicant_id: get_resume_data(app.applicant) for app in chunk}, job_courses=job_courses
+        )
+        # A row rescored just now may have moved within the chunk
+        chunk.sort(key=lambda app: results[app.applicant_id].total_score, reverse=True)
+
+        for app in chunk:
+            rank += 1
+            result = results[app.applicant_id].breakdown
+            extraction = getattr(app.applicant, 'resumeextraction', None)
+            if extraction is None:
+                status = "Not Started"
+            else:
+                status = "Processed" if extraction.processed else "Pending"
+            yield {
+                'rank': rank,
+                'applicant_id': app.applicant_id,
+                'first_name': app.applicant.first_name,
+                'last_name': app.applicant.last_name,
+                'email': app.applicant.email,
+                'phone': app.applicant.phone,
+                'status': status,
+                'total_score': result.get('total_score'),
+                'skills_score': result.get('skills_score'),
+                'experience_score': result.get('experience_score'),
+                'education_score': result.get('education_score'),
+                'course_match_score': result.get('course_match_score'),
+                'candidate_years': result.get('candidate_years'),
+                'required_years': result.get('required_years'),
+                'matched_skills': result.get('matched_skills', []),
+                'missing_skills': result.get('missing_skills', []),
+                'applied_at': app.applied_at,
+            }
+
+
+# ==========================================
+# CSV
+# ==========================================
+class Echo:
+    """File-like object whose write() returns the line, so csv.writer feeds a generator."""
+    def write(self, value):
+        return value
+
+
+def csv_lines(job):
+    """The export as CSV text, one line at a time (header first)."""
+    writer = csv.writer(Echo())
+    yield writer.writerow(EXPORT_FIELDS)
+    for row in export_rows(job):
+        yield writer.writerow([
+            LIST_SEPARATOR.join(value) if isinstance(value, list)
+            else value.isoformat() if hasattr(value, 'isoformat')
+            else value
+            for value in (row[name] for name in EXPORT_FIELDS)
+        ])
+
+
+# ==========================================
+# Parquet
+# ==========================================
+def parquet_schema():
+    import pyarrow as pa
+
+    types = {
+        'int': pa.int64(),
+        'string': pa.string(),
+        'float': pa.float64(),
+        'list': pa.list_(pa.string()),
+        'timestamp': pa.timestamp('us', tz='UTC'),
+    }
+    return pa.schema([(name, types[kind]) for name, kind in EXPORT_COLUMNS])
+
+
+def write_parquet(job, destination):
+    """
+    Writes the export as Parquet to a path or binary file, one row group
+    per EXPORT_CHUNK_SIZE applicants. Returns the number of rows written.
+    """
+    # Lazy import: pyarrow is only needed for this export
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = parquet_schema()
+    count = 0
+    chunk = []
+    with pq.ParquetWriter(destination, schema) as writer:
+        for row in export_rows(job):
+            chunk.append(row)
+            if len(chunk) >= settings.EXPORT_CHUNK_SIZE:
+                writer.write_table(pa.Table.from_pylist(chunk, schema=schema))
+                count += len(chunk)
+                chunk = []
+        if chunk or not count:
+            # An empty job still gets a valid file with the schema
+            writer.write_table(pa.Table.from_pylist(chunk, schema=schema))
+            count += len(chunk)
+    return count
@@ -263,7 +263,7 @@ class SMTPSettingsForm(forms.ModelForm):
 
     class Meta:
         model = Company
-        fields = ['smtp_host', 'smtp_port', 'smtp_username', 'use_tls']
+        fields = ['smtp_host', 'smtp_port', 'smtp_username', 'use_tls', 'smtp_rate_per_minute']
         widgets = {
             'smtp_host': forms.TextInput(attrs={"class": "...", "placeholder": "smtp.gmail.com"}),
             # ... styling widgets ...
@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+
+from Companyapp.models import JobAdvertised
+from Companyapp.scoring import missing_match_results
+from Companyapp.tasks import score_job_matches
+
+
+class Command(BaseCommand):
+    help = (
+        "Queues score_job_matches for every job with applicants that have no stored match result "
+        "(run once after deploying stored match results, so ranking pages never score inline)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true', help="Queue every job, not only those with missing rows")
+
+    def handle(self, *args, **options):
+        queued = 0
+        for job in JobAdvertised.objects.select_related('post').order_by('id').iterator(chunk_size=500):
+            if options['all'] or missing_match_results(job).exists():
+                score_job_matches.delay(job.id)
+                queued += 1
+        self.stdout.write(self.style.SUCCESS(f"✅ Queued scoring for {queued} job(s)."))
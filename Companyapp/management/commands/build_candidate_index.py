@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from Applicantapp.models import Applicant
+from Companyapp.candidate_index import index_applicant
+from Companyapp.scoring import get_resume_data
+
+
+class Command(BaseCommand):
+    help = "Embeds every applicant profile for candidate search (unchanged profiles are skipped)."
+
+    def handle(self, *args, **options):
+        applicants = Applicant.objects.select_related('resumeextraction').order_by('applicant_id')
+        indexed = 0
+        for applicant in applicants.iterator(chunk_size=500):
+            if index_applicant(applicant, get_resume_data(applicant)):
+                indexed += 1
+        self.stdout.write(self.style.SUCCESS(f"✅ Indexed {indexed} candidate profile(s)."))
@@ -0,0 +1,40 @@
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+
+from Companyapp.exports import csv_lines, write_parquet
+from Companyapp.models import JobAdvertised
+
+
+class Command(BaseCommand):
+    help = (
+        "Exports a job's ranked applicants (scores, matched/missing skills, years) to CSV or Parquet. "
+        "Rows are streamed from the database, so memory stays flat for any number of applicants."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('job_id', type=int)
+        parser.add_argument('output', help="Output file (.csv or .parquet)")
+        parser.add_argument('--format', choices=['csv', 'parquet'], help="Default: from the output extension")
+
+    def handle(self, *args, **options):
+        try:
+            job = JobAdvertised.objects.select_related('post').get(id=options['job_id'])
+        except JobAdvertised.DoesNotExist:
+            raise CommandError(f"Job {options['job_id']} not found")
+
+        output = options['output']
+        export_format = options['format'] or ('parquet' if output.endswith('.parquet') else 'csv')
+
+        if export_format == 'parquet':
+            count = write_parquet(job, output)
+        else:
+            count = -1  # Header line
+            with open(output, 'w', encoding='utf-8', newline='') as f:
+                for line in csv_lines(job):
+                    f.write(line)
+                    count += 1
+
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ Exported {count} applicant(s) for \"{job.post.title}\" to {os.path.abspath(output)}"
+        ))
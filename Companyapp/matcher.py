@@ -1,83 +1,130 @@
-import re
-from datetime import datetime
 from difflib import SequenceMatcher
-from sentence_transformers import SentenceTransformer, util
-
-# Global cache for the AI model to prevent reloading it on every request
-_semantic_model = None
-
-def get_semantic_model():
-    global _semantic_model
-    if _semantic_model is None:
-        print("   🧠 [System] Loading Semantic Matching Model (all-MiniLM-L6-v2)...")
-        _semantic_model = SentenceTransformer('all-MiniLM-L6-v2')
-    return _semantic_model
+from functools import lru_cache
+import numpy as np
+from rapidfuzz import fuzz, process
+from Resumeanalyzer.model_registry import get_semantic_model
+from text_normalization import clean_title as clean_title_for_matching, clean_titles, education_level, education_rank
+from text_normalization import parse_years as parse_years_from_entry, parse_years_many
+from .embedding_cache import get_embedding_cache, normalize_text
 
 def get_similarity_score(text1, text2):
     """
     Calculates semantic similarity between two texts (0 to 1).
     Uses AI to understand that 'Coder' is similar to 'Developer'.
     """
-    model = get_semantic_model()
-    # Encode sentences to get their embeddings
-    emb1 = model.encode(text1, convert_to_tensor=True)
-    emb2 = model.encode(text2, convert_to_tensor=True)
-    # Compute cosine similarity
-    return float(util.pytorch_cos_sim(emb1, emb2)[0][0])
-
-def parse_years_from_entry(entry):
+    emb1, emb2 = encode_texts([text1, text2])
+    # Embeddings are normalised, so the dot product is the cosine similarity
+    return float(emb1 @ emb2)
+
+def encode_texts(texts):
     """
-    Extracts duration from job entries like:
-    - "Software Engineer (2 yrs)"
-    - "DevOps (2019-2022)"
-    - "Manager (2020-Present)"
+    Returns L2-normalised embeddings (one row per text).
+    Warm texts come from the embedding cache; only the misses are sent
+    to the model, in ONE batched forward pass.
     """
-    current_year = datetime.now().year
-    text = entry.lower()
-
-    # Case 1: Explicit "(2 years)"
-    match = re.search(r'\b(\d+)\s*(?:yr|yrs|year|years)\b', text)
-    if match:
-        years = int(match.group(1))
-        # Sanity check: ignore unrealistic durations (>40 years)
-        if 0 < years <= 40:
-            return years
-
-    # Case 2: Year Range "2019 - 2022"
-    range_match = re.findall(r'(20\d{2})\s*[-/–]\s*(20\d{2})', text)
-    if range_match:
-        start, end = map(int, range_match[-1])
-        return max(1, end - start)
-
-    # Case 3: "2020 - Present"
-    years_found = re.findall(r'20\d{2}', text)
-    if years_found and any(k in text for k in ['present', 'current', 'now']):
-        start = int(years_found[0])
-        return max(1, current_year - start)
-
-    return 0
-
-def clean_title_for_matching(entry):
+    keys = [normalize_text(t) for t in texts]
+    if not keys:
+        return np.zeros((0, 0), dtype=np.float32)
+
+    cache = get_embedding_cache()
+    vectors = cache.get_many(keys)
+
+    misses = [k for k in dict.fromkeys(keys) if k not in vectors]
+    if misses:
+        model = get_semantic_model()
+        encoded = model.encode(misses, convert_to_numpy=True, normalize_embeddings=True)
+        fresh = dict(zip(misses, encoded))
+        cache.put_many(fresh)
+        vectors.update(fresh)
+
+    return np.stack([vectors[k] for k in keys]).astype(np.float32, copy=False)
+
+def get_similarity_matrix(texts1, texts2):
     """
-    Cleans a job entry to isolate the job title for AI comparison.
-    Input: "Senior Developer at Google (2020-2022)"
-    Output: "Senior Developer"
+    Cosine similarity between every text in texts1 and every text in texts2.
+    Each side is encoded once, then the whole matrix is a single matmul.
+    Returns a len(texts1) x len(texts2) numpy array.
     """
-    t = entry.lower()
-    # Remove content in parentheses
-    t = re.sub(r'\(.*?\)', '', t)
-    # Remove years
-    t = re.sub(r'\b20\d{2}\b', '', t)
-    # Remove standard stop words
-    for stop_word in [" at ", " with ", " for ", " in ", " on "]:
-        if stop_word in t:
-            t = t.split(stop_word)[0]
-    return t.strip().title()
+    if not texts1 or not texts2:
+        return np.zeros((len(texts1), len(texts2)), dtype=np.float32)
+    return encode_texts(texts1) @ encode_texts(texts2).T
+
+def match_skills(req_skills, cand_skills, threshold=0.6, best_scores=None):
+    """
+    Batched skill matcher. Returns (matched_skills, missing_skills).
+    A required skill matches if it is a substring of a candidate skill,
+    otherwise if its best semantic similarity reaches the threshold.
+    best_scores ({required skill: best similarity}) skips the model entirely.
+    """
+    exact = [any(req in cs for cs in cand_skills) for req in req_skills]
+
+    # Only the skills without an exact hit need the AI fallback
+    pending = [req for req, hit in zip(req_skills, exact) if not hit]
+    semantic_hits = set()
+    if pending and cand_skills:
+        if best_scores is None:
+            best_scores = dict(zip(pending, get_similarity_matrix(pending, cand_skills).max(axis=1)))
+        semantic_hits = {req for req in pending if best_scores[req] >= threshold}
+
+    matched_skills = [req for req, hit in zip(req_skills, exact) if hit or req in semantic_hits]
+    missing_skills = [s for s in req_skills if s not in matched_skills]
+    return matched_skills, missing_skills
+
+@lru_cache(maxsize=4096)
+def normalize_course(name):
+    """AcademicCourse names are a small fixed set: normalise each one once."""
+    return name.lower().strip()
 
 def match_academic_courses(job_courses, candidate_education, threshold=0.75):
     """
     Matches specific academic courses (e.g., 'Computer Science').
-    Uses fuzzy string matching.
+    Uses fuzzy string matching: same results as match_academic_courses_reference
+    (difflib), but only pairs that can reach the threshold are compared there.
+
+    difflib's ratio never exceeds RapidFuzz's Indel ratio (its matching blocks
+    are a common subsequence), which in turn never exceeds the length bound
+    2*min(len)/(len+len). So pairs are pruned by length, then by one
+    process.cdist call, and only the survivors are confirmed with difflib.
+    """
+    if not job_courses or not candidate_education:
+        return {'matched_courses': [], 'match_percentage': 100.0 if not job_courses else 0.0}
+    
+    job_courses_normalized = [normalize_course(course) for course in job_courses]
+    education_text = " ".join(candidate_education).lower()
+    education_lower = [edu_entry.lower() for edu_entry in candidate_education]
+    
+    # Direct match found in education text
+    matched = [course_lower in education_text for course_lower in job_courses_normalized]
+    pending = [idx for idx, hit in enumerate(matched) if not hit]
+    
+    if pending:
+        course_lengths = np.array([len(job_courses_normalized[idx]) for idx in pending])[:, None]
+        entry_lengths = np.array([len(edu) for edu in education_lower])[None, :]
+        length_bound = 2 * np.minimum(course_lengths, entry_lengths) >= threshold * (course_lengths + entry_lengths)
+        
+        if length_bound.any():
+            # Small margin: this is only a prefilter, difflib has the final say
+            bounds = process.cdist(
+                [job_courses_normalized[idx] for idx in pending], education_lower,
+                scorer=fuzz.ratio, score_cutoff=threshold * 100 - 0.01,
+            )
+            for row, idx in enumerate(pending):
+                for col in np.flatnonzero(length_bound[row] & (bounds[row] > 0)):
+                    if SequenceMatcher(None, job_courses_normalized[idx], education_lower[col]).ratio() >= threshold:
+                        matched[idx] = True
+                        break
+    
+    matched_courses = [course for course, hit in zip(job_courses, matched) if hit]
+    match_percentage = (len(matched_courses) / len(job_courses)) * 100
+    return {
+        'matched_courses': list(set(matched_courses)),
+        'match_percentage': round(match_percentage, 1)
+    }
+
+def match_academic_courses_reference(job_courses, candidate_education, threshold=0.75):
+    """
+    Original pure-difflib course matcher (every course x every entry).
+    Kept as the reference match_academic_courses is tested against.
     """
     if not job_courses or not candidate_education:
         return {'matched_courses': [], 'match_percentage': 100.0 if not job_courses else 0.0}
@@ -105,7 +152,17 @@ def match_academic_courses(job_courses, candidate_education, threshold=0.75):
         'match_percentage': round(match_percentage, 1)
     }
 
-def calculate_match_percentage(job_advert, resume_data, linkedin_data=None, job_courses=None):
+def parse_required_skills(job_advert):
+    return [s.strip().lower() for s in job_advert.required_skills.split(",") if s.strip()]
+
+def precompute_job_embeddings(job_advert):
+    """
+    Warms the embedding cache with a job's requirements (title + required skills),
+    so scoring it against applicants never has to encode the job side.
+    """
+    return encode_texts([job_advert.post.title] + parse_required_skills(job_advert))
+
+def calculate_match_percentage(job_advert, resume_data, linkedin_data=None, job_courses=None, similarities=None):
     """
     HYBRID MATCHING ENGINE
     
@@ -113,6 +170,9 @@ def calculate_match_percentage(job_advert, resume_data, linkedin_data=None, job_
     - Skills: 80% (Semantic AI Match)
     - Experience: 10% (Context-Aware AI Match)
     - Education: 10% (Strict Hierarchy)
+
+    similarities: optional precomputed {'titles': {role: [score per work entry]},
+    'skills': {required skill: best score}} from calculate_match_percentages.
     """
     
     target_role = job_advert.post.title
@@ -138,13 +198,17 @@ def calculate_match_percentage(job_advert, resume_data, linkedin_data=None, job_
     required_years = job_advert.min_experience_years
 
     # Only count years if the job title is semantically similar to the target role
-    for job_entry in resume_jobs:
-        job_title = clean_title_for_matching(job_entry)
-        years = parse_years_from_entry(job_entry)
-        
-        # AI Similarity Check (Threshold 0.45 usually catches 'Dev' vs 'Engineer')
-        if get_similarity_score(target_role, job_title) >= 0.45:
-            total_relevant_years += years
+    if resume_jobs:
+        if similarities is not None:
+            title_scores = similarities['titles'][target_role]
+        else:
+            # One batched encode for all titles instead of one call per entry
+            title_scores = get_similarity_matrix([target_role], clean_titles(resume_jobs))[0]
+
+        for years, score in zip(parse_years_many(resume_jobs), title_scores):
+            # AI Similarity Check (Threshold 0.45 usually catches 'Dev' vs 'Engineer')
+            if score >= 0.45:
+                total_relevant_years += years
 
     # Add LinkedIn years if available (assume they are relevant for now)
     if linkedin_data and 'years_experience' in linkedin_data:
@@ -167,35 +231,21 @@ def calculate_match_percentage(job_advert, resume_data, linkedin_data=None, job_
     # ==========================================
     # 2. SKILLS MATCHING (80%) - AI Powered
     # ==========================================
-    req_skills = [s.strip().lower() for s in job_advert.required_skills.split(",") if s.strip()]
+    req_skills = parse_required_skills(job_advert)
     cand_skills = [s.lower() for s in resume_data.get("skills", [])]
+    best_scores = similarities['skills'] if similarities is not None else None
     
     if linkedin_data and 'skills' in linkedin_data:
         cand_skills += [s.lower() for s in linkedin_data['skills']]
+        best_scores = None  # Precomputed scores only cover the resume skills
 
-    matched_skills = []
-    
     if req_skills:
-        for req in req_skills:
-            # Check for exact match first (fast)
-            if any(req in cs for cs in cand_skills):
-                matched_skills.append(req)
-                continue
-            
-            # Fallback to AI Semantic Match (slower but smarter)
-            # Checks if 'req' is similar to any 'cand_skill'
-            best_match_score = 0
-            for cs in cand_skills:
-                score = get_similarity_score(req, cs)
-                if score > best_match_score:
-                    best_match_score = score
-            
-            # Threshold 0.6 is good for short text similarity
-            if best_match_score >= 0.6:
-                matched_skills.append(req)
+        # Exact match first (fast), then one batched AI pass for the rest.
+        # Threshold 0.6 is good for short text similarity
+        matched_skills, missing_skills = match_skills(req_skills, cand_skills, threshold=0.6, best_scores=best_scores)
 
         breakdown['matched_skills'] = matched_skills
-        breakdown['missing_skills'] = [s for s in req_skills if s not in matched_skills]
+        breakdown['missing_skills'] = missing_skills
         
         skills_score = round((len(matched_skills) / len(req_skills)) * 100)
         breakdown['skills_score'] = skills_score
@@ -207,28 +257,12 @@ def calculate_match_percentage(job_advert, resume_data, linkedin_data=None, job_
     # ==========================================
     # 3. EDUCATION MATCHING (10%) - Strict
     # ==========================================
-    edu_levels = {
-        "certificate": 1, 
-        "diploma": 2, "associate": 2, "hnd": 2,
-        "bachelor": 3, "degree": 3, "bsc": 3, "b.sc": 3, "undergraduate": 3,
-        "master": 4, "msc": 4, "mba": 4, "postgraduate": 4,
-        "phd": 5, "doctorate": 5
-    }
-
-    # Determine Required Level
-    req_str = job_advert.required_education.lower()
-    req_level = 1
-    for key, val in edu_levels.items():
-        if key in req_str:
-            req_level = max(req_level, val)
-
-    # Determine Candidate Level
-    cand_max_level = 0
-    for edu in resume_data.get("education", []):
-        e_lower = edu.lower()
-        for key, val in edu_levels.items():
-            if key in e_lower:
-                cand_max_level = max(cand_max_level, val)
+    # Levels from text_normalization.EDUCATION_LEVELS (certificate 1 ... doctorate 5)
+    req_level = max(1, education_rank(job_advert.required_education))
+    # Classified at extraction time (ResumeExtraction.education_level) when the data comes from there
+    cand_max_level = resume_data.get("education_level")
+    if cand_max_level is None:
+        cand_max_level = education_level(resume_data.get("education", []))
 
     breakdown['required_education_level'] = req_level
     breakdown['candidate_education_level'] = cand_max_level
@@ -258,6 +292,36 @@ def calculate_match_percentage(job_advert, resume_data, linkedin_data=None, job_
 
     return breakdown
 
+def calculate_match_percentages(jobs, resume_data, job_courses_by_job=None):
+    """
+    Scores one resume against many jobs: {job.id: breakdown}.
+    Every similarity the per-job engine needs is computed up front in two
+    matrix products (all job titles x work entries, all required skills x
+    candidate skills), then each job is scored without touching the model.
+    Gives the same breakdowns as calling calculate_match_percentage per job.
+    """
+    job_courses_by_job = job_courses_by_job or {}
+    resume_jobs = resume_data.get("work_experience", [])
+    cand_skills = [s.lower() for s in resume_data.get("skills", [])]
+
+    roles = list(dict.fromkeys(job.post.title for job in jobs))
+    titles = {}
+    if resume_jobs and roles:
+        titles = dict(zip(roles, get_similarity_matrix(roles, clean_titles(resume_jobs))))
+
+    required = list(dict.fromkeys(skill for job in jobs for skill in parse_required_skills(job)))
+    skills = {}
+    if required and cand_skills:
+        skills = dict(zip(required, get_similarity_matrix(required, cand_skills).max(axis=1)))
+
+    similarities = {'titles': titles, 'skills': skills}
+    return {
+        job.id: calculate_match_percentage(
+            job, resume_data, job_courses=job_courses_by_job.get(job.id), similarities=similarities
+        )
+        for job in jobs
+    }
+
 def get_match_rating(score):
     if score >= 80: return "Excellent Match"
     elif score >= 60: return "Good Match"
@@ -0,0 +1,32 @@
+# Generated by Django 5.2.8 on 2026-10-18 03:35
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Applicantapp', '0001_initial'),
+        ('Companyapp', '0002_company_smtp_host_company_smtp_password_encrypted_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MatchResult',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('total_score', models.FloatField(default=0.0)),
+                ('breakdown', models.JSONField(blank=True, default=dict)),
+                ('version', models.CharField(max_length=40)),
+                ('computed_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('applicant', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='match_results', to='Applicantapp.applicant')),
+                ('job', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='match_results', to='Companyapp.jobadvertised')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['job', '-total_score'], name='matchresult_job_score_idx'), models.Index(fields=['applicant', '-total_score'], name='matchresult_applicant_idx')],
+                'unique_together': {('applicant', 'job')},
+            },
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 5.2.8 on 2026-10-18 04:01
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Applicantapp', '0001_initial'),
+        ('Companyapp', '0003_matchresult'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CandidateEmbedding',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('vector', models.BinaryField()),
+                ('version', models.CharField(max_length=40)),
+                ('updated_at', models.DateTimeField(auto_now=True, db_index=True)),
+                ('applicant', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='candidate_embedding', to='Applicantapp.applicant')),
+            ],
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.8 on 2026-10-18 04:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Companyapp', '0004_candidateembedding'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='jobadvertised',
+            name='deadline',
+            field=models.DateTimeField(db_index=True),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.8 on 2026-10-18 04:48
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def assign_single_company(apps, schema_editor):
+    """
+    Jobs advertised before this migration have no company. When only one
+    company is registered they can only be its own, so they are assigned to
+    it; otherwise they stay unassigned until set in the admin.
+    """
+    Company = apps.get_model('Companyapp', 'Company')
+    JobAdvertised = apps.get_model('Companyapp', 'JobAdvertised')
+    companies = list(Company.objects.values_list('id', flat=True)[:2])
+    if len(companies) == 1:
+        JobAdvertised.objects.filter(company=None).update(company_id=companies[0])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Companyapp', '0006_emaildispatch'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='jobadvertised',
+            name='company',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='job_adverts', to='Companyapp.company'),
+        ),
+        migrations.RunPython(assign_single_company, migrations.RunPython.noop),
+    ]
@@ -3,8 +3,8 @@ from django.utils import timezone
 from Applicantapp.models import Applicant
 from django.core.exceptions import ValidationError
 from django.contrib.auth.models import User
-from cryptography.fernet import Fernet
 from django.conf import settings
+from . import credentials
 import base64
 
 class Company(models.Model):
@@ -20,18 +20,17 @@ class Company(models.Model):
     smtp_username = models.CharField(max_length=255, blank=True, null=True)
     smtp_password_encrypted = models.CharField(max_length=500, blank=True, null=True)
     use_tls = models.BooleanField(default=True)
+    smtp_rate_per_minute = models.PositiveIntegerField(default=60, help_text="Most emails sent per minute through this server")
+    # End of the time already booked for queued emails (per-company rate limiting)
+    email_slots_until = models.DateTimeField(blank=True, null=True, editable=False)
 
     def set_smtp_password(self, raw_password):
         """Encrypts and stores the password"""
-        f = Fernet(settings.ENCRYPTION_KEY) # We will add this key to settings.py next
-        self.smtp_password_encrypted = f.encrypt(raw_password.encode()).decode()
+        self.smtp_password_encrypted = credentials.encrypt_secret(raw_password)
 
     def get_smtp_password(self):
-        """Decrypts and returns the password"""
-        if not self.smtp_password_encrypted:
-            return None
-        f = Fernet(settings.ENCRYPTION_KEY)
-        return f.decrypt(self.smtp_password_encrypted.encode()).decode()
+        """Decrypts and returns the password (cached briefly, see Companyapp/credentials.py)"""
+        return credentials.get_smtp_password(self)
 
     def __str__(self):
         return self.company_name
@@ -136,6 +135,8 @@ EDUCATION_CHOICES = [
 class JobAdvertised(models.Model):
     department = models.ForeignKey(Department, on_delete=models.CASCADE, related_name='job_adverts')
     post = models.ForeignKey(Post, on_delete=models.CASCADE, related_name='job_adverts')
+    # Company that advertised the job; only its users may export or search its candidates
+    company = models.ForeignKey(Company, on_delete=models.SET_NULL, null=True, blank=True, related_name='job_adverts')
     description = models.TextField()
     
     
@@ -150,7 +151,7 @@ class JobAdvertised(models.Model):
         help_text="Academic courses accepted for this specific job vacancy"
     )
     
-    deadline = models.DateTimeField()
+    deadline = models.DateTimeField(db_index=True)
     max_applicants = models.PositiveIntegerField(default=1)
     created_at = models.DateTimeField(auto_now_add=True)
 
@@ -173,9 +174,101 @@ class JobAdvertised(models.Model):
         ordering = ['-created_at']
 
 
+class MatchResult(models.Model):
+    """
+    Precomputed match breakdown for one (applicant, job) pair.
+    'version' is a hash of the job requirements + the resume data it was
+    scored against, so a row is recomputed only when either side changes.
+    """
+    applicant = models.ForeignKey(Applicant, on_delete=models.CASCADE, related_name='match_results')
+    job = models.ForeignKey(JobAdvertised, on_delete=models.CASCADE, related_name='match_results')
+    total_score = models.FloatField(default=0.0)
+    breakdown = models.JSONField(default=dict, blank=True)
+    version = models.CharField(max_length=40)
+    computed_at = models.DateTimeField(default=timezone.now)
 
+    class Meta:
+        unique_together = ('applicant', 'job')
+        indexes = [
+            models.Index(fields=['job', '-total_score'], name='matchresult_job_score_idx'),
+            models.Index(fields=['applicant', '-total_score'], name='matchresult_applicant_idx'),
+        ]
 
+    def __str__(self):
+        return f"{self.applicant} → {self.job}: {self.total_score}%"
 
 
+class CandidateEmbedding(models.Model):
+    """
+    One profile vector per applicant (skills + job titles from their resume
+    extraction), used to search every applicant for a job. 'version' hashes
+    the source data and model so unchanged profiles are not re-embedded.
+    """
+    applicant = models.OneToOneField(Applicant, on_delete=models.CASCADE, related_name='candidate_embedding')
+    vector = models.BinaryField()  # float32, L2-normalised
+    version = models.CharField(max_length=40)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
 
+    def __str__(self):
+        return f"Embedding for {self.applicant}"
+
+
+class EmailDispatch(models.Model):
+    """
+    One bulk email send, delivered by Celery in chunks. Progress is counted
+    from its recipients, so the UI can poll it while workers send.
+    """
+    STATUS_QUEUED = 'queued'
+    STATUS_SENDING = 'sending'
+    STATUS_DONE = 'done'
+    STATUS_CHOICES = [
+        (STATUS_QUEUED, 'Queued'),
+        (STATUS_SENDING, 'Sending'),
+        (STATUS_DONE, 'Done'),
+    ]
+
+    company = models.ForeignKey(Company, on_delete=models.CASCADE, related_name='email_dispatches')
+    job = models.ForeignKey(JobAdvertised, on_delete=models.SET_NULL, null=True, blank=True, related_name='email_dispatches')
+    subject = models.CharField(max_length=255)
+    message = models.TextField()
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=STATUS_QUEUED)
+    created_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(blank=True, null=True)
 
+    class Meta:
+        ordering = ['-created_at']
+
+    def progress(self):
+        """Recipient counts by status ({'pending': n, 'sent': n, 'failed': n}) in one query."""
+        counts = dict.fromkeys((status for status, _ in EmailRecipient.STATUS_CHOICES), 0)
+        counts.update(self.recipients.values_list('status').annotate(n=models.Count('id')).order_by())
+        return counts
+
+    def __str__(self):
+        return f"{self.subject} ({self.company})"
+
+
+class EmailRecipient(models.Model):
+    """Delivery state of one message of an EmailDispatch."""
+    STATUS_PENDING = 'pending'
+    STATUS_SENT = 'sent'
+    STATUS_FAILED = 'failed'
+    STATUS_CHOICES = [
+        (STATUS_PENDING, 'Pending'),
+        (STATUS_SENT, 'Sent'),
+        (STATUS_FAILED, 'Failed'),
+    ]
+
+    dispatch = models.ForeignKey(EmailDispatch, on_delete=models.CASCADE, related_name='recipients')
+    applicant = models.ForeignKey(Applicant, on_delete=models.SET_NULL, null=True, blank=True)
+    email = models.EmailField()
+    first_name = models.CharField(max_length=255, blank=True)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=STATUS_PENDING)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    error = models.TextField(blank=True, default='')
+
+    class Meta:
+        indexes = [models.Index(fields=['dispatch', 'status'], name='emailrecipient_status_idx')]
+
+    def __str__(self):
+        return f"{self.email} ({self.status})"
@@ -0,0 +1,208 @@
+import hashlib
+import json
+from django.db import connection, transaction
+from django.db.models import Exists, F, OuterRef, Q, Subquery
+from django.dispatch import Signal
+from django.utils import timezone
+from .matcher import calculate_match_percentage, calculate_match_percentages
+from .models import Application, JobAdvertised, MatchResult
+from Extractionapp.models import ResumeExtraction
+
+# Bump this whenever the matching logic changes so every stored result is recomputed
+MATCHER_VERSION = 1
+
+RESULT_FIELDS = ['total_score', 'breakdown', 'version', 'computed_at']
+
+# Sent with rows=[MatchResult, ...] after results are upserted
+# (bulk_create sends no post_save, so listeners such as the analytics reports use this)
+match_results_saved = Signal()
+
+
+def empty_resume_data():
+    return {'skills': [], 'work_experience': [], 'education': [], 'projects': []}
+
+
+def resume_data_from_extraction(extraction):
+    """Shapes a ResumeExtraction row into the dict the matcher expects."""
+    if extraction is None:
+        return empty_resume_data()
+    return {
+        'skills': extraction.skills or [],
+        'work_experience': extraction.work_experience or [],
+        'education': extraction.education or [],
+        'education_level': extraction.education_level,
+        'projects': extraction.projects or [],
+    }
+
+
+def get_resume_data(applicant):
+    """
+    Resume data for an applicant: the pipeline's ResumeExtraction if there is one,
+    otherwise whatever was stored on the profile.
+    """
+    try:
+        return resume_data_from_extraction(applicant.resumeextraction)
+    except ResumeExtraction.DoesNotExist:
+        return applicant.extracted_data or empty_resume_data()
+
+
+def match_version(job, job_courses, resume_data):
+    """
+    Version hash of everything a match breakdown depends on:
+    the matcher logic, the job requirements and the resume data.
+    """
+    payload = json.dumps([
+        MATCHER_VERSION,
+        [job.post.title, job.min_experience_years, job.required_education, job.required_skills],
+        sorted(job_courses),
+        [resume_data.get(k) or [] for k in ('skills', 'work_experience', 'education')],
+    ], sort_keys=True, default=str)
+    return hashlib.sha1(payload.encode()).hexdigest()
+
+
+def sync_match_results(job, resume_data_by_applicant, job_courses=None):
+    """
+    Returns {applicant_id: MatchResult} for the given applicants.
+    Rows that are missing or whose version hash is stale are recomputed and
+    upserted; everything else is served straight from the table.
+    """
+    if job_courses is None:
+        job_courses = job.get_selected_courses_list()
+
+    existing = {
+        row.applicant_id: row
+        for row in MatchResult.objects.filter(job=job, applicant_id__in=list(resume_data_by_applicant))
+    }
+
+    results = {}
+    changed = []
+    for applicant_id, resume_data in resume_data_by_applicant.items():
+        version = match_version(job, job_courses, resume_data)
+        row = existing.get(applicant_id)
+        if row is not None and row.version == version:
+            results[applicant_id] = row
+            continue
+
+        breakdown = calculate_match_percentage(job, resume_data, linkedin_data={}, job_courses=job_courses)
+        if row is None:
+            row = MatchResult(applicant_id=applicant_id, job=job)
+        row.total_score = breakdown['total_score']
+        row.breakdown = breakdown
+        row.version = version
+        row.computed_at = timezone.now()
+        results[applicant_id] = row
+        changed.append(row)
+
+    save_match_results(changed)
+    return results
+
+
+def save_match_results(rows):
+    """Upserts MatchResult rows: a Celery worker may be scoring the same pair concurrently."""
+    if not rows:
+        return
+    features = connection.features
+    if features.supports_update_conflicts_with_target:
+        MatchResult.objects.bulk_create(
+            rows,
+            update_conflicts=True,
+            unique_fields=['applicant', 'job'],
+            update_fields=RESULT_FIELDS,
+        )
+    elif features.supports_update_conflicts:
+        # MySQL: ON DUPLICATE KEY UPDATE takes no target and hits the (applicant, job) unique key
+        MatchResult.objects.bulk_create(rows, update_conflicts=True, update_fields=RESULT_FIELDS)
+    else:
+        # No upsert at all: replace the pairs' rows in one transaction
+        with transaction.atomic():
+            pairs = Q()
+            for row in rows:
+                pairs |= Q(applicant_id=row.applicant_id, job_id=row.job_id)
+            MatchResult.objects.filter(pairs).delete()
+            MatchResult.objects.bulk_create(rows)
+    match_results_saved.send(sender=MatchResult, rows=rows)
+
+
+def sync_applicant_matches(applicant_id, resume_data, jobs):
+    """
+    The applicant-side counterpart of sync_match_results: returns
+    {job.id: MatchResult} for one resume against many jobs. Fresh rows come
+    straight from the table; stale or missing ones are scored together in
+    one vectorized pass (calculate_match_percentages) and upserted.
+    Jobs should have selected_courses prefetched.
+    """
+    jobs = list(jobs)
+    existing = {
+        row.job_id: row
+        for row in MatchResult.objects.filter(applicant_id=applicant_id, job__in=jobs)
+    }
+
+    results = {}
+    stale = []
+    versions = {}
+    job_courses_by_job = {}
+    for job in jobs:
+        job_courses_by_job[job.id] = [course.name for course in job.selected_courses.all()]
+        versions[job.id] = match_version(job, job_courses_by_job[job.id], resume_data)
+        row = existing.get(job.id)
+        if row is not None and row.version == versions[job.id]:
+            results[job.id] = row
+        else:
+            stale.append(job)
+
+    changed = []
+    if stale:
+        breakdowns = calculate_match_percentages(stale, resume_data, job_courses_by_job)
+        now = timezone.now()
+        for job in stale:
+            row = existing.get(job.id) or MatchResult(applicant_id=applicant_id, job=job)
+            row.total_score = breakdowns[job.id]['total_score']
+            row.breakdown = breakdowns[job.id]
+            row.version = versions[job.id]
+            row.computed_at = now
+            results[job.id] = row
+            changed.append(row)
+
+    save_match_results(changed)
+    return results
+
+
+def refresh_job_matches(job):
+    """(Re)scores every applicant of a job. Used when the job changes."""
+    applications = Application.objects.filter(post=job.post).select_related('applicant__resumeextraction')
+    resume_data = {app.applicant_id: get_resume_data(app.applicant) for app in applications}
+    return sync_match_results(job, resume_data)
+
+
+def refresh_applicant_matches(applicant):
+    """(Re)scores an applicant against every job they applied for. Used when an extraction finishes."""
+    resume_data = get_resume_data(applicant)
+    jobs = JobAdvertised.objects.filter(post__application__applicant=applicant).select_related('post').distinct()
+    for job in jobs:
+        sync_match_results(job, {applicant.applicant_id: resume_data})
+    return len(jobs)
+
+
+def missing_match_results(job):
+    """
+    Applications for a job that have no stored result yet.
+    Normally none: Celery workers precompute rows as extractions finish.
+    """
+    return Application.objects.filter(post=job.post).filter(
+        ~Exists(MatchResult.objects.filter(job=job, applicant=OuterRef('applicant')))
+    )
+
+
+def ranked_applications(job):
+    """
+    Applications for a job, best match first, in ONE joined query:
+    the applicant and their extraction are select_related and the stored
+    score is annotated, so sorting and slicing happen in the database.
+    """
+    score = MatchResult.objects.filter(job=job, applicant=OuterRef('applicant')).values('total_score')[:1]
+    return (
+        Application.objects.filter(post=job.post)
+        .select_related('applicant__resumeextraction')
+        .annotate(match_score=Subquery(score))
+        .order_by(F('match_score').desc(nulls_last=True), 'applied_at')
+    )
@@ -0,0 +1,40 @@
+import logging
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_save
+from django.dispatch import receiver
+from .credentials import forget_smtp_password
+from .models import Company, JobAdvertised
+from .tasks import score_job_matches
+
+logger = logging.getLogger(__name__)
+
+
+def enqueue_after_commit(task, *args):
+    """
+    Queues a Celery task once the current transaction commits.
+    A missing broker must never break the request: stored match results are
+    re-validated by version hash when they are read anyway.
+    """
+    def _send():
+        try:
+            task.delay(*args)
+        except Exception as e:
+            logger.warning(f"Could not queue {task.name}{args}: {e}")
+
+    transaction.on_commit(_send)
+
+
+@receiver(post_save, sender=JobAdvertised)
+def rescore_job_on_save(sender, instance, **kwargs):
+    enqueue_after_commit(score_job_matches, instance.id)
+
+
+@receiver(m2m_changed, sender=JobAdvertised.selected_courses.through)
+def rescore_job_on_courses_change(sender, instance, action, **kwargs):
+    if action in ('post_add', 'post_remove', 'post_clear') and isinstance(instance, JobAdvertised):
+        enqueue_after_commit(score_job_matches, instance.id)
+
+
+@receiver(post_save, sender=Company)
+def forget_cached_smtp_password(sender, instance, **kwargs):
+    forget_smtp_password(instance.pk)
@@ -1,6 +1,11 @@
+import time
+from datetime import timedelta
+
 from celery import shared_task
+from django.conf import settings
 from django.utils import timezone
 from .models import JobAdvertised
+from Applicantapp.models import Applicant
 import logging
 
 logger = logging.getLogger(__name__)
@@ -8,15 +13,219 @@ logger = logging.getLogger(__name__)
 @shared_task
 def delete_expired_jobs():
     """
-    Deletes jobs where the deadline has passed.
+    Deletes jobs where the deadline has passed, in primary-key batches of
+    EXPIRED_JOBS_BATCH_SIZE until EXPIRED_JOBS_TIME_BUDGET seconds are spent.
+    Whatever is left is picked up by the next run.
+
+    Nothing listens for deletes of jobs, match results or analytics reports,
+    so Django removes each batch's dependent rows with one DELETE per table
+    instead of loading them.
     """
+    started = time.monotonic()
     now = timezone.now()
-    expired_jobs = JobAdvertised.objects.filter(deadline__lt=now)
-    count = expired_jobs.count()
-    
+    expired_ids = JobAdvertised.objects.filter(deadline__lt=now).order_by('pk').values_list('pk', flat=True)
+
+    count = 0
+    while time.monotonic() - started < settings.EXPIRED_JOBS_TIME_BUDGET:
+        batch = list(expired_ids[:settings.EXPIRED_JOBS_BATCH_SIZE])
+        if not batch:
+            break
+        JobAdvertised.objects.filter(pk__in=batch).delete()
+        count += len(batch)
+    else:
+        logger.warning("⏳ Expired job sweep hit its time budget; the rest is left for the next run.")
+
     if count > 0:
-        expired_jobs.delete()
         logger.info(f"🧹 Auto-deleted {count} expired job(s).")
         return f"Deleted {count} expired jobs."
-    
-    return "No expired jobs found."
\ No newline at end of file
+
+    return "No expired jobs found."
+
+@shared_task
+def score_job_matches(job_id):
+    """
+    Recomputes stored match results for every applicant of a job.
+    Triggered when a JobAdvertised (or its accepted courses) changes.
+    """
+    # Lazy import: the matcher pulls in numpy and RapidFuzz (the model itself loads on first use)
+    from .matcher import precompute_job_embeddings
+    from .scoring import refresh_job_matches
+
+    try:
+        job = JobAdvertised.objects.select_related('post').get(id=job_id)
+    except JobAdvertised.DoesNotExist:
+        return f"Job {job_id} not found"
+
+    # Job-side embeddings for the applicant feed and candidate search
+    precompute_job_embeddings(job)
+    results = refresh_job_matches(job)
+    logger.info(f"📊 Scored {len(results)} applicant(s) for job {job_id}.")
+    return f"Scored {len(results)} applicants."
+
+
+@shared_task
+def score_applicant_matches(applicant_id):
+    """
+    Recomputes stored match results for one applicant against every job they applied for.
+    Triggered when a resume extraction finishes.
+    """
+    from .scoring import refresh_applicant_matches
+
+    try:
+        applicant = Applicant.objects.get(applicant_id=applicant_id)
+    except Applicant.DoesNotExist:
+        return f"Applicant {applicant_id} not found"
+
+    count = refresh_applicant_matches(applicant)
+    logger.info(f"📊 Scored applicant {applicant_id} against {count} job(s).")
+    return f"Scored {count} jobs."
+
+
+
+@shared_task
+def index_candidate_embedding(applicant_id):
+    """
+    Updates the applicant's profile vector in the candidate search index.
+    Triggered when a resume extraction finishes.
+    """
+    from .candidate_index import index_applicant
+    from .scoring import get_resume_data
+
+    try:
+        applicant = Applicant.objects.select_related('resumeextraction').get(applicant_id=applicant_id)
+    except Applicant.DoesNotExist:
+        return f"Applicant {applicant_id} not found"
+
+    changed = index_applicant(applicant, get_resume_data(applicant))
+    return "Indexed." if changed else "Unchanged."
+
+
+@shared_task
+def send_email_dispatch(dispatch_id):
+    """
+    Splits a queued bulk email send into chunks and queues each one at the
+    time the company's rate limit allows. A chunk never holds more than the
+    company's smtp_rate_per_minute emails, since a chunk goes out in one burst.
+
+    The dispatch moves from queued to sending first, so a second run for the
+    same dispatch (see requeue_stuck_email_dispatches) does nothing.
+    """
+    from .emailing import finish_dispatch_if_done, reserve_send_slots
+    from .models import EmailDispatch, EmailRecipient
+
+    try:
+        dispatch = EmailDispatch.objects.select_related('company').get(id=dispatch_id)
+    except EmailDispatch.DoesNotExist:
+        return f"Dispatch {dispatch_id} not found"
+
+    claimed = EmailDispatch.objects.filter(pk=dispatch_id, status=EmailDispatch.STATUS_QUEUED).update(
+        status=EmailDispatch.STATUS_SENDING
+    )
+    if not claimed:
+        return f"Dispatch {dispatch_id} already queued."
+
+    recipient_ids = list(
+        dispatch.recipients.filter(status=EmailRecipient.STATUS_PENDING).order_by('id').values_list('id', flat=True)
+    )
+    chunk_size = max(min(settings.EMAIL_DISPATCH_CHUNK_SIZE, dispatch.company.smtp_rate_per_minute), 1)
+    try:
+        for start in range(0, len(recipient_ids), chunk_size):
+            chunk = recipient_ids[start:start + chunk_size]
+            delay = reserve_send_slots(dispatch.company_id, len(chunk))
+            send_email_chunk.apply_async((dispatch_id, chunk), countdown=delay)
+    except Exception:
+        # Broker unavailable: leave it queued for requeue_stuck_email_dispatches
+        EmailDispatch.objects.filter(pk=dispatch_id).update(status=EmailDispatch.STATUS_QUEUED)
+        raise
+    finish_dispatch_if_done(dispatch_id)
+
+    logger.info(f"📧 Queued {len(recipient_ids)} email(s) for dispatch {dispatch_id}.")
+    return f"Queued {len(recipient_ids)} emails."
+
+
+@shared_task
+def requeue_stuck_email_dispatches():
+    """
+    Queues send_email_dispatch again for dispatches still queued after
+    EMAIL_DISPATCH_STUCK_MINUTES, e.g. because the broker lost the task.
+    Runs on beat.
+    """
+    from .models import EmailDispatch
+
+    cutoff = timezone.now() - timedelta(minutes=settings.EMAIL_DISPATCH_STUCK_MINUTES)
+    stuck = list(
+        EmailDispatch.objects.filter(status=EmailDispatch.STATUS_QUEUED, created_at__lt=cutoff)
+        .values_list('id', flat=True)
+    )
+    for dispatch_id in stuck:
+        send_email_dispatch.delay(dispatch_id)
+
+    if stuck:
+        logger.warning(f"📧 Re-queued {len(stuck)} stuck email dispatch(es).")
+    return f"Re-queued {len(stuck)} dispatches."
+
+
+@shared_task(bind=True)
+def send_email_chunk(self, dispatch_id, recipient_ids):
+    """
+    Sends one chunk over a single SMTP connection. Recipients refused for
+    good (5xx) are marked failed; temporary failures are retried on their
+    own with exponential backoff (or later, if the company's rate limit is
+    booked further ahead), up to EMAIL_MAX_RETRIES times.
+    """
+    from .emailing import finish_dispatch_if_done, reserve_send_slots, send_chunk
+    from .models import EmailDispatch, EmailRecipient
+
+    try:
+        dispatch = EmailDispatch.objects.select_related('company').get(id=dispatch_id)
+    except EmailDispatch.DoesNotExist:
+        return f"Dispatch {dispatch_id} not found"
+
+    recipients = list(EmailRecipient.objects.filter(id__in=recipient_ids, status=EmailRecipient.STATUS_PENDING))
+    if not recipients:
+        finish_dispatch_if_done(dispatch_id)
+        return "Nothing to send."
+
+    EmailDispatch.objects.filter(pk=dispatch_id, status=EmailDispatch.STATUS_QUEUED).update(
+        status=EmailDispatch.STATUS_SENDING
+    )
+    sent, permanent, transient = send_chunk(dispatch, recipients)
+    give_up = self.request.retries >= settings.EMAIL_MAX_RETRIES
+
+    for recipient in recipients:
+        recipient.attempts += 1
+        if recipient in permanent or (recipient in transient and give_up):
+            recipient.status = EmailRecipient.STATUS_FAILED
+            recipient.error = permanent.get(recipient) or transient[recipient]
+        elif recipient in transient:
+            recipient.error = transient[recipient]
+        else:
+            recipient.status = EmailRecipient.STATUS_SENT
+            recipient.error = ''
+    EmailRecipient.objects.bulk_update(recipients, ['status', 'attempts', 'error'])
+
+    logger.info(
+        f"📧 Dispatch {dispatch_id}: {len(sent)} sent, {len(permanent)} rejected, {len(transient)} to retry."
+    )
+    if transient and not give_up:
+        # Retries count against the company's rate limit like any other send
+        backoff = settings.EMAIL_RETRY_BACKOFF * 2 ** self.request.retries
+        countdown = max(reserve_send_slots(dispatch.company_id, len(transient)), backoff)
+        raise self.retry(args=(dispatch_id, [r.id for r in transient]), countdown=countdown)
+
+    finish_dispatch_if_done(dispatch_id)
+    return f"Sent {len(sent)} emails."
+
+
+@shared_task
+def rotate_smtp_credentials():
+    """
+    Re-encrypts stored SMTP passwords under the current ENCRYPTION_KEY.
+    Run after moving the previous key to ENCRYPTION_OLD_KEYS; once it has
+    finished, the old key can be dropped.
+    """
+    from .credentials import rotate_smtp_passwords
+
+    count = rotate_smtp_passwords()
+    logger.info(f"🔑 Re-encrypted {count} SMTP password(s).")
+    return f"Re-encrypted {count} passwords."
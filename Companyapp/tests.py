@@ -1,3 +1,845 @@
-from django.test import TestCase
+import csv
+import io
+import os
+import socketserver
+import tempfile
+import threading
+import time
+from types import SimpleNamespace
+from unittest import mock
 
-# Create your tests here.
+import numpy as np
+import torch
+from cryptography.fernet import Fernet
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.contrib.messages import get_messages
+from django.core.management import call_command
+from django.db import connection
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from . import candidate_index, credentials, embedding_cache, matcher
+from .embedding_cache import EmbeddingCache
+from .candidate_index import CandidateIndex, index_applicant, search_candidates
+from .emailing import create_dispatch
+from .exports import export_rows
+from .models import (
+    AcademicCourse, Application, CandidateEmbedding, Company, Department, EmailDispatch, EmailRecipient, JobAdvertised,
+    MatchResult, Post,
+)
+from .scoring import get_resume_data, refresh_job_matches, sync_match_results
+from .tasks import (
+    delete_expired_jobs, requeue_stuck_email_dispatches, rotate_smtp_credentials, score_job_matches, send_email_chunk,
+    send_email_dispatch,
+)
+from Analyzerapp.models import AnalyticsReport
+from Applicantapp.models import Applicant
+from Extractionapp.models import ResumeExtraction
+from Resumeanalyzer import model_registry
+from text_normalization import (
+    KeywordSet, clean_title, education_rank, education_ranks, parse_years, parse_years_many, trie_regex,
+)
+
+
+class FakeSemanticModel:
+    """
+    Deterministic stand-in for SentenceTransformer: a bag-of-letters embedding.
+    Counts every call so tests can assert on the number of forward passes.
+    """
+    def __init__(self):
+        self.calls = 0
+
+    def _embed(self, text):
+        vec = np.zeros(26, dtype=np.float32)
+        for ch in text.lower():
+            if 'a' <= ch <= 'z':
+                vec[ord(ch) - ord('a')] += 1
+        vec[0] += 0.01  # Avoid zero vectors for empty strings
+        return vec
+
+    def encode(self, sentences, convert_to_tensor=False, convert_to_numpy=True, normalize_embeddings=False):
+        self.calls += 1
+        single = isinstance(sentences, str)
+        batch = np.stack([self._embed(t) for t in ([sentences] if single else sentences)])
+        if normalize_embeddings:
+            batch = batch / np.linalg.norm(batch, axis=1, keepdims=True)
+        out = batch[0] if single else batch
+        return torch.from_numpy(out) if convert_to_tensor else out
+
+
+class FakeModelMixin:
+    """Swaps in the fake model and an isolated, throwaway embedding cache."""
+    def setUp(self):
+        super().setUp()
+        self._tmpdir = tempfile.TemporaryDirectory()
+        self.cache_path = os.path.join(self._tmpdir.name, 'embeddings.sqlite3')
+
+        self._original_cache = embedding_cache._cache
+        self.fake_model = FakeSemanticModel()
+        self._models = mock.patch.dict(model_registry._models, {'semantic': self.fake_model})
+        self._models.start()
+        embedding_cache._cache = EmbeddingCache(self.cache_path, 'fake-model')
+
+    def tearDown(self):
+        self._models.stop()
+        embedding_cache._cache = self._original_cache
+        self._tmpdir.cleanup()
+        super().tearDown()
+
+
+class JobFixtureMixin:
+    """Creates a department, post, job and applicants with processed extractions."""
+    def create_job(self, skills="python, django, sql", title="Software Engineer"):
+        self.department, _ = Department.objects.get_or_create(name="Engineering")
+        self.post = Post.objects.create(department=self.department, title=title)
+        return JobAdvertised.objects.create(
+            department=self.department, post=self.post, description="Build things",
+            min_experience_years=2, required_education='Bachelor', required_skills=skills,
+            deadline=timezone.now() + timedelta(days=30),
+        )
+
+    def login_as_owner(self, job, username='acme'):
+        """Logs in a company account that advertised the job."""
+        user = User.objects.create_user(username)
+        company = Company.objects.create(user=user, company_name=username.title(), location="Nairobi")
+        JobAdvertised.objects.filter(id=job.id).update(company=company)
+        self.client.force_login(user)
+        return company
+
+    def create_applicant(self, n, skills, post=None, processed=True):
+        applicant = Applicant.objects.create(
+            first_name=f"Applicant{n}", last_name="Test", email=f"applicant{n}@example.com",
+            resume=f"resumes/applicant{n}.pdf",
+        )
+        ResumeExtraction.objects.create(
+            applicant=applicant, skills=skills, processed=processed,
+            work_experience=["Software Developer (2019-2023)"], education=["BSc Computer Science"],
+        )
+        Application.objects.create(applicant=applicant, post=post or self.post)
+        return applicant
+
+
+def make_job(title="Software Engineer", skills="python, django, sql, react, kubernetes",
+             education="Bachelor", years=3, id=1):
+    return SimpleNamespace(
+        id=id,
+        post=SimpleNamespace(title=title),
+        min_experience_years=years,
+        required_skills=skills,
+        required_education=education,
+    )
+
+
+class BatchedMatcherTests(FakeModelMixin, SimpleTestCase):
+    resume = {
+        'skills': ['Python', 'Postgres SQL', 'ReactJS', 'Docker'],
+        'work_experience': ['Software Developer at Acme (2019-2022)', 'Waiter (2 yrs)'],
+        'education': ['BSc Computer Science'],
+    }
+
+    def test_match_skills_agrees_with_pairwise_scoring(self):
+        req = ['python', 'django', 'sql', 'reactjs', 'kubernetes', 'docker compose']
+        cand = ['python', 'postgres', 'react', 'docker', 'go']
+
+        expected = []
+        for r in req:
+            if any(r in cs for cs in cand):
+                expected.append(r)
+            elif max(matcher.get_similarity_score(r, cs) for cs in cand) >= 0.6:
+                expected.append(r)
+
+        matched, missing = matcher.match_skills(req, cand)
+        self.assertEqual(matched, expected)
+        self.assertEqual(missing, [r for r in req if r not in expected])
+
+    def test_similarity_matrix_matches_pairwise_cosine(self):
+        a, b = ['developer', 'engineer'], ['software developer', 'cook', 'data engineer']
+        matrix = matcher.get_similarity_matrix(a, b)
+        self.assertEqual(matrix.shape, (2, 3))
+        for i, x in enumerate(a):
+            for j, y in enumerate(b):
+                self.assertAlmostEqual(float(matrix[i, j]), matcher.get_similarity_score(x, y), places=5)
+
+    def test_breakdown_uses_one_encode_per_side(self):
+        result = matcher.calculate_match_percentage(make_job(), self.resume)
+        # Titles: 2 encodes. Skills: 2 encodes (pending required skills + candidate skills)
+        self.assertLessEqual(self.fake_model.calls, 4)
+        self.assertIn('python', result['matched_skills'])
+        self.assertEqual(set(result['matched_skills']) | set(result['missing_skills']),
+                         {'python', 'django', 'sql', 'react', 'kubernetes'})
+
+    def test_many_jobs_scored_in_one_pass_match_per_job_scoring(self):
+        jobs = [
+            make_job(id=1),
+            make_job("Backend Developer", "python, postgres sql, docker compose", years=1, id=2),
+            make_job("Head Chef", "cooking, menu planning", "Diploma", years=5, id=3),
+            make_job("Data Engineer", "", "Master", years=0, id=4),
+        ]
+        courses = {1: ['Computer Science'], 3: ['Culinary Arts']}
+        batch = matcher.calculate_match_percentages(jobs, self.resume, courses)
+
+        calls = self.fake_model.calls
+        for job in jobs:
+            self.assertEqual(batch[job.id], matcher.calculate_match_percentage(
+                job, self.resume, job_courses=courses.get(job.id)))
+        # The batch pass left everything in the embedding cache
+        self.assertEqual(self.fake_model.calls, calls)
+
+    def test_stored_education_level_is_used(self):
+        job = make_job(education="Master")
+        stored = matcher.calculate_match_percentage(job, {'education': ["BSc"], 'education_level': 4})
+        self.assertEqual(stored['candidate_education_level'], 4)
+        self.assertEqual(stored['education_score'], 100)
+        classified = matcher.calculate_match_percentage(job, {'education': ["BSc"]})
+        self.assertEqual(classified['education_score'], 0)
+
+    def test_empty_candidate_skills_match_nothing(self):
+        matched, missing = matcher.match_skills(['python'], [])
+        self.assertEqual(matched, [])
+        self.assertEqual(missing, ['python'])
+
+
+class TextNormalizationTests(SimpleTestCase):
+    def test_keyword_set_matches_substring_search(self):
+        keywords = ["bsc", "b.sc", "master", "mast", "data", "postgraduate", "graduate"]
+        keyword_set = KeywordSet(keywords)
+        for text in ["BSc Computer Science", "B.Sc. Maths", "Masters", "Postgraduate Diploma",
+                     "Metadata Engineer", "Team Lead", "", "MAST"]:
+            expected = {k for k in keywords if k in text.lower()}
+            self.assertEqual(keyword_set.found(text), expected, text)
+            self.assertEqual(keyword_set.search(text), bool(expected), text)
+
+    def test_trie_regex_shares_prefixes(self):
+        self.assertEqual(trie_regex(["bsc", "bachelor"]), "b(?:achelor|sc)")
+        self.assertEqual(trie_regex(["mast", "master"]), "mast(?:er)?")
+
+    def test_work_entries(self):
+        self.assertEqual(clean_title("Senior Developer at Google (2020-2022)"), "Senior Developer")
+        # Stop words are applied in list order, as the matcher always has
+        self.assertEqual(clean_title("Dev with at Google"), "Dev With")
+        self.assertEqual(parse_years_many(["DevOps (2019-2022)", "Engineer (2 yrs)", "Intern"]), [3, 2, 0])
+        self.assertEqual(parse_years("Manager (2020-Present)"), max(1, timezone.now().year - 2020))
+
+    def test_education_rank(self):
+        self.assertEqual(education_ranks(["Diploma in IT", "MSc Data Science", "High School"]), [2, 4, 0])
+        self.assertEqual(education_rank("PhD and B.Sc"), 5)
+
+
+class CourseMatchingTests(SimpleTestCase):
+    def test_matches_the_difflib_reference(self):
+        rng = np.random.default_rng(0)
+        words = ["Computer", "Science", "Compter", "Scince", "Information", "Technology", "BSc",
+                 "Business", "Mathematics", "Statistics", "Engineering", "Data", "University", "2019"]
+
+        def phrase(n):
+            return " ".join(rng.choice(words, size=n))
+
+        for _ in range(500):
+            courses = [phrase(rng.integers(1, 4)) for _ in range(rng.integers(0, 4))]
+            education = [phrase(rng.integers(1, 6)) for _ in range(rng.integers(0, 4))]
+            for threshold in (0.6, 0.75):
+                fast = matcher.match_academic_courses(courses, education, threshold)
+                reference = matcher.match_academic_courses_reference(courses, education, threshold)
+                self.assertEqual(sorted(fast['matched_courses']), sorted(reference['matched_courses']))
+                self.assertEqual(fast['match_percentage'], reference['match_percentage'])
+
+    def test_typos_still_match_and_unrelated_courses_do_not(self):
+        result = matcher.match_academic_courses(
+            ["Computer Science", "Economics"], ["BSc Compter Scince", "Kenyatta University"]
+        )
+        self.assertEqual(result, {'matched_courses': ["Computer Science"], 'match_percentage': 50.0})
+
+
+class EmbeddingCacheTests(FakeModelMixin, SimpleTestCase):
+    def test_warm_lookups_do_not_touch_the_model(self):
+        matcher.encode_texts(['Python', 'Django'])
+        calls = self.fake_model.calls
+        matcher.encode_texts(['python ', 'DJANGO'])
+        self.assertEqual(self.fake_model.calls, calls)
+
+    def test_only_misses_are_encoded(self):
+        matcher.encode_texts(['python'])
+        matcher.encode_texts(['python', 'sql', 'sql'])
+        self.assertEqual(self.fake_model.calls, 2)
+
+    def test_disk_tier_is_shared_between_instances(self):
+        matcher.encode_texts(['kubernetes'])
+        other_process = EmbeddingCache(self.cache_path, 'fake-model')
+        self.assertIn('kubernetes', other_process.get_many(['kubernetes']))
+        # Entries are namespaced by model name
+        self.assertEqual(EmbeddingCache(self.cache_path, 'other-model').get_many(['kubernetes']), {})
+
+    def test_memory_tier_is_bounded(self):
+        cache = EmbeddingCache(self.cache_path, 'fake-model', memory_items=2)
+        cache.put_many({k: np.ones(3) for k in ['a', 'b', 'c']})
+        self.assertEqual(list(cache._memory), ['b', 'c'])
+        # Evicted entries are still served from disk
+        self.assertIn('a', cache.get_many(['a']))
+
+
+class MatchResultTests(FakeModelMixin, JobFixtureMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.job = self.create_job()
+        self.alice = self.create_applicant(1, ['Python', 'Django'])
+        self.bob = self.create_applicant(2, ['Java'])
+
+    def test_rows_are_stored_and_reused(self):
+        results = refresh_job_matches(self.job)
+        self.assertEqual(MatchResult.objects.filter(job=self.job).count(), 2)
+        self.assertGreater(results[self.alice.applicant_id].total_score, results[self.bob.applicant_id].total_score)
+
+        calls = self.fake_model.calls
+        embedding_cache._cache = EmbeddingCache(self.cache_path, 'cold-cache')
+        refresh_job_matches(self.job)
+        # Versions still match, so nothing is re-scored
+        self.assertEqual(self.fake_model.calls, calls)
+
+    def test_job_change_invalidates_rows(self):
+        refresh_job_matches(self.job)
+        self.job.required_skills = "java"
+        self.job.save()
+        results = refresh_job_matches(self.job)
+        self.assertEqual(results[self.bob.applicant_id].breakdown['matched_skills'], ['java'])
+        self.assertEqual(MatchResult.objects.filter(job=self.job).count(), 2)
+
+    def test_rows_are_replaced_without_upsert_support(self):
+        refresh_job_matches(self.job)
+        self.job.required_skills = "java"
+        self.job.save()
+        features = connection.features
+        with mock.patch.object(features, 'supports_update_conflicts_with_target', False), \
+                mock.patch.object(features, 'supports_update_conflicts', False):
+            results = refresh_job_matches(self.job)
+        self.assertEqual(MatchResult.objects.filter(job=self.job).count(), 2)
+        stored = MatchResult.objects.get(job=self.job, applicant_id=self.bob.applicant_id)
+        self.assertEqual(stored.breakdown['matched_skills'], ['java'])
+        self.assertEqual(stored.total_score, results[self.bob.applicant_id].total_score)
+
+    def test_extraction_change_invalidates_row(self):
+        refresh_job_matches(self.job)
+        extraction = self.bob.resumeextraction
+        extraction.skills = ['Python', 'Django', 'SQL']
+        extraction.save()
+        results = sync_match_results(self.job, {self.bob.applicant_id: {'skills': extraction.skills}})
+        self.assertEqual(results[self.bob.applicant_id].breakdown['missing_skills'], [])
+
+
+class RankedApplicantsViewTests(FakeModelMixin, JobFixtureMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.job = self.create_job(skills="python, django")
+        self.applicants = [
+            self.create_applicant(n, skills)
+            for n, skills in enumerate([['Java'], ['Python', 'Django'], ['Python'], []])
+        ]
+        refresh_job_matches(self.job)
+
+    def get(self, **params):
+        return self.client.get(f'/job/{self.job.id}/applicants/', params)
+
+    def test_candidates_are_sorted_by_stored_score(self):
+        response = self.get()
+        scores = [c['score'] for c in response.context['candidates']]
+        self.assertEqual(scores, sorted(scores, reverse=True))
+        self.assertEqual(response.context['candidates'][0]['applicant'], self.applicants[1])
+        self.assertEqual(response.context['total_candidates'], 4)
+
+    def test_pagination_and_top_k(self):
+        with self.settings(RANKING_PAGE_SIZE=3):
+            page2 = self.get(page=2)
+        self.assertEqual([c['rank'] for c in page2.context['candidates']], [4])
+
+        top = self.get(top=2)
+        self.assertIsNone(top.context['page_obj'])
+        self.assertEqual([c['rank'] for c in top.context['candidates']], [1, 2])
+
+    def test_missing_rows_are_queued_instead_of_scored_inline(self):
+        late = self.create_applicant(9, ['Python', 'Django'])
+        with self.settings(RANKING_PAGE_SIZE=2), mock.patch('Companyapp.views.enqueue_after_commit') as enqueue:
+            response = self.get()
+        enqueue.assert_called_once_with(score_job_matches, self.job.id)
+        # Not on the first page, so not scored by this request
+        self.assertNotIn(late, [c['applicant'] for c in response.context['candidates']])
+        self.assertFalse(MatchResult.objects.filter(job=self.job, applicant=late).exists())
+
+        with mock.patch('Companyapp.views.enqueue_after_commit') as enqueue:
+            self.get(top=10)
+        enqueue.assert_called_once()
+        # The visible rows are always scored
+        self.assertTrue(MatchResult.objects.filter(job=self.job, applicant=late).exists())
+
+    def test_backfill_queues_jobs_with_missing_rows(self):
+        other = self.create_job(title="Data Engineer")
+        self.create_applicant(9, ['Python'], post=other.post)
+        with mock.patch.object(score_job_matches, 'delay') as delay:
+            call_command('backfill_match_results', stdout=io.StringIO())
+            delay.assert_called_once_with(other.id)
+            call_command('backfill_match_results', '--all', stdout=io.StringIO())
+        self.assertEqual(sorted(c.args[0] for c in delay.call_args_list[1:]), [self.job.id, other.id])
+
+    def test_query_count_does_not_grow_with_applicants(self):
+        with self.assertNumQueries(6):
+            self.get()
+        for n in range(10, 20):
+            self.create_applicant(n, ['Python'])
+        refresh_job_matches(self.job)
+        with self.assertNumQueries(6):
+            self.get()
+
+
+class RankedApplicantsExportTests(FakeModelMixin, JobFixtureMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.job = self.create_job(skills="python, django")
+        for n, skills in enumerate([['Java'], ['Python', 'Django'], ['Python']]):
+            self.create_applicant(n, skills)
+        refresh_job_matches(self.job)
+        self.unscored = self.create_applicant(9, ['Python'], processed=False)
+        self.login_as_owner(self.job)
+
+    def test_only_the_jobs_company_can_export(self):
+        url = f'/job/{self.job.id}/applicants/export/'
+        self.client.logout()
+        self.assertEqual(self.client.get(url).status_code, 302)
+        self.client.force_login(User.objects.create_user('applicant'))
+        self.assertEqual(self.client.get(url).status_code, 404)
+        self.login_as_owner(self.create_job(title="Other job"), username='rival')
+        self.assertEqual(self.client.get(url).status_code, 404)
+
+    def test_csv_is_streamed_in_ranking_order(self):
+        response = self.client.get(f'/job/{self.job.id}/applicants/export/')
+        self.assertTrue(response.streaming)
+        self.assertIn('attachment;', response['Content-Disposition'])
+        rows = list(csv.DictReader(io.StringIO(b"".join(response.streaming_content).decode())))
+
+        self.assertEqual([row['rank'] for row in rows], ['1', '2', '3', '4'])
+        self.assertEqual(rows[0]['first_name'], "Applicant1")
+        self.assertEqual(rows[0]['matched_skills'], "python; django")
+        scores = [float(row['total_score']) for row in rows]
+        self.assertEqual(scores, sorted(scores, reverse=True))
+        # Applicants the workers have not scored yet are scored before the export
+        unscored = next(row for row in rows if row['applicant_id'] == str(self.unscored.applicant_id))
+        self.assertEqual(unscored['status'], 'Pending')
+        self.assertTrue(MatchResult.objects.filter(job=self.job, applicant=self.unscored).exists())
+
+    def test_stale_results_are_rescored_chunk_by_chunk(self):
+        # Edited without the signal, so no worker has rescored the stored rows
+        JobAdvertised.objects.filter(id=self.job.id).update(required_skills="java")
+        self.job.refresh_from_db()
+        with self.settings(EXPORT_CHUNK_SIZE=2), \
+                mock.patch('Companyapp.exports.sync_match_results', wraps=sync_match_results) as sync:
+            rows = list(export_rows(self.job))
+        self.assertEqual([len(c.args[1]) for c in sync.call_args_list], [2, 2])
+        matched = {row['first_name']: row['matched_skills'] for row in rows}
+        self.assertEqual(matched, {"Applicant0": ['java'], "Applicant1": [], "Applicant2": [], "Applicant9": []})
+
+    def test_parquet_export_is_written_in_row_groups(self):
+        import pyarrow.parquet as pq
+
+        with self.settings(EXPORT_CHUNK_SIZE=2):
+            response = self.client.get(f'/job/{self.job.id}/applicants/export/', {'format': 'parquet'})
+            parquet = pq.ParquetFile(io.BytesIO(b"".join(response.streaming_content)))
+        self.assertEqual(parquet.metadata.num_row_groups, 2)
+        table = parquet.read()
+        self.assertEqual(table.column('rank').to_pylist(), [1, 2, 3, 4])
+        self.assertEqual(table.column('matched_skills').to_pylist()[0], ['python', 'django'])
+
+        self.assertEqual(self.client.get(f'/job/{self.job.id}/applicants/export/', {'format': 'xls'}).status_code, 404)
+
+    def test_command_writes_the_export(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            out = io.StringIO()
+            call_command('export_rankings', str(self.job.id), os.path.join(tmp, 'ranked.csv'), stdout=out)
+            self.assertIn("Exported 4 applicant(s)", out.getvalue())
+            with open(os.path.join(tmp, 'ranked.csv'), encoding='utf-8') as f:
+                self.assertEqual(len(list(csv.DictReader(f))), 4)
+
+
+class CandidateIndexTests(FakeModelMixin, JobFixtureMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        candidate_index._index = None
+        self.addCleanup(setattr, candidate_index, '_index', None)
+        self.job = self.create_job(skills="python, django")
+        # Applied to a different post: only reachable through the index
+        other_post = Post.objects.create(department=self.department, title="Data Analyst")
+        self.outsider = self.create_applicant(1, ['Python', 'Django'], post=other_post)
+        self.applicant = self.create_applicant(2, ['Excel'])
+        for applicant in (self.outsider, self.applicant):
+            index_applicant(applicant, get_resume_data(applicant))
+
+    def test_search_covers_applicants_of_other_jobs(self):
+        hits = search_candidates(self.job, k=2)
+        self.assertEqual([applicant_id for applicant_id, _ in hits],
+                         [self.outsider.applicant_id, self.applicant.applicant_id])
+
+    def test_unchanged_profiles_are_not_re_embedded(self):
+        calls = self.fake_model.calls
+        self.assertFalse(index_applicant(self.outsider, get_resume_data(self.outsider)))
+        self.assertEqual(self.fake_model.calls, calls)
+
+    def test_index_follows_new_and_deleted_profiles(self):
+        search_candidates(self.job)
+        newcomer = self.create_applicant(3, ['Django', 'Python', 'SQL'])
+        index_applicant(newcomer, get_resume_data(newcomer))
+        self.assertIn(newcomer.applicant_id, dict(search_candidates(self.job)))
+
+        self.outsider.delete()
+        ids = dict(search_candidates(self.job))
+        self.assertNotIn(self.outsider.applicant_id, ids)
+        self.assertEqual(len(ids), CandidateEmbedding.objects.count())
+
+    def test_partitioned_search_matches_brute_force_when_probing_everything(self):
+        rng = np.random.default_rng(1)
+        vectors = rng.normal(size=(400, 16)).astype(np.float32)
+        vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+        exact = CandidateIndex(ivf_threshold=10 ** 6)
+        partitioned = CandidateIndex(ivf_threshold=100, nprobe=100)
+        for index in (exact, partitioned):
+            index._rebuild(list(range(400)), list(vectors))
+        self.assertIsNotNone(partitioned._centroids)
+
+        query = vectors[7]
+        self.assertEqual(partitioned.search(query, k=5), exact.search(query, k=5))
+        self.assertEqual(exact.search(query, k=1)[0][0], 7)
+
+    def test_search_view_reranks_top_k(self):
+        self.login_as_owner(self.job)
+        response = self.client.get(f'/job/{self.job.id}/candidates/', {'k': 1})
+        self.assertEqual(response.status_code, 200)
+        [candidate] = response.context['candidates']
+        self.assertEqual(candidate['applicant'], self.outsider)
+        self.assertFalse(candidate['applied'])
+        self.assertIn('python', candidate['matched_skills'])
+
+    def test_search_view_is_limited_to_the_jobs_company(self):
+        url = f'/job/{self.job.id}/candidates/'
+        self.assertEqual(self.client.get(url).status_code, 302)
+        self.login_as_owner(self.create_job(title="Other job"), username='rival')
+        self.assertEqual(self.client.get(url).status_code, 404)
+
+
+class ManageJobsViewTests(JobFixtureMixin, TestCase):
+    def setUp(self):
+        self.course = AcademicCourse.objects.create(name="Computer Science")
+        self.add_job(applicants=2)
+
+    def add_job(self, applicants):
+        job = self.create_job(title=f"Job {JobAdvertised.objects.count()}")
+        job.selected_courses.add(self.course)
+        for _ in range(applicants):
+            self.create_applicant(Applicant.objects.count(), ['Python'])
+        return job
+
+    def test_counts_are_annotated(self):
+        response = self.client.get('/manage-jobs/')
+        item = response.context['job_data'][0]
+        self.assertEqual(item['applicant_count'], 2)
+        self.assertEqual(item['selected_courses'], [self.course])
+
+    def test_query_count_does_not_grow_with_jobs_or_applications(self):
+        with self.assertNumQueries(3):
+            self.client.get('/manage-jobs/')
+        for n in range(5):
+            self.add_job(applicants=n)
+        with self.assertNumQueries(3):
+            response = self.client.get('/manage-jobs/')
+        self.assertEqual(sorted(item['applicant_count'] for item in response.context['job_data']), [0, 1, 2, 2, 3, 4])
+
+
+class ExpiredJobSweepTests(JobFixtureMixin, TestCase):
+    def add_expired_job(self, applicants):
+        job = self.create_job(title=f"Expired {JobAdvertised.objects.count()}")
+        JobAdvertised.objects.filter(pk=job.pk).update(deadline=timezone.now() - timedelta(days=1))
+        for _ in range(applicants):
+            applicant = self.create_applicant(Applicant.objects.count(), ['Python'])
+            MatchResult.objects.create(applicant=applicant, job=job, total_score=50.0, version='v')
+        AnalyticsReport.objects.get_or_create(job=job)
+        return job
+
+    @override_settings(EXPIRED_JOBS_BATCH_SIZE=2)
+    def test_deletes_expired_jobs_and_their_rows_in_batches(self):
+        open_job = self.create_job(title="Still open")
+        expired = [self.add_expired_job(applicants=2) for _ in range(3)]
+
+        self.assertEqual(delete_expired_jobs(), "Deleted 3 expired jobs.")
+        self.assertEqual(list(JobAdvertised.objects.all()), [open_job])
+        self.assertFalse(MatchResult.objects.filter(job_id__in=[j.id for j in expired]).exists())
+        self.assertFalse(AnalyticsReport.objects.filter(job_id__in=[j.id for j in expired]).exists())
+        self.assertEqual(Applicant.objects.count(), 6)
+        self.assertEqual(delete_expired_jobs(), "No expired jobs found.")
+
+    def test_dependent_rows_are_not_loaded(self):
+        self.add_expired_job(applicants=3)
+        with CaptureQueriesContext(connection) as queries:
+            delete_expired_jobs()
+        selects = [q['sql'] for q in queries if q['sql'].startswith('SELECT')]
+        self.assertFalse([sql for sql in selects if 'matchresult' in sql or 'analyticsreport' in sql])
+        self.assertFalse(MatchResult.objects.exists())
+
+    @override_settings(EXPIRED_JOBS_TIME_BUDGET=0)
+    def test_time_budget_leaves_the_rest_for_the_next_run(self):
+        self.add_expired_job(applicants=1)
+        self.assertEqual(delete_expired_jobs(), "No expired jobs found.")
+        self.assertEqual(JobAdvertised.objects.count(), 1)
+
+
+class FakeSMTPServer(socketserver.ThreadingTCPServer):
+    """
+    Local SMTP stand-in. Addresses in `rejected` get a permanent 550; each
+    address in `flaky` gets a temporary 451 that many times, then goes through.
+    """
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self):
+        super().__init__(('127.0.0.1', 0), FakeSMTPHandler)
+        self.rejected = set()
+        self.flaky = {}
+        self.delivered = []
+        self.connections = 0
+
+    def rcpt_reply(self, address):
+        if address in self.rejected:
+            return "550 No such user"
+        if self.flaky.get(address):
+            self.flaky[address] -= 1
+            return "451 Try again later"
+        return "250 OK"
+
+
+class FakeSMTPHandler(socketserver.StreamRequestHandler):
+    def reply(self, line):
+        self.wfile.write(f"{line}\r\n".encode())
+
+    def handle(self):
+        self.server.connections += 1
+        recipients = []
+        self.reply("220 localhost ready")
+        for raw in self.rfile:
+            line = raw.decode().rstrip("\r\n")
+            verb = line[:4].upper()
+            if verb in ('EHLO', 'HELO', 'NOOP'):
+                self.reply("250 localhost")
+            elif verb in ('MAIL', 'RSET'):
+                recipients = []
+                self.reply("250 OK")
+            elif verb == 'RCPT':
+                address = line.split(':', 1)[1].strip().strip('<>')
+                reply = self.server.rcpt_reply(address)
+                if reply.startswith('250'):
+                    recipients.append(address)
+                self.reply(reply)
+            elif verb == 'DATA':
+                self.reply("354 End data with <CR><LF>.<CR><LF>")
+                for data_line in self.rfile:
+                    if data_line == b".\r\n":
+                        break
+                self.server.delivered.extend(recipients)
+                self.reply("250 OK")
+            elif verb == 'QUIT':
+                self.reply("221 Bye")
+                return
+            else:
+                self.reply("502 Command not implemented")
+
+
+class BulkEmailTests(JobFixtureMixin, TestCase):
+    def setUp(self):
+        self.smtp = FakeSMTPServer()
+        threading.Thread(target=self.smtp.serve_forever, daemon=True).start()
+        self.addCleanup(self.smtp.server_close)
+        self.addCleanup(self.smtp.shutdown)
+
+        self.user = User.objects.create_user('acme')
+        self.company = Company.objects.create(
+            user=self.user, company_name="Acme", location="Nairobi", smtp_host='127.0.0.1',
+            smtp_port=self.smtp.server_address[1], smtp_username='hr@acme.test', use_tls=False,
+        )
+        self.job = self.create_job()
+        self.applicants = [self.create_applicant(n, ['Python']) for n in range(3)]
+
+    def dispatch(self, applicants=None):
+        return create_dispatch(self.company, self.job, "Interview", "Please book a slot.", applicants or self.applicants)
+
+    def send(self, dispatch):
+        ids = list(dispatch.recipients.values_list('id', flat=True))
+        return send_email_chunk.apply(args=(dispatch.id, ids))
+
+    def test_chunk_reuses_one_connection_and_skips_bad_addresses(self):
+        self.smtp.rejected.add("applicant1@example.com")
+        dispatch = self.dispatch()
+        self.send(dispatch)
+
+        self.assertEqual(self.smtp.connections, 1)
+        self.assertEqual(sorted(self.smtp.delivered), ["applicant0@example.com", "applicant2@example.com"])
+        failed = dispatch.recipients.get(status=EmailRecipient.STATUS_FAILED)
+        self.assertEqual(failed.email, "applicant1@example.com")
+        self.assertIn("No such user", failed.error)
+        dispatch.refresh_from_db()
+        self.assertEqual(dispatch.status, EmailDispatch.STATUS_DONE)
+        self.assertEqual(dispatch.progress(), {'pending': 0, 'sent': 2, 'failed': 1})
+
+    def test_temporary_failures_are_retried_with_backoff(self):
+        self.smtp.flaky["applicant2@example.com"] = 1
+        dispatch = self.dispatch()
+        with mock.patch.object(send_email_chunk, 'retry', side_effect=send_email_chunk.retry) as retry:
+            self.send(dispatch)
+        retry.assert_called_once()
+        self.assertEqual(retry.call_args.kwargs['countdown'], settings.EMAIL_RETRY_BACKOFF)
+        # Only the failed recipient is retried
+        self.assertEqual(retry.call_args.kwargs['args'][1], [dispatch.recipients.get(email="applicant2@example.com").id])
+
+        retried = dispatch.recipients.get(email="applicant2@example.com")
+        self.assertEqual((retried.status, retried.attempts), (EmailRecipient.STATUS_SENT, 2))
+        self.assertEqual(len(self.smtp.delivered), 3)
+
+    def test_retries_wait_for_the_company_rate_limit(self):
+        # Earlier dispatches have booked the next ten minutes
+        self.company.email_slots_until = timezone.now() + timedelta(minutes=10)
+        self.company.save()
+        self.smtp.flaky["applicant0@example.com"] = 1
+        dispatch = self.dispatch(self.applicants[:1])
+        with mock.patch.object(send_email_chunk, 'retry', side_effect=send_email_chunk.retry) as retry:
+            self.send(dispatch)
+        self.assertAlmostEqual(retry.call_args.kwargs['countdown'], 600, delta=1)
+
+    @override_settings(EMAIL_MAX_RETRIES=1)
+    def test_gives_up_after_max_retries(self):
+        self.smtp.flaky["applicant0@example.com"] = 5
+        dispatch = self.dispatch(self.applicants[:1])
+        self.send(dispatch)
+        recipient = dispatch.recipients.get()
+        self.assertEqual((recipient.status, recipient.attempts), (EmailRecipient.STATUS_FAILED, 2))
+        self.assertIn("Try again later", recipient.error)
+
+    @override_settings(EMAIL_DISPATCH_CHUNK_SIZE=2)
+    def test_chunks_are_paced_by_the_company_rate_limit(self):
+        self.company.smtp_rate_per_minute = 60
+        self.company.save()
+        with mock.patch.object(send_email_chunk, 'apply_async') as apply_async:
+            send_email_dispatch(self.dispatch().id)
+            send_email_dispatch(self.dispatch(self.applicants[:1]).id)
+
+        chunks = [len(c.args[0][1]) for c in apply_async.call_args_list]
+        self.assertEqual(chunks, [2, 1, 1])
+        # 60 per minute: each chunk waits for the emails booked before it
+        for call, expected in zip(apply_async.call_args_list, [0, 2, 3]):
+            self.assertAlmostEqual(call.kwargs['countdown'], expected, delta=0.5)
+
+    def test_chunks_never_exceed_the_company_rate(self):
+        self.company.smtp_rate_per_minute = 2
+        self.company.save()
+        with mock.patch.object(send_email_chunk, 'apply_async') as apply_async:
+            send_email_dispatch(self.dispatch().id)
+
+        # Each chunk goes out in one burst, so at most two emails per minute
+        self.assertEqual([len(c.args[0][1]) for c in apply_async.call_args_list], [2, 1])
+        for call, expected in zip(apply_async.call_args_list, [0, 60]):
+            self.assertAlmostEqual(call.kwargs['countdown'], expected, delta=0.5)
+
+    def test_view_queues_the_send_and_reports_progress(self):
+        self.client.force_login(self.user)
+        with mock.patch.object(send_email_dispatch, 'delay') as delay:
+            response = self.client.post('/applicants/bulk-email/', {
+                'job_id': self.job.id, 'email_subject': "Interview", 'email_message': "Hello",
+                'applicant_ids': ",".join(str(a.applicant_id) for a in self.applicants),
+            })
+        dispatch = EmailDispatch.objects.get()
+        delay.assert_called_once_with(dispatch.id)
+        self.assertEqual(response.url, f"/job/{self.job.id}/applicants/?email_dispatch={dispatch.id}")
+        self.assertEqual(self.smtp.connections, 0)
+
+        status = self.client.get(f'/applicants/bulk-email/{dispatch.id}/status/').json()
+        self.assertEqual((status['status'], status['total'], status['pending']), ('queued', 3, 3))
+
+        self.send(dispatch)
+        status = self.client.get(f'/applicants/bulk-email/{dispatch.id}/status/').json()
+        self.assertEqual((status['status'], status['sent']), ('done', 3))
+
+        self.client.force_login(User.objects.create_user('other'))
+        self.assertEqual(self.client.get(f'/applicants/bulk-email/{dispatch.id}/status/').status_code, 404)
+
+    def test_view_reports_a_failed_queueing(self):
+        self.client.force_login(self.user)
+        failures = [
+            mock.patch('Companyapp.views.create_dispatch', side_effect=RuntimeError("database is locked")),
+            mock.patch.object(send_email_dispatch, 'delay', side_effect=ConnectionError("broker down")),
+        ]
+        for failure, error in zip(failures, ["database is locked", "broker down"]):
+            with failure:
+                response = self.client.post('/applicants/bulk-email/', {
+                    'job_id': self.job.id, 'email_subject': "Interview", 'email_message': "Hello",
+                    'applicant_ids': ",".join(str(a.applicant_id) for a in self.applicants),
+                })
+            self.assertEqual(response.url, f"/job/{self.job.id}/applicants/")
+            self.assertIn(f"Email Error: {error}", [str(m) for m in get_messages(response.wsgi_request)])
+            # Nothing is left queued for the stuck-dispatch sweep to send later
+            self.assertFalse(EmailDispatch.objects.exists())
+
+    def test_stuck_dispatches_are_queued_again_once(self):
+        dispatch = self.dispatch()
+        EmailDispatch.objects.filter(id=dispatch.id).update(created_at=timezone.now() - timedelta(hours=1))
+        self.dispatch()  # Just queued, not stuck
+        with mock.patch.object(send_email_dispatch, 'delay') as delay:
+            requeue_stuck_email_dispatches()
+        delay.assert_called_once_with(dispatch.id)
+
+        # The original task turning up late does not send the dispatch twice
+        with mock.patch.object(send_email_chunk, 'apply_async') as apply_async:
+            send_email_dispatch(dispatch.id)
+            send_email_dispatch(dispatch.id)
+        apply_async.assert_called_once()
+        dispatch.refresh_from_db()
+        self.assertEqual(dispatch.status, EmailDispatch.STATUS_SENDING)
+
+
+class CredentialProviderTests(TestCase):
+    def setUp(self):
+        self.addCleanup(credentials.reset_cipher)
+        self.company = self.create_company("Acme", "s3cret")
+
+    def create_company(self, name, password):
+        company = Company(user=User.objects.create_user(name.lower()), company_name=name, location="Nairobi")
+        company.set_smtp_password(password)
+        company.save()
+        return company
+
+    def test_cipher_and_passwords_are_cached_until_saved(self):
+        self.assertIs(credentials.get_cipher(), credentials.get_cipher())
+        with mock.patch.object(credentials, 'decrypt_secret', wraps=credentials.decrypt_secret) as decrypt:
+            company = Company.objects.get(pk=self.company.pk)
+            self.assertEqual(company.get_smtp_password(), "s3cret")
+            self.assertEqual(Company.objects.get(pk=self.company.pk).get_smtp_password(), "s3cret")
+            self.assertEqual(decrypt.call_count, 1)
+
+            company.set_smtp_password("n3w")
+            company.save()
+            self.assertEqual(Company.objects.get(pk=self.company.pk).get_smtp_password(), "n3w")
+            self.assertEqual(decrypt.call_count, 2)
+
+            # Expired after SMTP_CREDENTIAL_CACHE_SECONDS
+            later = time.monotonic() + settings.SMTP_CREDENTIAL_CACHE_SECONDS + 1
+            with mock.patch('Companyapp.credentials.time.monotonic', return_value=later):
+                company.get_smtp_password()
+            self.assertEqual(decrypt.call_count, 3)
+
+    def test_rotation_re_encrypts_under_the_new_key(self):
+        old_key, new_key = settings.ENCRYPTION_KEY, Fernet.generate_key()
+        other = self.create_company("Globex", "hunter2")
+        Company.objects.create(user=User.objects.create_user('initech'), company_name="Initech", location="Nairobi")
+
+        with self.settings(ENCRYPTION_KEY=new_key, ENCRYPTION_OLD_KEYS=[old_key]):
+            # Old ciphertexts still decrypt while both keys are configured
+            self.assertEqual(Company.objects.get(pk=other.pk).get_smtp_password(), "hunter2")
+            self.assertEqual(rotate_smtp_credentials(), "Re-encrypted 2 passwords.")
+            self.assertEqual(credentials.rotate_smtp_passwords(), 0)
+
+        with self.settings(ENCRYPTION_KEY=new_key):
+            self.assertEqual(Company.objects.get(pk=self.company.pk).get_smtp_password(), "s3cret")
+            self.assertEqual(Company.objects.get(pk=other.pk).get_smtp_password(), "hunter2")
@@ -8,10 +8,13 @@ urlpatterns = [
     path("load-posts/", views.load_posts, name="load_posts"),
     path("load-courses/", views.load_courses, name="load_courses"),  # NEW
     path('job/<int:job_id>/applicants/', views.job_applicants_ranked, name='rankings'),
+    path('job/<int:job_id>/applicants/export/', views.export_ranked_applicants, name='export_rankings'),
+    path('job/<int:job_id>/candidates/', views.candidate_search, name='candidate_search'),
     path('manage-jobs/', views.manage_jobs, name='manage_jobs'),  # The Admin Dashboard
     path('edit-job/<int:job_id>/', views.edit_job, name='edit_job'), # Edit Logic
     path('delete-job/<int:job_id>/', views.delete_job, name='delete_job'), # Delete Logic
     path('company/register/', views.company_register_view, name='company_register'),
     path('company/logout/', views.company_logout_view, name='company_logout'),
     path('applicants/bulk-email/', views.send_bulk_emails, name='send_bulk_emails'),
+    path('applicants/bulk-email/<int:dispatch_id>/status/', views.email_dispatch_status, name='email_dispatch_status'),
 ]
\ No newline at end of file
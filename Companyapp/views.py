@@ -1,17 +1,25 @@
+import tempfile
+
+from django.conf import settings
 from django.contrib import messages
 from django.contrib.auth import login, logout
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth.forms import AuthenticationForm
 from django.contrib.auth.models import Group, User
-from django.core.mail import get_connection, EmailMultiAlternatives
-from django.core.mail.backends.smtp import EmailBackend
-from django.http import JsonResponse
+from django.core.paginator import Paginator
+from django.db.models import Count
+from django.http import FileResponse, Http404, JsonResponse, StreamingHttpResponse
 from django.shortcuts import get_object_or_404, redirect, render
+from django.urls import reverse
 from .forms import AcademicCourseForm, CompanyRegisterForm, DepartmentForm, JobAdvertisedForm, PostForm
-from .matcher import calculate_match_percentage
-from .models import AcademicCourse, Application, Company, Department, JobAdvertised, Post
+from .models import AcademicCourse, Application, Company, Department, EmailDispatch, EmailRecipient, JobAdvertised, Post
+from .candidate_index import search_candidates
+from .emailing import create_dispatch
+from .exports import csv_lines, write_parquet
+from .scoring import get_resume_data, missing_match_results, ranked_applications, sync_match_results
+from .signals import enqueue_after_commit
+from .tasks import score_job_matches, send_email_dispatch
 from Applicantapp.models import Applicant
-from Extractionapp.models import ResumeExtraction 
 
 
 def company_register_view(request):
@@ -132,6 +140,7 @@ def create_job_advert(request):
         form = JobAdvertisedForm(request.POST)
         if form.is_valid():
             job = form.save(commit=False)
+            job.company = getattr(request.user, 'company_profile', None)
             job.save()
             
             # Save the many-to-many relationship for courses
@@ -181,46 +190,61 @@ def job_applicants_ranked(request, job_id):
     """
     Display ranked applicants for a specific job based on matching algorithm.
     Now includes academic course matching.
+    Sorting and pagination happen in the database on the stored MatchResult
+    scores; ?top=K shows only the K best candidates.
     """
-    job = get_object_or_404(JobAdvertised, id=job_id)
+    job = get_object_or_404(
+        JobAdvertised.objects.select_related('post', 'department').prefetch_related('selected_courses'),
+        id=job_id
+    )
     
-    # Get job's accepted courses
-    job_courses = job.get_selected_courses_list()
+    # Get job's accepted courses (served from the prefetch, no extra query)
+    job_courses = [course.name for course in job.selected_courses.all()]
     
-    applications = Application.objects.filter(post=job.post).select_related('applicant')
+    # Applicants without a stored result yet (normally none) sort last until a worker scores them
+    if missing_match_results(job).exists():
+        enqueue_after_commit(score_job_matches, job.id)
     
-    ranked_candidates = []
+    applications = ranked_applications(job)
+    
+    # Top-K mode or a regular page, either way only one slice is fetched
+    top_k = request.GET.get('top', '')
+    if top_k.isdigit() and int(top_k) > 0:
+        top_k = min(int(top_k), settings.RANKING_MAX_TOP_K)
+        page_obj = None
+        page_applications = list(applications[:top_k])
+        total_candidates = Application.objects.filter(post=job.post).count()
+        rank_offset = 0
+    else:
+        top_k = None
+        paginator = Paginator(applications, settings.RANKING_PAGE_SIZE)
+        page_obj = paginator.get_page(request.GET.get('page'))
+        page_applications = list(page_obj.object_list)
+        total_candidates = paginator.count
+        rank_offset = page_obj.start_index() - 1 if page_applications else 0
+    
+    resume_by_applicant = {}
+    status_by_applicant = {}
 
-    for app in applications:
-        # Fetch resume extraction data
-        try:
-            extraction = ResumeExtraction.objects.get(applicant=app.applicant)
-            
-            resume_data = {
-                'skills': extraction.skills or [],
-                'work_experience': extraction.work_experience or [],
-                'education': extraction.education or [],
-                'projects': extraction.projects or []
-            }
-            
-            processing_status = "Processed" if extraction.processed else "Pending"
-            
-        except ResumeExtraction.DoesNotExist:
-            resume_data = {
-                'skills': [],
-                'work_experience': [],
-                'education': [],
-                'projects': []
-            }
+    for app in page_applications:
+        # Extraction comes from the same joined query
+        extraction = getattr(app.applicant, 'resumeextraction', None)
+        if extraction is None:
             processing_status = "Not Started"
+        else:
+            processing_status = "Processed" if extraction.processed else "Pending"
+
+        resume_by_applicant[app.applicant_id] = get_resume_data(app.applicant)
+        status_by_applicant[app.applicant_id] = processing_status
+
+    # Re-validate only the visible rows against their version hash
+    match_results = sync_match_results(job, resume_by_applicant, job_courses=job_courses)
 
-        # Calculate match score with academic course consideration
-        match_result = calculate_match_percentage(
-            job, 
-            resume_data, 
-            linkedin_data={},
-            job_courses=job_courses  # Pass job courses
-        )
+    ranked_candidates = []
+
+    for app in page_applications:
+        resume_data = resume_by_applicant[app.applicant_id]
+        match_result = match_results[app.applicant_id].breakdown
         
         ranked_candidates.append({
             'applicant': app.applicant,
@@ -238,32 +262,128 @@ def job_applicants_ranked(request, job_id):
             'candidate_years': match_result['candidate_years'],
             'required_years': match_result['required_years'],
             'application_date': app.applied_at,
-            'status': processing_status
+            'status': status_by_applicant[app.applicant_id]
         })
 
-    # Sort by highest score first
+    # A row rescored just now may have moved within the page
     ranked_candidates.sort(key=lambda x: x['score'], reverse=True)
+    for index, candidate in enumerate(ranked_candidates, start=rank_offset + 1):
+        candidate['rank'] = index
 
     context = {
         'job': job,
         'candidates': ranked_candidates,
-        'job_courses': job_courses
+        'job_courses': job_courses,
+        'page_obj': page_obj,
+        'top_k': top_k,
+        'total_candidates': total_candidates,
+        # Set after a bulk email is queued, so the page can show its progress
+        'email_dispatch_id': request.GET.get('email_dispatch', '') if request.GET.get('email_dispatch', '').isdigit() else None,
     }
     return render(request, 'ranked_applicants.html', context)
 
+def company_job_or_404(request, jobs, job_id):
+    """The job, if it was advertised by the logged-in user's company (404 otherwise)."""
+    company = getattr(request.user, 'company_profile', None)
+    if company is None:
+        raise Http404("Only company accounts can view candidates")
+    return get_object_or_404(jobs, id=job_id, company=company)
+
+@login_required
+def export_ranked_applicants(request, job_id):
+    """
+    Downloads a job's ranked applicants with scores, matched/missing skills
+    and years. CSV (default) is streamed row by row; ?format=parquet is
+    written to a temporary file first, since Parquet puts its index at the end.
+    """
+    job = company_job_or_404(request, JobAdvertised.objects.select_related('post'), job_id)
+    export_format = request.GET.get('format', 'csv')
+    filename = f"ranked-applicants-job-{job.id}"
+
+    if export_format == 'csv':
+        response = StreamingHttpResponse(csv_lines(job), content_type='text/csv')
+        response['Content-Disposition'] = f'attachment; filename="{filename}.csv"'
+        return response
+    if export_format == 'parquet':
+        output = tempfile.TemporaryFile()
+        write_parquet(job, output)
+        output.seek(0)
+        return FileResponse(output, as_attachment=True, filename=f"{filename}.parquet",
+                            content_type='application/vnd.apache.parquet')
+    raise Http404(f"Unknown export format: {export_format}")
+
+@login_required
+def candidate_search(request, job_id):
+    """
+    Finds the best candidates for a job among EVERY applicant, not only those
+    who applied: the candidate index returns the top-K profiles by embedding
+    similarity, and only those K get the full match breakdown.
+    """
+    job = company_job_or_404(
+        request,
+        JobAdvertised.objects.select_related('post', 'department').prefetch_related('selected_courses'),
+        job_id
+    )
+    job_courses = [course.name for course in job.selected_courses.all()]
+
+    k = request.GET.get('k', '')
+    k = min(int(k), settings.CANDIDATE_SEARCH_MAX_K) if k.isdigit() and int(k) > 0 else settings.CANDIDATE_SEARCH_DEFAULT_K
+
+    hits = search_candidates(job, k)
+    applicants = Applicant.objects.select_related('resumeextraction').in_bulk([applicant_id for applicant_id, _ in hits])
+    applied = set(
+        Application.objects.filter(post=job.post, applicant_id__in=applicants).values_list('applicant_id', flat=True)
+    )
+
+    resume_by_applicant = {applicant_id: get_resume_data(applicants[applicant_id]) for applicant_id, _ in hits if applicant_id in applicants}
+    match_results = sync_match_results(job, resume_by_applicant, job_courses=job_courses)
+
+    candidates = []
+    for applicant_id, similarity in hits:
+        if applicant_id not in applicants:
+            continue
+        breakdown = match_results[applicant_id].breakdown
+        candidates.append({
+            'applicant': applicants[applicant_id],
+            'similarity': round(similarity * 100, 1),
+            'score': breakdown['total_score'],
+            'matched_skills': breakdown['matched_skills'],
+            'missing_skills': breakdown['missing_skills'],
+            'applied': applicant_id in applied,
+        })
+
+    candidates.sort(key=lambda c: (c['score'], c['similarity']), reverse=True)
+    for index, candidate in enumerate(candidates, start=1):
+        candidate['rank'] = index
+
+    context = {
+        'job': job,
+        'candidates': candidates,
+        'k': k,
+    }
+    return render(request, 'candidate_search.html', context)
+
 def manage_jobs(request):
-    jobs = JobAdvertised.objects.select_related('post', 'department').all().order_by('-created_at')
+    """
+    Lists every job with its applicant count. Counts are annotated and the
+    accepted courses prefetched, so the page costs the same few queries
+    however many jobs and applications there are.
+    """
+    jobs = (
+        JobAdvertised.objects.select_related('post', 'department')
+        .annotate(applicant_count=Count('post__application', distinct=True))
+        .prefetch_related('selected_courses')
+        .order_by('-created_at')
+    )
     
-    job_data = []
-    for job in jobs:
-        # FIX: Use 'job.post' because Application is linked to the Post model, not JobAdvertised
-        count = Application.objects.filter(post=job.post).count()
-        
-        job_data.append({
+    job_data = [
+        {
             'job': job,
-            'applicant_count': count,
-            'selected_courses': job.selected_courses.all()
-        })
+            'applicant_count': job.applicant_count,
+            'selected_courses': list(job.selected_courses.all()),
+        }
+        for job in jobs
+    ]
     
     return render(request, 'job_list.html', {'job_data': job_data})
 
@@ -310,6 +430,10 @@ def delete_job(request, job_id):
 
 @login_required
 def send_bulk_emails(request):
+    """
+    Queues an email to the selected applicants. Delivery runs in Celery
+    (send_email_dispatch); the ranked applicants page polls its progress.
+    """
     if request.method == 'POST':
         # 1. Capture job_id FIRST (Safely at the top)
         job_id = request.POST.get('job_id')
@@ -330,57 +454,50 @@ def send_bulk_emails(request):
         
         applicant_ids = applicant_ids_str.split(',')
         applicants = Applicant.objects.filter(applicant_id__in=applicant_ids)
-        
-        # 3. Try Sending Emails
-        try:
-            # Check if user is a company
-            if not hasattr(request.user, 'company_profile'):
-                 messages.error(request, "Only company accounts can send emails.")
-                 return redirect('rankings', job_id=job_id)
 
-            company = request.user.company_profile
-            
-            # Check for SMTP settings
-            if not company.smtp_host or not company.smtp_username:
-                messages.error(request, "Please configure Email Settings in System Setup first.")
-                return redirect('rankings', job_id=job_id)
-                
-            # Decrypt Password
-            decrypted_password = company.get_smtp_password()
-            
-            # Create Custom Connection
-            backend = EmailBackend(
-                host=company.smtp_host,
-                port=company.smtp_port,
-                username=company.smtp_username,
-                password=decrypted_password,
-                use_tls=company.use_tls,
-                fail_silently=False
-            )
-            
-            connection = get_connection(backend=backend)
-            
-            # Prepare Emails
-            messages_to_send = []
-            for applicant in applicants:
-                email = EmailMultiAlternatives(
-                    subject=subject,
-                    body=f"Dear {applicant.first_name},\n\n{message}\n\nBest regards,\n{company.company_name}",
-                    from_email=company.smtp_username, 
-                    to=[applicant.email],
-                    connection=connection
-                )
-                messages_to_send.append(email)
-            
-            # Send Batch
-            connection.send_messages(messages_to_send)
-            messages.success(request, f"Sent {len(messages_to_send)} emails successfully via {company.smtp_host}!")
+        # Check if user is a company
+        if not hasattr(request.user, 'company_profile'):
+             messages.error(request, "Only company accounts can send emails.")
+             return redirect('rankings', job_id=job_id)
+
+        company = request.user.company_profile
+
+        # Check for SMTP settings
+        if not company.smtp_host or not company.smtp_username:
+            messages.error(request, "Please configure Email Settings in System Setup first.")
+            return redirect('rankings', job_id=job_id)
 
+        # 3. Queue the send (workers deliver it in chunks)
+        dispatch = None
+        try:
+            job = JobAdvertised.objects.filter(id=job_id).first()
+            dispatch = create_dispatch(company, job, subject, message, applicants)
+            send_email_dispatch.delay(dispatch.id)
         except Exception as e:
-            # Now 'job_id' is guaranteed to exist here
+            if dispatch is not None:
+                # Never reached the broker: drop it, so a retry by the user is not sent twice
+                dispatch.delete()
             messages.error(request, f"Email Error: {str(e)}")
+            return redirect('rankings', job_id=job_id)
+        messages.success(request, f"Queued {dispatch.recipients.count()} emails via {company.smtp_host}.")
+
+        # Redirect back to the applicants list, which shows the progress
+        return redirect(f"{reverse('rankings', args=[job_id])}?email_dispatch={dispatch.id}")
 
-        # Redirect back to the applicants list
-        return redirect('rankings', job_id=job_id)
+    return redirect('analyzer:dashboard')
 
-    return redirect('analyzer:dashboard')
\ No newline at end of file
+
+@login_required
+def email_dispatch_status(request, dispatch_id):
+    """Progress of a bulk email send as JSON, polled by the ranked applicants page."""
+    dispatch = get_object_or_404(EmailDispatch, id=dispatch_id, company__user=request.user)
+    progress = dispatch.progress()
+    failures = dispatch.recipients.filter(status=EmailRecipient.STATUS_FAILED).values('email', 'error')
+    return JsonResponse({
+        'id': dispatch.id,
+        'status': dispatch.status,
+        'total': sum(progress.values()),
+        **progress,
+        'failures': list(failures[:settings.EMAIL_STATUS_MAX_FAILURES]),
+        'finished_at': dispatch.finished_at,
+    })
@@ -1,5 +1,6 @@
 from django.contrib import admin
     
-from .models import ResumeExtraction
+from .models import ExtractionCache, ResumeExtraction
 # Register your models here.
-admin.site.register(ResumeExtraction)
\ No newline at end of file
+admin.site.register(ResumeExtraction)
+admin.site.register(ExtractionCache)
\ No newline at end of file
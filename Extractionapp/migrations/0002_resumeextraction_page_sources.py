@@ -0,0 +1,18 @@
+# Generated by Django 5.2.8 on 2026-10-18 03:38
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Extractionapp', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='resumeextraction',
+            name='page_sources',
+            field=models.JSONField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 5.2.8 on 2026-10-18 03:44
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Extractionapp', '0002_resumeextraction_page_sources'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='resumeextraction',
+            name='content_hash',
+            field=models.CharField(blank=True, db_index=True, default='', max_length=32),
+        ),
+        migrations.AddField(
+            model_name='resumeextraction',
+            name='pipeline_version',
+            field=models.CharField(blank=True, default='', max_length=20),
+        ),
+        migrations.CreateModel(
+            name='ExtractionCache',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('content_hash', models.CharField(max_length=32)),
+                ('pipeline_version', models.CharField(max_length=20)),
+                ('extracted_text', models.TextField(blank=True, default='')),
+                ('page_sources', models.JSONField(blank=True, null=True)),
+                ('skills', models.JSONField(blank=True, null=True)),
+                ('work_experience', models.JSONField(blank=True, null=True)),
+                ('projects', models.JSONField(blank=True, null=True)),
+                ('education', models.JSONField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'unique_together': {('content_hash', 'pipeline_version')},
+            },
+        ),
+    ]
@@ -0,0 +1,50 @@
+# Generated by Django 5.2.8 on 2026-10-18 04:13
+
+from django.db import migrations, models
+
+# Frozen copy of text_normalization.EDUCATION_LEVELS as of this migration, so
+# later changes to the classifier do not change what the backfill writes
+EDUCATION_LEVELS = {
+    "certificate": 1,
+    "diploma": 2, "associate": 2, "hnd": 2,
+    "bachelor": 3, "degree": 3, "bsc": 3, "b.sc": 3, "undergraduate": 3,
+    "master": 4, "msc": 4, "mba": 4, "postgraduate": 4,
+    "phd": 5, "doctorate": 5,
+}
+
+
+def education_level(entries):
+    """Highest level whose keyword appears (case-insensitively) in any entry; 0 when none does."""
+    entries = [entry.lower() for entry in entries or []]
+    return max(
+        (level for keyword, level in EDUCATION_LEVELS.items() if any(keyword in entry for entry in entries)),
+        default=0,
+    )
+
+
+def classify_existing(apps, schema_editor):
+    ResumeExtraction = apps.get_model('Extractionapp', 'ResumeExtraction')
+    batch = []
+    for extraction in ResumeExtraction.objects.exclude(education=None).only('id', 'education').iterator(chunk_size=2000):
+        extraction.education_level = education_level(extraction.education)
+        batch.append(extraction)
+        if len(batch) >= 2000:
+            ResumeExtraction.objects.bulk_update(batch, ['education_level'])
+            batch = []
+    ResumeExtraction.objects.bulk_update(batch, ['education_level'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Extractionapp', '0003_extraction_cache'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='resumeextraction',
+            name='education_level',
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+        migrations.RunPython(classify_existing, migrations.RunPython.noop),
+    ]
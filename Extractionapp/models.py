@@ -1,5 +1,6 @@
 from django.db import models
 from Applicantapp.models import Applicant
+from text_normalization import education_level
 
 class ResumeExtraction(models.Model):
     applicant = models.OneToOneField(Applicant, on_delete=models.CASCADE)
@@ -10,8 +11,53 @@ class ResumeExtraction(models.Model):
     work_experience = models.JSONField(null=True, blank=True)
     projects = models.JSONField(null=True, blank=True)
     education = models.JSONField(null=True, blank=True)
+    # Highest level in 'education' (text_normalization.EDUCATION_LEVELS, 0 = none),
+    # classified once here so matching and analytics compare integers
+    education_level = models.PositiveSmallIntegerField(default=0)
+
+    # Which path produced each page's text: [{"page": 1, "source": "text" | "ocr", "chars": 1234}]
+    page_sources = models.JSONField(null=True, blank=True)
 
     processed = models.BooleanField(default=False)
 
+    # xxh3-128 of the resume file + pipeline version it was processed with.
+    # Lets process_resume_task skip files it has already analysed.
+    content_hash = models.CharField(max_length=32, blank=True, default='', db_index=True)
+    pipeline_version = models.CharField(max_length=20, blank=True, default='')
+
+    def save(self, *args, **kwargs):
+        self.education_level = education_level(self.education)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'education' in update_fields:
+            kwargs['update_fields'] = {*update_fields, 'education_level'}
+        super().save(*args, **kwargs)
+
     def __str__(self):
         return f"Extraction for {self.applicant.first_name}"
+
+
+class ExtractionCache(models.Model):
+    """
+    Pipeline output shared by every applicant who uploads the same file.
+    Keyed by the file's content hash and the pipeline version.
+    """
+    content_hash = models.CharField(max_length=32)
+    pipeline_version = models.CharField(max_length=20)
+
+    extracted_text = models.TextField(blank=True, default='')
+    page_sources = models.JSONField(null=True, blank=True)
+    skills = models.JSONField(null=True, blank=True)
+    work_experience = models.JSONField(null=True, blank=True)
+    projects = models.JSONField(null=True, blank=True)
+    education = models.JSONField(null=True, blank=True)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    # Fields copied to/from ResumeExtraction
+    RESULT_FIELDS = ['extracted_text', 'page_sources', 'skills', 'work_experience', 'projects', 'education']
+
+    class Meta:
+        unique_together = ('content_hash', 'pipeline_version')
+
+    def __str__(self):
+        return f"Cached extraction {self.content_hash[:8]} (v{self.pipeline_version})"
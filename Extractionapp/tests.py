@@ -1,3 +1,25 @@
 from django.test import TestCase
 
-# Create your tests here.
+from Applicantapp.models import Applicant
+from .models import ResumeExtraction
+
+
+class EducationLevelTests(TestCase):
+    def setUp(self):
+        applicant = Applicant.objects.create(
+            first_name="Ada", last_name="Test", email="ada@example.com", resume="resumes/ada.pdf",
+        )
+        self.extraction = ResumeExtraction.objects.create(applicant=applicant, education=["Diploma in IT"])
+
+    def test_level_is_classified_on_save(self):
+        self.assertEqual(self.extraction.education_level, 2)
+
+        self.extraction.education = ["Diploma in IT", "MSc Data Science"]
+        self.extraction.save(update_fields=['education'])
+        self.extraction.refresh_from_db()
+        self.assertEqual(self.extraction.education_level, 4)
+
+    def test_no_education_is_level_zero(self):
+        self.extraction.education = None
+        self.extraction.save()
+        self.assertEqual(self.extraction.education_level, 0)
@@ -1,6 +1,8 @@
 # RESUME_ANALYZER/celery.py
 import os
 from celery import Celery
+from celery.concurrency import get_implementation
+from celery.signals import worker_init, worker_process_init, worker_ready
 
 # Set the default Django settings module for the 'celery' program.
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'Resumeanalyzer.settings') 
@@ -12,4 +14,62 @@ app = Celery('Resumeanalyzer')
 app.config_from_object('django.conf:settings', namespace='CELERY')
 
 # Load task modules from all registered Django apps.
-app.autodiscover_tasks()
\ No newline at end of file
+app.autodiscover_tasks()
+
+# ==========================================
+# Model warm-up at worker start
+# ==========================================
+# Only workers load AI models, and only those their queues need
+# (settings.WORKER_QUEUE_MODELS). The web process and beat never do.
+#
+# Prefork workers load them once in the parent, before the pool forks, so
+# every child (including ones recycled by max_tasks_per_child) shares the
+# weights copy-on-write instead of reloading them.
+_worker_queues = []
+_worker_is_prefork = False
+_preloaded = False
+
+
+@worker_init.connect
+def preload_worker_models(sender, **kwargs):
+    global _worker_is_prefork, _preloaded
+    from django.conf import settings
+    from Resumeanalyzer.model_registry import models_for_queues, preload_for_fork
+
+    _worker_queues[:] = list(sender.app.amqp.queues.consume_from)
+    _worker_is_prefork = 'prefork' in get_implementation(sender.pool_cls).__module__
+
+    if _worker_is_prefork and settings.MODEL_WARMUP_ON_WORKER_START and settings.MODEL_PRELOAD_IN_PARENT:
+        names = preload_for_fork(models_for_queues(_worker_queues))
+        _preloaded = True
+        print(f"🚀 [Celery] Preloaded models for queues {_worker_queues} in the parent: {names or 'none'}")
+
+
+def warm_up_worker_models():
+    from django.conf import settings
+    from Resumeanalyzer.model_registry import models_for_queues, warm_up
+
+    if not settings.MODEL_WARMUP_ON_WORKER_START:
+        return
+    names = warm_up(models_for_queues(_worker_queues))
+    print(f"🚀 [Celery] Models ready for queues {_worker_queues}: {names or 'none'}")
+
+
+@worker_process_init.connect
+def init_pool_process(**kwargs):
+    # (the solo pool sends this signal too, before the queues are known)
+    if not _worker_is_prefork:
+        return
+    from Resumeanalyzer.model_registry import configure_child_process
+
+    if not _preloaded:
+        # Every child loads its own copy
+        warm_up_worker_models()
+    configure_child_process()
+
+
+@worker_ready.connect
+def warm_up_single_process(**kwargs):
+    # Solo / threads pools run tasks in the main process
+    if not _worker_is_prefork:
+        warm_up_worker_models()
@@ -0,0 +1,131 @@
+# RESUME_ANALYZER/model_registry.py
+"""
+Single place where the heavy AI models are loaded.
+
+Nothing is loaded (or even imported) at module import time: each model is
+built on first use, so the web process, beat and maintenance-only workers
+never pay for OCR/NLP models they do not run. Celery workers warm up the
+models of the queues they consume when they start (see celery.py).
+"""
+import gc
+import threading
+
+from django.conf import settings
+
+_models = {}
+_lock = threading.Lock()
+
+
+# ==========================================
+# Loaders (heavy imports stay inside)
+# ==========================================
+def _load_ocr():
+    import easyocr
+    return easyocr.Reader(['en'], gpu=False)
+
+
+def _load_nlp():
+    from transformers import pipeline
+    return pipeline("text2text-generation", model=settings.NLP_MODEL)
+
+
+def _load_semantic():
+    from sentence_transformers import SentenceTransformer
+    return SentenceTransformer(settings.SEMANTIC_MODEL)
+
+
+LOADERS = {
+    'ocr': ("EasyOCR Reader", _load_ocr),
+    'nlp': ("Flan-T5 Model", _load_nlp),
+    'semantic': ("Semantic Matching Model", _load_semantic),
+}
+
+
+# ==========================================
+# Public API
+# ==========================================
+def get_model(name):
+    """Returns the named model, loading it on first use (thread-safe)."""
+    model = _models.get(name)
+    if model is None:
+        with _lock:
+            model = _models.get(name)
+            if model is None:
+                label, loader = LOADERS[name]
+                print(f"   🧠 [System] Loading {label}...")
+                model = loader()
+                _models[name] = model
+    return model
+
+
+def get_ocr_reader():
+    return get_model('ocr')
+
+
+def get_nlp_pipeline():
+    return get_model('nlp')
+
+
+def get_semantic_model():
+    return get_model('semantic')
+
+
+def is_loaded(name):
+    return name in _models
+
+
+def models_for_queues(queue_names):
+    """Models needed by a worker consuming the given queues (WORKER_QUEUE_MODELS)."""
+    needed = []
+    for queue_name in queue_names:
+        for name in settings.WORKER_QUEUE_MODELS.get(queue_name, []):
+            if name not in needed:
+                needed.append(name)
+    return needed
+
+
+def warm_up(names):
+    """Loads the given models up front so the first task does not pay for it."""
+    for name in names:
+        get_model(name)
+    return names
+
+
+# ==========================================
+# Sharing models with forked workers
+# ==========================================
+def _torch_modules(model):
+    """The torch modules inside a loaded model object (EasyOCR, pipeline or SentenceTransformer)."""
+    import torch
+
+    candidates = [model, getattr(model, 'model', None),
+                  getattr(model, 'detector', None), getattr(model, 'recognizer', None)]
+    return [m for m in candidates if isinstance(m, torch.nn.Module)]
+
+
+def preload_for_fork(names):
+    """
+    Loads models in the Celery parent process so prefork children inherit them
+    copy-on-write instead of each loading a private copy.
+
+    Inference never writes to the weights, so their pages stay shared. Two
+    things would otherwise still dirty them in every child:
+    - autograd bookkeeping (weights are switched to eval / requires_grad=False)
+    - the cyclic GC touching every object header (gc.freeze moves everything
+      allocated so far out of the collector's reach)
+    """
+    warm_up(names)
+    for name in names:
+        for module in _torch_modules(_models[name]):
+            module.eval()
+            module.requires_grad_(False)
+    gc.collect()
+    gc.freeze()
+    return names
+
+
+def configure_child_process():
+    """Per-child setup after fork: one intra-op thread each, so N children don't oversubscribe the CPUs."""
+    if settings.WORKER_TORCH_THREADS and _models:
+        import torch
+        torch.set_num_threads(settings.WORKER_TORCH_THREADS)
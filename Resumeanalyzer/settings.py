@@ -5,6 +5,7 @@ import environ
 import os
 from pathlib import Path
 from celery.schedules import crontab
+from kombu import Queue
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -171,15 +172,51 @@ CELERY_TASK_SOFT_TIME_LIMIT = 25 * 60  # 25 minutes
 
 # Worker settings
 CELERY_WORKER_PREFETCH_MULTIPLIER = 1
+# Honour per-message priorities on Redis (used for low-priority preview rendering)
+CELERY_BROKER_TRANSPORT_OPTIONS = {
+    'priority_steps': list(range(10)),
+    'queue_order_strategy': 'priority',
+}
 CELERY_WORKER_MAX_TASKS_PER_CHILD = 50
 
 # Result backend settings
 CELERY_RESULT_EXPIRES = 3600  # 1 hour
 
-# Task routing (optional - for multiple queues)
-# CELERY_TASK_ROUTES = {
-#     'Applicantapp.tasks.process_resume_task': {'queue': 'resume_processing'},
-# }
+# Task routing: one queue per pipeline stage so each pool scales on its own
+# (resume pipeline: ocr → nlp → matching). Start one worker per queue with its
+# own concurrency/prefetch, e.g.
+#   celery -A Resumeanalyzer worker -Q ocr -c 8 --prefetch-multiplier 1 -n ocr@%h
+#   celery -A Resumeanalyzer worker -Q nlp -c 2 --prefetch-multiplier 1 -n nlp@%h
+#   celery -A Resumeanalyzer worker -Q matching -c 4 --prefetch-multiplier 4 -n matching@%h
+#   celery -A Resumeanalyzer worker -Q maintenance,previews -c 2 -n maintenance@%h
+# A worker started without -Q consumes every queue below (handy in development).
+CELERY_TASK_DEFAULT_QUEUE = 'celery'
+CELERY_TASK_QUEUES = [
+    Queue('celery'),
+    Queue('ocr'),
+    Queue('nlp'),
+    Queue('matching'),
+    Queue('maintenance'),
+    Queue('previews'),
+]
+CELERY_TASK_ROUTES = {
+    'Applicantapp.tasks.process_resume_task': {'queue': 'ocr'},
+    'Applicantapp.tasks.ocr_page_task': {'queue': 'ocr'},
+    'Applicantapp.tasks.assemble_resume_task': {'queue': 'ocr'},
+    'Applicantapp.tasks.extract_resume_insights': {'queue': 'nlp'},
+    'Applicantapp.tasks.render_resume_previews': {'queue': 'previews'},
+    'Companyapp.tasks.score_job_matches': {'queue': 'matching'},
+    'Companyapp.tasks.score_applicant_matches': {'queue': 'matching'},
+    'Companyapp.tasks.index_candidate_embedding': {'queue': 'matching'},
+    'Companyapp.tasks.delete_expired_jobs': {'queue': 'maintenance'},
+    'Applicantapp.tasks.cleanup_orphaned_files': {'queue': 'maintenance'},
+    'Companyapp.tasks.send_email_dispatch': {'queue': 'maintenance'},
+    'Companyapp.tasks.send_email_chunk': {'queue': 'maintenance'},
+    'Companyapp.tasks.requeue_stuck_email_dispatches': {'queue': 'maintenance'},
+    'Companyapp.tasks.rotate_smtp_credentials': {'queue': 'maintenance'},
+    'Analyzerapp.tasks.refresh_job_analytics': {'queue': 'maintenance'},
+    'Analyzerapp.tasks.compact_analytics_reports': {'queue': 'maintenance'},
+}
 
 # ============================================
 # LOGGING CONFIGURATION
@@ -271,10 +308,101 @@ MAX_RESUME_BATCH_SIZE = 10
 OCR_LANGUAGE = 'en'
 OCR_GPU = False  # Set to True if you have CUDA configured
 
+# Use the PDF's own text layer when it is good enough; OCR only the pages that need it
+OCR_TEXT_LAYER_FIRST = True
+OCR_TEXT_LAYER_MIN_CHARS = 50  # Fewer characters than this means a scanned page
+OCR_TEXT_LAYER_MIN_DENSITY = 1.0  # Characters per 10,000 pt² of page area
+OCR_TEXT_LAYER_MAX_GARBAGE_RATIO = 0.1  # Share of unmapped glyphs tolerated
+
+# Bump when OCR/NLP changes so already-processed resumes are re-analysed
+# (unchanged files with a matching version are skipped, identical files share one extraction)
+RESUME_PIPELINE_VERSION = '1'
+
+# Ask Flan-T5 the skills/education/experience questions as one batched
+# generate call instead of three separate ones
+NLP_BATCHED_PROMPTS = True
+
+# Pool NLP prompts from resumes processed concurrently in one worker into a
+# single padded batch (flushed at MAX_ITEMS prompts or after MAX_WAIT_MS).
+# Only useful with a thread pool worker, e.g. `celery ... worker -P threads -c 8`
+NLP_MICROBATCH = False
+NLP_MICROBATCH_MAX_ITEMS = 24
+NLP_MICROBATCH_MAX_WAIT_MS = 50
+
+# Split multi-page scanned resumes into page-level OCR subtasks
+OCR_PAGE_FANOUT = True
+OCR_PAGE_FANOUT_MIN_PAGES = 2  # Fewer pages needing OCR than this are read inline
+
+# Page preview JPEGs (Applicant.converted_images), rendered outside the OCR path
+RESUME_PREVIEW_IMAGES = True
+RESUME_PREVIEW_ZOOM = 2.0
+RESUME_PREVIEW_PRIORITY = 9  # Redis transport: 0 is highest, 9 is lowest
+
 # NLP Model Settings
 NLP_MODEL = 'google/flan-t5-base'
 NLP_MAX_LENGTH = 512
 
+# Models are loaded lazily (Resumeanalyzer/model_registry.py). A Celery worker
+# warms up the models of the queues it consumes when it starts; queues not
+# listed here (and the web process / beat) load nothing up front.
+MODEL_WARMUP_ON_WORKER_START = True
+# Prefork workers: load once in the parent and share the weights copy-on-write
+# with every child, so recycled children start instantly and extra children
+# cost little memory
+MODEL_PRELOAD_IN_PARENT = True
+WORKER_TORCH_THREADS = 1  # torch intra-op threads per child (None = torch default)
+WORKER_QUEUE_MODELS = {
+    'ocr': ['ocr'],
+    'nlp': ['nlp'],
+    'matching': ['semantic'],
+}
+
+# Semantic Matching Settings
+SEMANTIC_MODEL = 'all-MiniLM-L6-v2'
+# Embedding cache shared by the web process and all Celery workers
+EMBEDDING_CACHE_PATH = BASE_DIR / 'embedding_cache.sqlite3'
+EMBEDDING_CACHE_MEMORY_ITEMS = 20000  # In-process LRU size (~1.5 KB per entry)
+
+# Candidate search across every applicant (Companyapp/candidate_index.py).
+# Exact brute-force scan up to IVF_THRESHOLD profiles, approximate k-means
+# partitions (probing NPROBE of them) beyond that
+CANDIDATE_INDEX_IVF_THRESHOLD = 50000
+CANDIDATE_INDEX_NPROBE = 8
+CANDIDATE_SEARCH_DEFAULT_K = 20
+CANDIDATE_SEARCH_MAX_K = 200
+
+# Ranked applicants page
+RANKING_PAGE_SIZE = 25
+RANKING_MAX_TOP_K = 500
+# Ranked applicant exports (CSV/Parquet) read this many rows per database round trip
+EXPORT_CHUNK_SIZE = 2000
+
+# Applicant job feed: jobs per page
+JOB_FEED_PAGE_SIZE = 20
+
+# Expired job sweep: runs every EXPIRED_JOBS_SWEEP_MINUTES, deleting jobs in
+# primary-key batches until the time budget (seconds) is spent
+EXPIRED_JOBS_SWEEP_MINUTES = 5
+EXPIRED_JOBS_BATCH_SIZE = 500
+EXPIRED_JOBS_TIME_BUDGET = 30
+
+# Bulk email: sent by Celery in chunks over one SMTP connection each, paced by
+# Company.smtp_rate_per_minute (a chunk never exceeds it). Temporary failures are
+# retried after EMAIL_RETRY_BACKOFF seconds, doubling each time, at most EMAIL_MAX_RETRIES times
+EMAIL_DISPATCH_CHUNK_SIZE = 50
+EMAIL_MAX_RETRIES = 3
+EMAIL_RETRY_BACKOFF = 60
+EMAIL_SMTP_TIMEOUT = 30
+# Beat re-queues dispatches the workers have not picked up after this many minutes
+EMAIL_DISPATCH_STUCK_MINUTES = 10
+# Failed addresses listed in the dispatch status response
+EMAIL_STATUS_MAX_FAILURES = 20
+# Decrypted SMTP passwords are kept in worker memory this long (seconds)
+SMTP_CREDENTIAL_CACHE_SECONDS = 300
+
+# Analytics reports are refreshed as results change; beat compacts them this often
+ANALYTICS_COMPACTION_MINUTES = 15
+
 # Matching Algorithm Weights
 SKILL_MATCH_WEIGHT = 0.40
 EXPERIENCE_MATCH_WEIGHT = 0.30
@@ -283,11 +411,25 @@ EDUCATION_MATCH_WEIGHT = 0.30
 
 
 CELERY_BEAT_SCHEDULE = {
-    'delete-expired-jobs-every-minute': {
+    'delete-expired-jobs': {
         'task': 'Companyapp.tasks.delete_expired_jobs',
-        # Change this to run every minute
-        'schedule': crontab(minute='*'), 
+        'schedule': crontab(minute=f'*/{EXPIRED_JOBS_SWEEP_MINUTES}'),
+    },
+    'cleanup-orphaned-files': {
+        'task': 'Applicantapp.tasks.cleanup_orphaned_files',
+        'schedule': crontab(minute=30, hour='*/6'),
+    },
+    'compact-analytics-reports': {
+        'task': 'Analyzerapp.tasks.compact_analytics_reports',
+        'schedule': crontab(minute=f'*/{ANALYTICS_COMPACTION_MINUTES}'),
+    },
+    'requeue-stuck-email-dispatches': {
+        'task': 'Companyapp.tasks.requeue_stuck_email_dispatches',
+        'schedule': crontab(minute=f'*/{EMAIL_DISPATCH_STUCK_MINUTES}'),
     },
 }
 
-ENCRYPTION_KEY =b'bZQhdII46MGaoUMfsfLY8B0sB9EC_VFkb2KGqgUKrJw='
\ No newline at end of file
+ENCRYPTION_KEY =b'bZQhdII46MGaoUMfsfLY8B0sB9EC_VFkb2KGqgUKrJw='
+# Key rotation: put the new key in ENCRYPTION_KEY and the previous one here,
+# run Companyapp.tasks.rotate_smtp_credentials, then remove the old key
+ENCRYPTION_OLD_KEYS = []
@@ -1,49 +1,243 @@
+import queue
 import re
+import threading
+import time
+from concurrent.futures import Future
 from datetime import datetime
-from transformers import pipeline
+from Resumeanalyzer.model_registry import get_nlp_pipeline
+from text_normalization import (
+    CENTURY_YEAR_PATTERN, CURRENT_KEYWORDS, FOUR_DIGITS_PATTERN, PUNCTUATION_PATTERN, YEAR_PATTERN, KeywordSet, smart_split,
+)
 
-_nlp_pipeline = None
+# =========================================
+# Cleaner vocabularies (compiled once, see text_normalization.KeywordSet)
+# =========================================
+# Blacklist: Common non-skill words
+SKILL_BLACKLIST = KeywordSet([
+    "responsible", "experience", "collaborating", "team", "strong", "working",
+    "bachelor", "bsc", "degree", "university", "summary", "profile", "oversee",
+    "progress", "project", "developer", "academy", "present", "started", "years",
+    "digital", "information", "delivery", "communication", "thinking", "management",
+    "designer", "effective", "critical", "founder", "phone", "currently", "lead",
+    "designing", "wireframes", "references", "kilifi", "couty", "mitigation",
+    "associate", "compiling", "sorting", "data", "july", "processing", "planning",
+    "food", "distribution", "knbs", "census", "enumerator", "prelisting",
+    "enumeration", "leadership", "jhub", "africa", "entry", "reference", "dr",
+    "skills", "software", "development"
+])
 
-def get_nlp_pipeline():
-    global _nlp_pipeline
-    if _nlp_pipeline is None:
-        print("   🧠 [System] Loading Flan-T5 Model...")
-        _nlp_pipeline = pipeline("text2text-generation", model="google/flan-t5-base") 
-    return _nlp_pipeline
+# Known technical terms (whitelist for common skills)
+TECH_KEYWORDS = KeywordSet([
+    "python", "java", "javascript", "react", "node", "sql", "aws", "docker",
+    "kubernetes", "git", "api", "html", "css", "typescript", "mongodb", "postgres",
+    "excel", "powerpoint", "tableau", "figma", "sketch", "adobe", "photoshop"
+])
 
-def smart_split(text):
+# Skill-shaped strings that are not skills
+SKILL_REJECT_PATTERN = re.compile(
+    r'^\d{4}$'  # Standalone years like "2020"
+    r'|^[A-Z][a-z]+ [A-Z][a-z]+$'  # Full names like "Lawrence Nderu"
+)
+
+# Education indicators
+EDUCATION_KEYWORDS = KeywordSet(["university", "college", "degree", "bsc", "bachelor", "master",
+                                 "diploma", "certificate", "academy", "b.sc", "m.sc", "phd", "msc"])
+
+EDUCATION_BLACKLIST = KeywordSet(["oversee", "progress", "team", "lead", "project", "kilifi",
+                                  "mitigation", "data", "experience", "currently", "designer",
+                                  "developer", "user", "wireframes"])
+
+DEGREE_PATTERNS = [
+    re.compile(r'(B\.?Sc\.?\s+[\w\s]+?)(?=,|\.|$)', re.IGNORECASE),
+    re.compile(r'(Bachelor[\w\s]+?)(?=,|\.|from|$)', re.IGNORECASE),
+    re.compile(r'(Master[\w\s]+?)(?=,|\.|from|$)', re.IGNORECASE),
+    re.compile(r'(Diploma[\w\s]+?)(?=,|\.|from|$)', re.IGNORECASE),
+]
+
+# Words that mean we are reading a non-job description
+JOB_BLACKLIST = KeywordSet(["bsc", "bachelor", "degree", "university", "academy", "college",
+                            "oversee", "designing", "wireframes", "progress"])
+
+# Common description triggers; the first one (in this order) found ends the title
+TITLE_SPLIT_WORDS = (" with ", " at ", " for ", " responsible ", " adept ",
+                     " working ", " using ", " expertise ", " overseeing ",
+                     " designing ", " known ", " committed ")
+
+# Trailing words that indicate the description started
+TITLE_DESCRIPTION_WORDS = KeywordSet(["oversee", "design", "data", "currently", "bsc", "known", "focus"])
+
+INSTITUTION_KEYWORDS = KeywordSet(["university", "academy", "college", "education"])
+WORK_EDUCATION_KEYWORDS = KeywordSet(["education", "university", "academy", "degree"])
+
+WORK_FALLBACK_PATTERN = re.compile(r'([A-Z\s]{4,30})\s*(20\d{2})(?:\s*-\s*(PRESENT|20\d{2}))?')
+COMPANY_YEARS_PATTERN = re.compile(r'([A-Z][A-Za-z\s&]{3,30})\s*\n?\s*(20\d{2})\s*-?\s*(PRESENT|20\d{2})?', re.MULTILINE)
+WORK_SECTION_PATTERN = re.compile(r'WORK.*?EXPERIENCE(.*?)(?:EDUCATION|SKILLS|$)', re.DOTALL | re.IGNORECASE)
+SECTION_COMPANY_PATTERN = re.compile(r'([A-Z][A-Za-z\s&]{3,25})\s*(20\d{2})\s*-?\s*(PRESENT|20\d{2})?')
+EMAIL_PATTERN = re.compile(r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b')
+PHONE_PATTERN = re.compile(r'\+?\d{1,4}[\s-]?\d{3}[\s-]?\d{3}[\s-]?\d{3,4}')
+PROJECT_PATTERNS = [
+    re.compile(rf'({keyword}[\w\s]+?)(?:[.,;]|\n|$)', re.IGNORECASE)
+    for keyword in ["project", "initiative", "poliagentx", "jhub", "africa"]
+]
+
+# (key, prompt prefix, max_length) for each question asked of the resume
+QUESTIONS = [
+    ("skills", "Extract only technical skills, tools, programming languages, frameworks (comma-separated list):", 150),
+    ("education", "Extract only university names, degree names, field of study (comma-separated):", 150),
+    ("experience", "List all job positions with company names and years worked. Format: Title at Company (Year-Year):", 400),
+]
+
+def prepare_text(text):
+    """Normalizes raw resume text into the prompt body shared by every question."""
+    return text.replace("\n", ", ").strip()[:3000]
+
+def build_prompts(clean_text):
+    """[(prompt, max_length), ...] in QUESTIONS order."""
+    return [(f"{prefix}\n{clean_text}", max_length) for _, prefix, max_length in QUESTIONS]
+
+def ask_sequential(nlp, clean_text):
+    """Original mode: one pipeline call (encoder + decoder pass) per question."""
+    return {
+        key: nlp(prompt, max_length=max_length)[0]["generated_text"]
+        for (key, _, _), (prompt, max_length) in zip(QUESTIONS, build_prompts(clean_text))
+    }
+
+def generate_answers(nlp, items):
     """
-    Splits text by Commas, Newlines, Bullets, or Semicolons.
-    Handles cases where AI forgets commas.
+    Runs [(prompt, max_length), ...] through the pipeline as one padded batch.
+    Each answer is cut back to its own length limit, so under greedy decoding
+    the answers match one-prompt-at-a-time calls (padding aside, which only adds float noise).
     """
-    tokens = re.split(r'[,|\n|•|;|\|]', text)
-    return [t.strip() for t in tokens if t.strip()]
+    if not items:
+        return []
+    outputs = nlp(
+        [prompt for prompt, _ in items],
+        batch_size=len(items),
+        max_length=max(max_length for _, max_length in items),
+        return_tensors=True,
+    )
 
-def extract_insights(text):
-    nlp = get_nlp_pipeline()
-    
-    # Pre-cleaning: Normalize text
-    clean_text = text.replace("\n", ", ").strip()[:3000]
+    # The pipeline's own max_new_tokens (if any) wins over max_length, same as in ask_sequential
+    max_new_tokens = nlp.generation_config.max_new_tokens
+    answers = []
+    for (_, max_length), output in zip(items, outputs):
+        limit = max_new_tokens + 1 if max_new_tokens is not None else max_length
+        ids = output["generated_token_ids"][:limit]
+        answers.append(nlp.tokenizer.decode(ids, skip_special_tokens=True))
+    return answers
+
+def ask_batched(nlp, clean_text):
+    """Single-pass mode: the three questions share one encoder pass and decoding loop."""
+    answers = generate_answers(nlp, build_prompts(clean_text))
+    return {key: answer for (key, _, _), answer in zip(QUESTIONS, answers)}
+
+
+# =========================================
+# 📦 CROSS-RESUME MICRO-BATCHING
+# =========================================
+
+class MicroBatcher:
+    """
+    Collects prompts submitted by concurrent tasks (thread pool worker) and runs
+    them through the pipeline as one padded batch.
+
+    A batch is flushed when it holds max_items prompts or when the oldest
+    request has waited max_wait_ms, whichever comes first.
+    """
+
+    def __init__(self, nlp_factory=None, max_items=24, max_wait_ms=50):
+        self.nlp_factory = nlp_factory or get_nlp_pipeline
+        self.max_items = max_items
+        self.max_wait = max_wait_ms / 1000
+        self._requests = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def _ensure_running(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="nlp-microbatcher", daemon=True)
+                self._thread.start()
+
+    def submit(self, items):
+        """Queues [(prompt, max_length), ...]; returns a Future resolving to the answers."""
+        future = Future()
+        self._ensure_running()
+        self._requests.put((items, future))
+        return future
+
+    def ask(self, clean_text):
+        """Drop-in for ask_batched that shares the batch with other resumes."""
+        answers = self.submit(build_prompts(clean_text)).result()
+        return {key: answer for (key, _, _), answer in zip(QUESTIONS, answers)}
+
+    def _collect(self):
+        """Blocks for the first request, then gathers more until the batch is full or the wait expires."""
+        batch = [self._requests.get()]
+        size = len(batch[0][0])
+        deadline = time.monotonic() + self.max_wait
+        while size < self.max_items:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                request = self._requests.get(timeout=remaining)
+            except queue.Empty:
+                break
+            batch.append(request)
+            size += len(request[0])
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            items = [item for request_items, _ in batch for item in request_items]
+            try:
+                answers = generate_answers(self.nlp_factory(), items)
+            except Exception as e:
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+
+            print(f"   📦 [NLP] Ran {len(items)} prompts from {len(batch)} resumes in one batch")
+            offset = 0
+            for request_items, future in batch:
+                future.set_result(answers[offset:offset + len(request_items)])
+                offset += len(request_items)
+
+_micro_batcher = None
+
+def get_micro_batcher(max_items=24, max_wait_ms=50):
+    global _micro_batcher
+    if _micro_batcher is None:
+        _micro_batcher = MicroBatcher(max_items=max_items, max_wait_ms=max_wait_ms)
+    return _micro_batcher
+
+
+def extract_insights(text, batched=True, batcher=None):
+    """
+    Runs the NLP questions for one resume and cleans the answers.
+    With a batcher the prompts are pooled with other resumes being processed
+    concurrently in this worker.
+    """
+    clean_text = prepare_text(text)
 
     print("   🧠 [Debug] Asking AI for extraction...")
 
-    # --- Q1: SKILLS ---
-    raw_skills = nlp(
-        f"Extract only technical skills, tools, programming languages, frameworks (comma-separated list):\n{clean_text}", 
-        max_length=150
-    )[0]["generated_text"]
+    if batcher is not None:
+        answers = batcher.ask(clean_text)
+    elif batched:
+        answers = ask_batched(get_nlp_pipeline(), clean_text)
+    else:
+        answers = ask_sequential(get_nlp_pipeline(), clean_text)
+    return build_insights(text, answers)
 
-    # --- Q2: EDUCATION ---
-    raw_education = nlp(
-        f"Extract only university names, degree names, field of study (comma-separated):\n{clean_text}", 
-        max_length=150
-    )[0]["generated_text"]
 
-    # --- Q3: EXPERIENCE ---
-    raw_experience = nlp(
-        f"List all job positions with company names and years worked. Format: Title at Company (Year-Year):\n{clean_text}", 
-        max_length=400
-    )[0]["generated_text"]
+def build_insights(text, answers):
+    """Turns the raw model answers for one resume into the structured insights dict."""
+    raw_skills = answers["skills"]
+    raw_education = answers["education"]
+    raw_experience = answers["experience"]
 
     # =========================================
     # 🧹 ADVANCED CLEANING ENGINES
@@ -53,35 +247,7 @@ def extract_insights(text):
         """Extract only technical keywords, remove descriptions"""
         cleaned = []
         
-        # Blacklist: Common non-skill words
-        blacklist = [
-            "responsible", "experience", "collaborating", "team", "strong", "working",
-            "bachelor", "bsc", "degree", "university", "summary", "profile", "oversee",
-            "progress", "project", "developer", "academy", "present", "started", "years",
-            "digital", "information", "delivery", "communication", "thinking", "management",
-            "designer", "effective", "critical", "founder", "phone", "currently", "lead",
-            "designing", "wireframes", "references", "kilifi", "couty", "mitigation",
-            "associate", "compiling", "sorting", "data", "july", "processing", "planning",
-            "food", "distribution", "knbs", "census", "enumerator", "prelisting",
-            "enumeration", "leadership", "jhub", "africa", "entry", "reference", "dr",
-            "skills", "software", "development"
-        ]
-        
-        # Known technical terms (whitelist for common skills)
-        tech_keywords = [
-            "python", "java", "javascript", "react", "node", "sql", "aws", "docker",
-            "kubernetes", "git", "api", "html", "css", "typescript", "mongodb", "postgres",
-            "excel", "powerpoint", "tableau", "figma", "sketch", "adobe", "photoshop"
-        ]
-        
-        # Regex patterns to reject
-        reject_patterns = [
-            r'^\d{4}$',  # Standalone years like "2020"
-            r'^[A-Z][a-z]+ [A-Z][a-z]+$'  # Full names like "Lawrence Nderu"
-        ]
-        
         for item in smart_split(raw_text):
-            item_lower = item.lower()
             words = item.split()
             
             # Rule 1: Must be 1-3 words
@@ -89,18 +255,12 @@ def extract_insights(text):
                 continue
             
             # Rule 2: Reject based on patterns
-            should_reject = False
-            for pattern in reject_patterns:
-                if re.match(pattern, item.strip()):
-                    should_reject = True
-                    break
-            
-            if should_reject:
+            if SKILL_REJECT_PATTERN.match(item):
                 continue
             
             # Rule 3: Check if it's a tech term OR doesn't contain blacklist words
-            is_tech = any(tech in item_lower for tech in tech_keywords)
-            has_bad_word = any(bad in item_lower for bad in blacklist)
+            is_tech = TECH_KEYWORDS.search(item)
+            has_bad_word = SKILL_BLACKLIST.search(item)
             
             if is_tech or (not has_bad_word and len(item) >= 3):
                 # Clean up formatting
@@ -114,28 +274,17 @@ def extract_insights(text):
         """Extract meaningful education entries only"""
         cleaned = []
         
-        # Education indicators
-        edu_keywords = ["university", "college", "degree", "bsc", "bachelor", "master", 
-                       "diploma", "certificate", "academy", "b.sc", "m.sc", "phd", "msc"]
-        
-        # Blacklist
-        bad_words = ["oversee", "progress", "team", "lead", "project", "kilifi", 
-                    "mitigation", "data", "experience", "currently", "designer",
-                    "developer", "user", "wireframes"]
-        
         for item in smart_split(raw_text):
-            item_lower = item.lower()
-            
             # Must contain education keyword
-            if not any(k in item_lower for k in edu_keywords):
+            if not EDUCATION_KEYWORDS.search(item):
                 continue
             
             # Must not contain bad words
-            if any(bad in item_lower for bad in bad_words):
+            if EDUCATION_BLACKLIST.search(item):
                 continue
             
             # Remove year mentions if they appear alone
-            item_clean = re.sub(r'\b(19|20)\d{2}\b', '', item).strip()
+            item_clean = CENTURY_YEAR_PATTERN.sub('', item).strip()
             
             # Must have meaningful length
             if len(item_clean) > 4 and item_clean not in cleaned:
@@ -146,15 +295,8 @@ def extract_insights(text):
         # If nothing found, try extracting from original text with better regex
         if not cleaned:
             # Try to find "BSc Computer Science" patterns
-            degree_patterns = [
-                r'(B\.?Sc\.?\s+[\w\s]+?)(?=,|\.|$)',
-                r'(Bachelor[\w\s]+?)(?=,|\.|from|$)',
-                r'(Master[\w\s]+?)(?=,|\.|from|$)',
-                r'(Diploma[\w\s]+?)(?=,|\.|from|$)'
-            ]
-            
-            for pattern in degree_patterns:
-                matches = re.findall(pattern, text, re.IGNORECASE)
+            for pattern in DEGREE_PATTERNS:
+                matches = pattern.findall(text)
                 for match in matches[:2]:
                     clean_match = match.strip()
                     if len(clean_match) > 8:
@@ -167,42 +309,33 @@ def extract_insights(text):
         processed_jobs = []
         current_year = datetime.now().year
         
-        # Blacklist words that indicate we're reading non-job descriptions
-        job_blacklist = ["bsc", "bachelor", "degree", "university", "academy", "college",
-                        "oversee", "designing", "wireframes", "progress"]
-
         for item in smart_split(raw_text):
             if len(item) < 5:
                 continue
             
             # Skip if contains education keywords
-            item_lower = item.lower()
-            if any(bad in item_lower for bad in job_blacklist):
+            if JOB_BLACKLIST.search(item):
                 continue
 
             # 1. EXTRACT JOB TITLE (before any year or description)
-            title_parts = re.split(r'\d{4}', item)
+            title_parts = FOUR_DIGITS_PATTERN.split(item)
             title_only = title_parts[0].strip() if title_parts else item
             
             # Remove common description triggers
-            split_words = [" with ", " at ", " for ", " responsible ", " adept ", 
-                          " working ", " using ", " expertise ", " overseeing ", 
-                          " designing ", " known ", " committed "]
-            
-            for sword in split_words:
-                if sword.lower() in title_only.lower():
-                    title_only = title_only.lower().split(sword)[0].strip()
+            title_lower = title_only.lower()
+            for sword in TITLE_SPLIT_WORDS:
+                if sword in title_lower:
+                    title_only = title_lower.split(sword)[0].strip()
                     break
             
             # Clean parentheses and extra punctuation
-            title_only = re.sub(r'[(),]', '', title_only).strip()
+            title_only = PUNCTUATION_PATTERN.sub('', title_only).strip()
             
             # Remove trailing words that indicate description started
-            desc_words = ["oversee", "design", "data", "currently", "bsc", "known", "focus"]
             words = title_only.split()
             clean_words = []
             for word in words:
-                if any(desc in word.lower() for desc in desc_words):
+                if TITLE_DESCRIPTION_WORDS.search(word):
                     break
                 clean_words.append(word)
             
@@ -220,12 +353,12 @@ def extract_insights(text):
                 short_title = title_only
 
             # 2. CALCULATE YEARS OF EXPERIENCE FROM ORIGINAL ITEM
-            years_found = re.findall(r'20\d{2}', item)
+            years_found = YEAR_PATTERN.findall(item)
             years_found = [int(y) for y in years_found if 2000 <= int(y) <= current_year + 5]  # Allow future dates
             
             duration_str = ""
             if years_found:
-                is_current = "present" in item.lower() or "now" in item.lower() or "current" in item.lower()
+                is_current = CURRENT_KEYWORDS.search(item)
                 
                 if is_current and len(years_found) >= 1:
                     start = min(years_found)
@@ -266,13 +399,13 @@ def extract_insights(text):
         # FALLBACK: If no jobs extracted, try to extract from original text directly
         if not processed_jobs:
             # Look for patterns like "JHUB AFRICA 2023-PRESENT"
-            work_patterns = re.findall(r'([A-Z\s]{4,30})\s*(20\d{2})(?:\s*-\s*(PRESENT|20\d{2}))?', text)
+            work_patterns = WORK_FALLBACK_PATTERN.findall(text)
             for match in work_patterns[:5]:
                 title, start_year, end_year = match
                 title = title.strip().title()
                 
                 # Skip education keywords
-                if any(edu in title.lower() for edu in ["education", "university", "academy", "degree"]):
+                if WORK_EDUCATION_KEYWORDS.search(title):
                     continue
                 
                 start = int(start_year)
@@ -298,15 +431,14 @@ def extract_insights(text):
         current_year = datetime.now().year
         
         # Pattern 1: "JHUB AFRICA\n2023-PRESENT"
-        pattern1 = re.findall(r'([A-Z][A-Za-z\s&]{3,30})\s*\n?\s*(20\d{2})\s*-?\s*(PRESENT|20\d{2})?', text, re.MULTILINE)
+        pattern1 = COMPANY_YEARS_PATTERN.findall(text)
         
         for match in pattern1:
             company, start_year, end_info = match
             company = company.strip().title()
             
             # Skip if it's an education institution
-            edu_keywords = ["university", "academy", "college", "education"]
-            if any(edu in company.lower() for edu in edu_keywords):
+            if INSTITUTION_KEYWORDS.search(company):
                 continue
             
             start = int(start_year)
@@ -326,11 +458,11 @@ def extract_insights(text):
                 work_entries.append(f"{company} (Since {start})")
         
         # Pattern 2: Look for "WORK" or "EXPERIENCE" section
-        work_section = re.search(r'WORK.*?EXPERIENCE(.*?)(?:EDUCATION|SKILLS|$)', text, re.DOTALL | re.IGNORECASE)
+        work_section = WORK_SECTION_PATTERN.search(text)
         if work_section:
             section_text = work_section.group(1)
             # Extract company-year pairs from this section
-            companies = re.findall(r'([A-Z][A-Za-z\s&]{3,25})\s*(20\d{2})\s*-?\s*(PRESENT|20\d{2})?', section_text)
+            companies = SECTION_COMPANY_PATTERN.findall(section_text)
             for company, start_year, end_info in companies[:5]:
                 company = company.strip().title()
                 start = int(start_year)
@@ -351,8 +483,8 @@ def extract_insights(text):
     
     def extract_contact_info(text):
         """Extract email and phone"""
-        email = re.search(r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b', text)
-        phone = re.search(r'\+?\d{1,4}[\s-]?\d{3}[\s-]?\d{3}[\s-]?\d{3,4}', text)
+        email = EMAIL_PATTERN.search(text)
+        phone = PHONE_PATTERN.search(text)
         
         return {
             "email": email.group(0) if email else None,
@@ -361,12 +493,10 @@ def extract_insights(text):
     
     def extract_projects(text):
         """Look for project keywords"""
-        project_keywords = ["project", "initiative", "poliagentx", "jhub", "africa"]
         projects = []
         
-        for keyword in project_keywords:
-            pattern = rf'({keyword}[\w\s]+?)(?:[.,;]|\n|$)'
-            matches = re.findall(pattern, text, re.IGNORECASE)
+        for pattern in PROJECT_PATTERNS:
+            matches = pattern.findall(text)
             for match in matches:
                 if len(match) > 5 and len(match) < 100:
                     projects.append(match.strip().title())
@@ -0,0 +1,197 @@
+"""
+Rule-based text normalization shared by the matcher and the insight cleaners.
+
+Every pattern is compiled once at import time. Keyword lists (blacklists,
+education levels, tech terms) are compiled into a single trie-shaped regex,
+so checking an entry against N keywords is one scan of the entry instead of
+N substring tests. Entry-level helpers are memoized: the same work and
+education lines come back every time a resume is rescored.
+"""
+import re
+from datetime import datetime
+from functools import lru_cache
+
+ENTRY_CACHE_SIZE = 65536
+
+
+# ==========================================
+# Trie-compiled keyword sets
+# ==========================================
+def trie_regex(words):
+    """
+    One regex alternation matching any of the words, built from a trie so
+    shared prefixes are tested once ("bachelor|bsc" -> "b(?:achelor|sc)").
+    Longer words are tried before their prefixes.
+    """
+    trie = {}
+    for word in words:
+        node = trie
+        for ch in word:
+            node = node.setdefault(ch, {})
+        node[''] = {}
+
+    def build(node):
+        branches = [re.escape(ch) + build(child) for ch, child in sorted(node.items()) if ch]
+        if '' in node:
+            branches.append('')
+        if not branches:
+            return ''
+        if len(branches) == 1:
+            return branches[0]
+        if branches[-1] == '':
+            return f"(?:{'|'.join(branches[:-1])})?"
+        return f"(?:{'|'.join(branches)})"
+
+    return build(trie)
+
+
+class KeywordSet:
+    """
+    Case-insensitive substring matching against a fixed list of keywords,
+    i.e. `any(k in text.lower() for k in keywords)` in one regex scan.
+    """
+
+    def __init__(self, keywords):
+        self.keywords = tuple(dict.fromkeys(k.lower() for k in keywords))
+        alternation = trie_regex(self.keywords)
+        self._search = re.compile(alternation, re.IGNORECASE).search
+        # Lookahead so overlapping keywords are all reported
+        self._finditer = re.compile(f"(?=({alternation}))", re.IGNORECASE).finditer
+        # A keyword matched at a position implies every shorter keyword that is its prefix matched too
+        self._prefixes = {
+            k: [p for p in self.keywords if p != k and k.startswith(p)] for k in self.keywords
+        }
+
+    def search(self, text):
+        return self._search(text) is not None
+
+    def found(self, text):
+        """Every keyword contained in the text (as a set)."""
+        hits = set()
+        for match in self._finditer(text):
+            keyword = match.group(1).lower()
+            hits.add(keyword)
+            hits.update(self._prefixes[keyword])
+        return hits
+
+
+# ==========================================
+# Precompiled patterns
+# ==========================================
+SPLIT_PATTERN = re.compile(r'[,|\n|•|;|\|]')
+DURATION_PATTERN = re.compile(r'\b(\d+)\s*(?:yr|yrs|year|years)\b', re.IGNORECASE)
+YEAR_RANGE_PATTERN = re.compile(r'(20\d{2})\s*[-/–]\s*(20\d{2})')
+YEAR_PATTERN = re.compile(r'20\d{2}')
+YEAR_WORD_PATTERN = re.compile(r'\b20\d{2}\b')
+CENTURY_YEAR_PATTERN = re.compile(r'\b(19|20)\d{2}\b')
+FOUR_DIGITS_PATTERN = re.compile(r'\d{4}')
+PARENTHESES_PATTERN = re.compile(r'\(.*?\)')
+PUNCTUATION_PATTERN = re.compile(r'[(),]')
+# What follows these is the employer, not the title. Applied in this order:
+# "Dev with at X" keeps "Dev with", so this is not simply the earliest match
+TITLE_STOP_WORDS = (" at ", " with ", " for ", " in ", " on ")
+
+CURRENT_KEYWORDS = KeywordSet(["present", "current", "now"])
+
+# Education level classifier: keyword -> level, certificate 1 ... doctorate 5
+# (0 means no recognised level). Shared by matching and the analytics reports
+EDUCATION_LEVELS = {
+    "certificate": 1,
+    "diploma": 2, "associate": 2, "hnd": 2,
+    "bachelor": 3, "degree": 3, "bsc": 3, "b.sc": 3, "undergraduate": 3,
+    "master": 4, "msc": 4, "mba": 4, "postgraduate": 4,
+    "phd": 5, "doctorate": 5,
+}
+EDUCATION_LEVEL_KEYWORDS = KeywordSet(EDUCATION_LEVELS)
+EDUCATION_LEVEL_LABELS = {1: 'Certificate', 2: 'Diploma', 3: 'Bachelor', 4: 'Master', 5: 'PhD'}
+
+
+def smart_split(text):
+    """
+    Splits text by Commas, Newlines, Bullets, or Semicolons.
+    Handles cases where AI forgets commas.
+    """
+    return [t.strip() for t in SPLIT_PATTERN.split(text) if t.strip()]
+
+
+# ==========================================
+# Work entries
+# ==========================================
+@lru_cache(maxsize=ENTRY_CACHE_SIZE)
+def _parse_years(entry, current_year):
+    # Case 1: Explicit "(2 years)"
+    match = DURATION_PATTERN.search(entry)
+    if match:
+        years = int(match.group(1))
+        # Sanity check: ignore unrealistic durations (>40 years)
+        if 0 < years <= 40:
+            return years
+
+    # Case 2: Year Range "2019 - 2022"
+    range_match = YEAR_RANGE_PATTERN.findall(entry)
+    if range_match:
+        start, end = map(int, range_match[-1])
+        return max(1, end - start)
+
+    # Case 3: "2020 - Present"
+    years_found = YEAR_PATTERN.findall(entry)
+    if years_found and CURRENT_KEYWORDS.search(entry):
+        start = int(years_found[0])
+        return max(1, current_year - start)
+
+    return 0
+
+
+def parse_years(entry):
+    """
+    Extracts duration from job entries like:
+    - "Software Engineer (2 yrs)"
+    - "DevOps (2019-2022)"
+    - "Manager (2020-Present)"
+    """
+    return _parse_years(entry, datetime.now().year)
+
+
+@lru_cache(maxsize=ENTRY_CACHE_SIZE)
+def clean_title(entry):
+    """
+    Cleans a job entry to isolate the job title for AI comparison.
+    Input: "Senior Developer at Google (2020-2022)"
+    Output: "Senior Developer"
+    """
+    t = PARENTHESES_PATTERN.sub('', entry.lower())
+    t = YEAR_WORD_PATTERN.sub('', t)
+    for stop_word in TITLE_STOP_WORDS:
+        if stop_word in t:
+            t = t.split(stop_word, 1)[0]
+    return t.strip().title()
+
+
+def parse_years_many(entries):
+    """parse_years for a batch of entries (current year looked up once)."""
+    current_year = datetime.now().year
+    return [_parse_years(entry, current_year) for entry in entries]
+
+
+def clean_titles(entries):
+    """clean_title for a batch of entries."""
+    return [clean_title(entry) for entry in entries]
+
+
+# ==========================================
+# Education
+# ==========================================
+@lru_cache(maxsize=ENTRY_CACHE_SIZE)
+def education_rank(text):
+    """Highest EDUCATION_LEVELS level mentioned in the text (0 when none is)."""
+    return max((EDUCATION_LEVELS[k] for k in EDUCATION_LEVEL_KEYWORDS.found(text)), default=0)
+
+
+def education_ranks(entries):
+    """education_rank for a batch of entries."""
+    return [education_rank(entry) for entry in entries]
+
+
+def education_level(entries):
+    """Highest level across a candidate's education entries (stored as ResumeExtraction.education_level)."""
+    return max(education_ranks(entries or []), default=0)